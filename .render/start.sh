@@ -16,6 +16,7 @@ if [ -f "../scripts/init_db.py" ]; then
     fi
 fi
 
-# 启动服务 - 直接使用 Python 运行 Flask
+# 启动服务 - gunicorn 多进程，worker 数由 WEB_CONCURRENCY 控制
+# （未配置 DATABASE_URL 时会话历史只在进程内存中，默认只开 1 个 worker）
 echo "启动 OPC Agent 服务..."
-python main_flask.py
+exec gunicorn -c gunicorn_conf.py main_flask:app
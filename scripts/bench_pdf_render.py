@@ -0,0 +1,52 @@
+"""
+PDF 渲染微基准
+在当前进程中直接调用 render_opc_pdf（不经过进程池和缓存），统计单份 PDF 的渲染耗时
+
+用法：
+    python scripts/bench_pdf_render.py [-n 次数]
+"""
+import os
+import sys
+import time
+import argparse
+import statistics
+
+# 添加 src 目录到 Python 路径
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+USER_INFO = "城市：杭州\n技能：写作、设计\n经验：3年内容运营\n兴趣：内容创作、摄影"
+PROJECTS = "\n".join(f"{i}. 项目{i}：结合写作与AI工具，面向本地商家提供内容服务" for i in range(1, 6))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PDF 渲染微基准")
+    parser.add_argument("-n", "--iterations", type=int, default=50, help="渲染次数（默认 50）")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    from tools.pdf_generator_simple import render_opc_pdf
+    import_ms = (time.perf_counter() - start) * 1000
+
+    # 首次渲染单独统计（包含 ReportLab 内部的惰性初始化）
+    start = time.perf_counter()
+    size = len(render_opc_pdf(USER_INFO, "杭州", PROJECTS))
+    first_ms = (time.perf_counter() - start) * 1000
+
+    timings = []
+    for _ in range(args.iterations):
+        start = time.perf_counter()
+        render_opc_pdf(USER_INFO, "杭州", PROJECTS)
+        timings.append((time.perf_counter() - start) * 1000)
+
+    timings.sort()
+    print(f"导入耗时:   {import_ms:.1f} ms")
+    print(f"首次渲染:   {first_ms:.2f} ms")
+    print(f"渲染次数:   {args.iterations}")
+    print(f"平均耗时:   {statistics.mean(timings):.2f} ms")
+    print(f"P50:        {timings[len(timings) // 2]:.2f} ms")
+    print(f"P95:        {timings[int(len(timings) * 0.95) - 1]:.2f} ms")
+    print(f"PDF 大小:   {size / 1024:.1f} KB")
+
+
+if __name__ == "__main__":
+    main()
@@ -38,6 +38,141 @@ import logging
 logger = logging.getLogger(__name__)
 
 
+# 引用 users.id 的子表
+CHILD_TABLES = ['user_profiles', 'recommendations', 'payments', 'service_records']
+
+
+def merge_duplicate_users(engine):
+    """
+    合并 contact_info 重复的用户（保留 id 最小的一条），为唯一索引做准备
+    子表中的 user_id 会改指向保留的用户
+    """
+    ranked = """
+        SELECT id, MIN(id) OVER (PARTITION BY contact_info) AS keep_id
+        FROM users
+    """
+    with engine.begin() as conn:
+        duplicates = conn.execute(text(
+            f"SELECT COUNT(*) FROM ({ranked}) r WHERE r.id <> r.keep_id"
+        )).scalar()
+        if not duplicates:
+            return 0
+
+        logger.warning(f"⚠️  发现 {duplicates} 个重复联系方式的用户，正在合并...")
+        for table in CHILD_TABLES:
+            conn.execute(text(f"""
+                UPDATE {table} SET user_id = r.keep_id
+                FROM ({ranked}) r
+                WHERE {table}.user_id = r.id AND r.id <> r.keep_id
+            """))
+        conn.execute(text(f"""
+            DELETE FROM users u
+            USING ({ranked}) r
+            WHERE u.id = r.id AND r.id <> r.keep_id
+        """))
+        logger.info(f"✓ 已合并 {duplicates} 个重复用户")
+        return duplicates
+
+
+# user_profiles 中合并重复档案时需要保留的字段
+PROFILE_FIELDS = [
+    'target_city', 'skills', 'work_experience', 'interests',
+    'risk_tolerance', 'time_commitment', 'startup_budget',
+]
+
+
+def merge_duplicate_profiles(engine):
+    """
+    合并同一用户的重复档案，为 user_id 唯一索引做准备
+    保留 id 最小的一条（与读取路径一致），各字段取重复档案中最新的非空值
+    """
+    ranked = """
+        SELECT id, user_id, MIN(id) OVER (PARTITION BY user_id) AS keep_id
+        FROM user_profiles
+    """
+    with engine.begin() as conn:
+        rows = conn.execute(text(
+            f"SELECT user_id, id FROM ({ranked}) r WHERE r.id <> r.keep_id ORDER BY user_id, id"
+        )).all()
+        if not rows:
+            return 0
+
+        user_ids = sorted({row.user_id for row in rows})
+        logger.warning(
+            f"⚠️  发现 {len(rows)} 条重复的用户档案，正在合并: "
+            f"user_id={user_ids}, 待删除档案 id={[row.id for row in rows]}"
+        )
+
+        merged = ", ".join(
+            f"{field} = COALESCE(m.{field}, p.{field})" for field in PROFILE_FIELDS
+        )
+        latest = ", ".join(
+            f"(ARRAY_AGG({field} ORDER BY id DESC) FILTER (WHERE {field} IS NOT NULL))[1] AS {field}"
+            for field in PROFILE_FIELDS
+        )
+        conn.execute(text(f"""
+            UPDATE user_profiles p SET {merged}
+            FROM (
+                SELECT MIN(id) AS keep_id, {latest}
+                FROM user_profiles
+                WHERE user_id = ANY(:user_ids)
+                GROUP BY user_id
+            ) m
+            WHERE p.id = m.keep_id
+        """), {"user_ids": user_ids})
+        deleted = conn.execute(text(f"""
+            DELETE FROM user_profiles p
+            USING ({ranked}) r
+            WHERE p.id = r.id AND r.id <> r.keep_id
+        """)).rowcount
+        logger.info(f"✓ 已合并 {deleted} 条重复的用户档案")
+        return deleted
+
+
+# 已被唯一索引取代的旧索引
+OBSOLETE_INDEXES = ['ix_user_profiles_user_id']
+
+
+def migrate_customer_indexes():
+    """
+    为已存在的数据表补建模型中声明的索引（幂等）
+    使用 CREATE INDEX CONCURRENTLY，建索引期间不阻塞线上读写
+    """
+    engine = get_engine()
+    merge_duplicate_users(engine)
+    merge_duplicate_profiles(engine)
+
+    index_names = [index.name for table in Base.metadata.sorted_tables for index in table.indexes]
+
+    # CONCURRENTLY 不能在事务中执行，使用 autocommit 连接
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        # 之前中断的 CONCURRENTLY 会留下无效索引，先删除再重建
+        invalid = conn.execute(text("""
+            SELECT c.relname
+            FROM pg_index i
+            JOIN pg_class c ON c.oid = i.indexrelid
+            WHERE NOT i.indisvalid AND c.relname = ANY(:names)
+        """), {"names": index_names}).scalars().all()
+        for name in invalid:
+            logger.warning(f"⚠️  删除无效索引: {name}")
+            conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+
+        for name in OBSOLETE_INDEXES:
+            conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                columns = ", ".join(column.name for column in index.columns)
+                unique = "UNIQUE " if index.unique else ""
+                conn.execute(text(
+                    f"CREATE {unique}INDEX CONCURRENTLY IF NOT EXISTS {index.name} "
+                    f"ON {table.name} ({columns})"
+                ))
+                logger.info(f"✓ 索引已就绪: {index.name}")
+
+    return True
+
+
 def init_customer_tables():
     """初始化客户信息相关数据表"""
     try:
@@ -70,6 +205,9 @@ def init_customer_tables():
             else:
                 logger.info(f"✓ 所有数据表创建成功: {', '.join(tables)}")
 
+        # create_all 不会修改已存在的表，为旧表补建索引
+        migrate_customer_indexes()
+
         return True
 
     except Exception as e:
@@ -99,6 +237,10 @@ if __name__ == "__main__":
         print("正在初始化客户信息数据表...")
         init_customer_tables()
         print("✓ 初始化完成")
+    elif action == "migrate":
+        print("正在迁移客户信息数据表索引...")
+        migrate_customer_indexes()
+        print("✓ 迁移完成")
     elif action == "drop":
         print("⚠️  警告：即将删除所有客户信息数据表！")
         confirm = input("确认删除？(yes/no): ")
@@ -109,4 +251,4 @@ if __name__ == "__main__":
             print("✓ 已取消")
     else:
         print(f"未知操作: {action}")
-        print("可用操作: init (创建表), drop (删除表)")
+        print("可用操作: init (创建表), migrate (补建索引), drop (删除表)")
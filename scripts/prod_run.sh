@@ -0,0 +1,46 @@
+#!/bin/bash
+# 生产模式启动：gunicorn 多 worker + master 预加载 Agent
+# worker 数、线程数、超时等通过环境变量配置，详见 src/gunicorn_conf.py
+
+set -e
+
+SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
+WORK_DIR="${COZE_WORKSPACE_PATH:-$(dirname "$SCRIPT_DIR")}"
+APP="flask"
+
+usage() {
+  echo "用法: $0 [-p <端口>] [-a <flask|asgi>]"
+  echo ""
+  echo "参数说明:"
+  echo "  -p <端口>        监听端口（默认读取 PORT 环境变量，否则 5000）"
+  echo "  -a <应用>        flask: src/main_flask.py；asgi: src/main.py（默认 flask）"
+  echo "  -h              显示帮助信息"
+}
+
+while getopts "p:a:h" opt; do
+  case "$opt" in
+    p)
+      export PORT="$OPTARG"
+      ;;
+    a)
+      APP="$OPTARG"
+      ;;
+    h)
+      usage
+      exit 0
+      ;;
+    \?)
+      echo "无效选项: -$OPTARG"
+      usage
+      exit 1
+      ;;
+  esac
+done
+
+cd "${WORK_DIR}/src"
+
+if [ "$APP" = "asgi" ]; then
+  exec gunicorn -c gunicorn_conf.py -k uvicorn.workers.UvicornWorker main:app
+else
+  exec gunicorn -c gunicorn_conf.py main_flask:app
+fi
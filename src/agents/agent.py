@@ -1,13 +1,18 @@
 import os
+import re
 import json
+import hashlib
 import logging
-from typing import Annotated
+import threading
+from typing import Annotated, Iterable, Optional
 from langchain.agents import create_agent
+from langchain.agents.middleware import SummarizationMiddleware
 from langchain_openai import ChatOpenAI
 from langgraph.graph import MessagesState
 from langgraph.graph.message import add_messages
-from langchain_core.messages import AnyMessage, SystemMessage, HumanMessage, AIMessage
-from storage.memory.memory_saver import get_memory_saver
+from langchain_core.messages import AnyMessage, BaseMessage, SystemMessage, HumanMessage, AIMessage, ToolMessage
+from agents.prompt_cache import PromptCacheMiddleware, compute_prefix_key
+from storage.memory.memory_saver import get_memory_saver, in_event_loop
 from tools.pdf_generator_simple import generate_opc_pdf_simple
 from tools.simple_payment import SIMPLE_PAYMENT_TOOLS
 from tools.wechat_group_info import get_wechat_group_info
@@ -23,16 +28,80 @@ logger = logging.getLogger(__name__)
 
 LLM_CONFIG = "config/agent_llm_config.json"
 
-# 默认保留最近 20 轮对话 (40 条消息)
-MAX_MESSAGES = 40
+# 对话历史的 token 预算（估算值），超出时从最早的消息开始淘汰
+MAX_HISTORY_TOKENS = int(os.getenv("AGENT_HISTORY_TOKEN_BUDGET", "24000"))
+# 每条消息的固定开销（角色、分隔符等）
+MESSAGE_TOKEN_OVERHEAD = 4
+# 可选：历史接近预算时用 LLM 总结被淘汰的对话（AGENT_SUMMARIZE_HISTORY=true 开启）
+SUMMARIZE_HISTORY = os.getenv("AGENT_SUMMARIZE_HISTORY", "false").lower() in ("1", "true", "yes")
+SUMMARY_TRIGGER_RATIO = 0.8
+SUMMARY_MESSAGES_TO_KEEP = 10
+# Prompt 缓存提示模式：off / key / cache_control（见 agents/prompt_cache.py），环境变量优先于配置文件
+PROMPT_CACHE_MODE = os.getenv("AGENT_PROMPT_CACHE", "")
+
+_CJK_RE = re.compile(r"[\u3000-\u303f\u3400-\u9fff\uf900-\ufaff\uff00-\uffef]+")
+
+
+def _message_text(message: BaseMessage) -> str:
+    content = message.content
+    if isinstance(content, list):
+        parts = []
+        for part in content:
+            if isinstance(part, str):
+                parts.append(part)
+            elif isinstance(part, dict) and isinstance(part.get("text"), str):
+                parts.append(part["text"])
+        text = "".join(parts)
+    else:
+        text = str(content or "")
+    if isinstance(message, AIMessage) and message.tool_calls:
+        text += json.dumps([tc.get("args", {}) for tc in message.tool_calls], ensure_ascii=False)
+    return text
+
+
+def estimate_tokens(message: BaseMessage) -> int:
+    """估算单条消息的 token 数：中文约 1 字 1 token，其他字符约 4 字符 1 token"""
+    text = _message_text(message)
+    cjk = sum(len(m) for m in _CJK_RE.findall(text))
+    return MESSAGE_TOKEN_OVERHEAD + cjk + (len(text) - cjk + 3) // 4
+
+
+def count_message_tokens(messages: Iterable[BaseMessage]) -> int:
+    """估算消息列表的 token 总数"""
+    return sum(estimate_tokens(m) for m in messages if isinstance(m, BaseMessage))
+
 
 def _windowed_messages(old, new):
-    """滑动窗口: 只保留最近 MAX_MESSAGES 条消息"""
+    """
+    按 token 预算裁剪的滑动窗口
+
+    从最新消息往前保留，直到超出 MAX_HISTORY_TOKENS；
+    工具调用（带 tool_calls 的 AIMessage）与其 ToolMessage 结果作为整体保留或淘汰，
+    最新的一组消息无论大小都会保留。
+    """
     combined = add_messages(old, new)
     # 确保返回的是列表类型
     if not isinstance(combined, list):
         return [combined]
-    return combined[-MAX_MESSAGES:] if len(combined) > MAX_MESSAGES else combined
+
+    used = 0
+    kept_from = end = len(combined)
+    while end > 0:
+        start = end - 1
+        # ToolMessage 必须和发起调用的 AIMessage 一起保留
+        while start > 0 and isinstance(combined[start], ToolMessage):
+            start -= 1
+        group_tokens = count_message_tokens(combined[start:end])
+        if used + group_tokens > MAX_HISTORY_TOKENS and end < len(combined):
+            break
+        used += group_tokens
+        kept_from = end = start
+
+    window = combined[kept_from:]
+    # 窗口不能以孤立的工具结果开头
+    while len(window) > 1 and isinstance(window[0], ToolMessage):
+        window = window[1:]
+    return window
 
 class AgentState(MessagesState):
     messages: Annotated[list[AnyMessage], _windowed_messages]
@@ -113,31 +182,60 @@ def get_welcome_message() -> str:
     # 否则使用默认欢迎语
     return WELCOME_MESSAGE
 
-def build_agent(ctx=None):
-    # 使用相对路径，适配不同环境（本地、Render等）
-    # config_path 会相对于当前工作目录解析
-    config_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), LLM_CONFIG)
+# 进程级缓存：解析后的配置（按文件 mtime/size 判断是否变化）和已编译的 Agent 图
+_config_cache: dict = {}
+_agent_cache: dict = {}
+_cache_lock = threading.Lock()
+
+
+def _resolve_config_path() -> str:
+    """定位 LLM 配置文件，适配不同环境（本地、Render等）"""
+    if os.path.isabs(LLM_CONFIG):
+        return LLM_CONFIG
 
-    # 如果相对路径不存在，尝试从项目根目录读取
+    # 优先相对项目根目录解析（src/agents/agent.py -> 项目根目录）
+    project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    config_path = os.path.join(project_root, LLM_CONFIG)
+
+    # 如果不存在，回退到相对当前工作目录
     if not os.path.exists(config_path):
         config_path = LLM_CONFIG
+    return config_path
 
-    logger.info(f"Loading config from: {config_path}")
-    logger.info(f"Current working directory: {os.getcwd()}")
-    logger.info(f"Config file exists: {os.path.exists(config_path)}")
 
-    with open(config_path, 'r', encoding='utf-8') as f:
-        cfg = json.load(f)
+def load_llm_config() -> tuple[dict, str]:
+    """
+    读取 LLM 配置，文件未变化时直接返回缓存
 
-    api_key = os.getenv("COZE_WORKLOAD_IDENTITY_API_KEY")
-    base_url = os.getenv("COZE_INTEGRATION_MODEL_BASE_URL")
+    Returns:
+        (配置内容, 配置文件内容的 sha256)
+    """
+    config_path = _resolve_config_path()
+    stat = os.stat(config_path)
+    stamp = (config_path, stat.st_mtime_ns, stat.st_size)
+
+    cached = _config_cache.get("entry")
+    if cached is not None and cached[0] == stamp:
+        return cached[1], cached[2]
 
+    logger.info(f"Loading config from: {config_path}")
+    with open(config_path, 'rb') as f:
+        raw = f.read()
+    cfg = json.loads(raw.decode('utf-8'))
+    digest = hashlib.sha256(raw).hexdigest()
+    _config_cache["entry"] = (stamp, cfg, digest)
+    return cfg, digest
+
+
+def _create_agent(cfg: dict, api_key, base_url, async_mode: bool):
     llm = ChatOpenAI(
         model=cfg['config'].get("model"),
         api_key=api_key,
         base_url=base_url,
         temperature=cfg['config'].get('temperature', 0.7),
         streaming=True,
+        # 流式输出时也返回 usage，用于统计 prompt 缓存命中
+        stream_usage=True,
         timeout=cfg['config'].get('timeout', 600),
         extra_body={
             "thinking": {
@@ -160,10 +258,67 @@ def build_agent(ctx=None):
         save_recommendations
     ]
 
+    # 系统提示词 + 工具定义是每轮不变的前缀，保持顺序稳定以便服务端缓存
+    prefix_key = compute_prefix_key(cfg.get("sp"), tools)
+    cache_mode = PROMPT_CACHE_MODE or cfg['config'].get('prompt_cache', 'off')
+    middleware = [PromptCacheMiddleware(prefix_key, mode=cache_mode)]
+    if SUMMARIZE_HISTORY:
+        # 在窗口裁剪之前先把较早的对话总结成摘要，避免直接丢失上下文
+        middleware.append(SummarizationMiddleware(
+            model=llm,
+            max_tokens_before_summary=int(MAX_HISTORY_TOKENS * SUMMARY_TRIGGER_RATIO),
+            messages_to_keep=SUMMARY_MESSAGES_TO_KEEP,
+            token_counter=count_message_tokens,
+        ))
+
     return create_agent(
         model=llm,
         system_prompt=cfg.get("sp"),
         tools=tools,
-        checkpointer=get_memory_saver(),
+        middleware=middleware,
+        checkpointer=get_memory_saver(async_mode),
         state_schema=AgentState,
     )
+
+
+def build_agent(ctx=None, async_mode: Optional[bool] = None):
+    """
+    获取 Agent（进程级缓存）
+
+    配置文件内容或模型凭据不变时复用同一个已编译的 Agent 图及其 LLM 客户端（连接池），
+    配置文件修改后下一次调用自动重新构建（热加载）。
+    async_mode 决定 checkpointer 类型（见 get_memory_saver），同步 / 异步调用方各自缓存一份，
+    不会把持有同步 PostgresSaver 的图交给 ainvoke / astream；为 None 时按当前是否在事件循环中判断
+    """
+    cfg, digest = load_llm_config()
+
+    api_key = os.getenv("COZE_WORKLOAD_IDENTITY_API_KEY")
+    base_url = os.getenv("COZE_INTEGRATION_MODEL_BASE_URL")
+    if async_mode is None:
+        async_mode = in_event_loop()
+    cache_key = (digest, api_key, base_url, async_mode)
+
+    agent = _agent_cache.get(cache_key)
+    if agent is not None:
+        return agent
+
+    with _cache_lock:
+        agent = _agent_cache.get(cache_key)
+        if agent is None:
+            logger.info(f"Building agent graph (config sha256={digest[:12]}, async={async_mode})")
+            agent = _create_agent(cfg, api_key, base_url, async_mode)
+            # 只保留当前配置对应的 Agent，旧版本随配置变更释放
+            for key in [k for k in _agent_cache if k[:3] != cache_key[:3]]:
+                del _agent_cache[key]
+            _agent_cache[cache_key] = agent
+        return agent
+
+    with _cache_lock:
+        agent = _agent_cache.get(cache_key)
+        if agent is None:
+            logger.info(f"Building agent graph (config sha256={digest[:12]})")
+            agent = _create_agent(cfg, api_key, base_url)
+            # 只保留当前配置对应的 Agent，旧版本随配置变更释放
+            _agent_cache.clear()
+            _agent_cache[cache_key] = agent
+        return agent
@@ -0,0 +1,123 @@
+"""
+Prompt 缓存
+系统提示词 + 工具定义构成每轮请求中不变的前缀，这里负责：
+1. 为静态前缀生成稳定的缓存 key，并按配置附加缓存提示（prompt_cache_key / cache_control）
+2. 统计每次模型调用的缓存命中情况和节省的输入 token
+"""
+import json
+import hashlib
+import logging
+import threading
+from typing import Any, Dict, Optional
+
+from langchain.agents.middleware import AgentMiddleware
+from langchain_core.messages import AIMessage, SystemMessage
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+logger = logging.getLogger(__name__)
+
+# 缓存提示模式
+#   off:           不附加任何提示，仅统计（服务端自动前缀缓存仍然生效）
+#   key:           附加 prompt_cache_key，让相同前缀的请求路由到同一缓存
+#   cache_control: 在 key 的基础上，给系统提示词加 cache_control: ephemeral 标记
+PROMPT_CACHE_MODES = ("off", "key", "cache_control")
+
+
+class PromptCacheStats:
+    """进程级 prompt 缓存统计"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.hits = 0
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+
+    def record(self, prompt_tokens: int, cached_tokens: int) -> None:
+        with self._lock:
+            self.requests += 1
+            self.prompt_tokens += prompt_tokens
+            self.cached_tokens += cached_tokens
+            if cached_tokens > 0:
+                self.hits += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "hits": self.hits,
+                "misses": self.requests - self.hits,
+                "hit_rate": round(self.hits / self.requests, 4) if self.requests else 0.0,
+                "prompt_tokens": self.prompt_tokens,
+                "cached_tokens": self.cached_tokens,
+                "cached_token_ratio": round(self.cached_tokens / self.prompt_tokens, 4) if self.prompt_tokens else 0.0,
+            }
+
+
+prompt_cache_stats = PromptCacheStats()
+
+
+def compute_prefix_key(system_prompt: Optional[str], tools: list) -> str:
+    """根据系统提示词和工具定义计算静态前缀的 key"""
+    schemas = [convert_to_openai_tool(tool) for tool in tools]
+    raw = json.dumps({"sp": system_prompt or "", "tools": schemas}, ensure_ascii=False, sort_keys=True)
+    return "opc-" + hashlib.sha256(raw.encode("utf-8")).hexdigest()[:24]
+
+
+class PromptCacheMiddleware(AgentMiddleware):
+    """保持请求前缀稳定、附加缓存提示，并记录缓存命中情况"""
+
+    def __init__(self, prefix_key: str, mode: str = "off"):
+        super().__init__()
+        if mode not in PROMPT_CACHE_MODES:
+            logger.warning(f"Unknown prompt cache mode '{mode}', fallback to 'off'")
+            mode = "off"
+        self.prefix_key = prefix_key
+        self.mode = mode
+
+    def _prepare(self, request):
+        if self.mode == "off":
+            return request
+
+        model_settings = {**request.model_settings, "prompt_cache_key": self.prefix_key}
+        if self.mode == "cache_control" and request.system_prompt:
+            system_message = SystemMessage(content=[{
+                "type": "text",
+                "text": request.system_prompt,
+                "cache_control": {"type": "ephemeral"},
+            }])
+            return request.override(
+                system_prompt=None,
+                messages=[system_message, *request.messages],
+                model_settings=model_settings,
+            )
+        return request.override(model_settings=model_settings)
+
+    def _record(self, response) -> None:
+        messages = response.result if hasattr(response, "result") else [response]
+        for message in messages:
+            if not isinstance(message, AIMessage) or not message.usage_metadata:
+                continue
+            usage = message.usage_metadata
+            prompt_tokens = usage.get("input_tokens", 0) or 0
+            cached_tokens = (usage.get("input_token_details") or {}).get("cache_read", 0) or 0
+            prompt_cache_stats.record(prompt_tokens, cached_tokens)
+            logger.info(
+                f"Prompt cache {'hit' if cached_tokens else 'miss'}: "
+                f"prompt_tokens={prompt_tokens}, cached_tokens={cached_tokens}, key={self.prefix_key}"
+            )
+
+    def wrap_model_call(self, request, handler):
+        response = handler(self._prepare(request))
+        self._record(response)
+        return response
+
+    async def awrap_model_call(self, request, handler):
+        response = await handler(self._prepare(request))
+        self._record(response)
+        return response
+
+
+def get_prompt_cache_stats() -> Dict[str, Any]:
+    """获取 prompt 缓存统计"""
+    return prompt_cache_stats.snapshot()
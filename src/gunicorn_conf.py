@@ -0,0 +1,77 @@
+"""
+gunicorn 生产环境配置
+
+用法（在 src 目录下）：
+    gunicorn -c gunicorn_conf.py main_flask:app
+    gunicorn -c gunicorn_conf.py -k uvicorn.workers.UvicornWorker main:app
+
+环境变量：
+    PORT              监听端口（默认 5000）
+    WEB_CONCURRENCY   worker 进程数（配置了数据库时默认等于可用 CPU 核数，否则默认 1）
+    WEB_THREADS       每个 worker 的线程数（gthread，默认 8，流式响应会占用线程）
+    WEB_TIMEOUT       请求超时时间（秒，默认 900）
+    WEB_PRELOAD       是否在 master 中预加载应用、工具模块和字体（默认 true）
+    DB_MAX_CONNECTIONS 所有 worker 合计的数据库连接上限（见 storage/database/db.py）
+"""
+import os
+import logging
+
+
+def _cpu_count() -> int:
+    """容器内优先使用可调度的 CPU 数"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def _default_workers() -> int:
+    """
+    会话历史保存在 checkpointer 中：配置了数据库时各 worker 共用 PostgresSaver，可以按 CPU 核数开多进程；
+    没有数据库时退化为进程内的 MemorySaver，请求又没有会话粘滞，多 worker 会把同一会话的历史拆散，只开 1 个
+    """
+    if os.getenv("DATABASE_URL") or os.getenv("PGDATABASE_URL"):
+        return _cpu_count()
+    return 1
+
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", str(_default_workers())))
+if workers > 1 and _default_workers() == 1:
+    logging.getLogger("gunicorn.error").warning(
+        f"WEB_CONCURRENCY={workers} without DATABASE_URL: checkpointer is in-memory per worker, "
+        "conversation history will be split across workers"
+    )
+# worker 继承该变量，数据库连接池按 worker 数平分 DB_MAX_CONNECTIONS
+os.environ["WEB_CONCURRENCY"] = str(workers)
+worker_class = os.getenv("WEB_WORKER_CLASS", "gthread")
+threads = int(os.getenv("WEB_THREADS", "8"))
+timeout = int(os.getenv("WEB_TIMEOUT", "900"))
+graceful_timeout = 30
+keepalive = 5
+preload_app = os.getenv("WEB_PRELOAD", "true").lower() in ("1", "true", "yes")
+
+accesslog = "-"
+errorlog = "-"
+
+
+def when_ready(server):
+    """master 就绪后预加载模块和字体：worker fork 时直接继承（不在 master 中创建任何连接）"""
+    if preload_app:
+        from warmup import preload_modules
+        preload_modules()
+        server.log.info("Module preload finished in master process")
+
+
+def post_worker_init(worker):
+    """每个 worker 启动后各自构建 Agent 和连接池；未开启预加载时同时导入模块"""
+    from warmup import preload_modules, warmup_worker
+    if not preload_app:
+        preload_modules()
+    warmup_worker()
+
+
+def post_fork(server, worker):
+    """fork 之后丢弃从 master 继承的连接池和 Agent，避免多个进程共享同一 socket"""
+    from warmup import reset_after_fork
+    reset_after_fork()
@@ -1,6 +1,7 @@
 import argparse
 import asyncio
 import json
+import os
 import threading
 import traceback
 import logging
@@ -240,6 +241,26 @@ app = FastAPI()
 openai_handler = OpenAIChatHandler(service)
 
 
+@app.on_event("startup")
+async def prebuild_agent():
+    """在事件循环内预构建 Agent：异步 checkpointer 的连接池需绑定到服务的事件循环"""
+    if not graph_helper.is_agent_proj():
+        return
+    try:
+        from agents.agent import build_agent
+        build_agent(async_mode=True)
+        logger.info("Agent graph preloaded")
+    except Exception as e:
+        logger.warning(f"Failed to preload agent graph: {e}")
+
+
+@app.on_event("shutdown")
+async def close_async_db():
+    """服务退出时关闭异步数据库连接池"""
+    from storage.database.db import dispose_async_engine
+    await dispose_async_engine()
+
+
 @app.post("/run")
 async def http_run(request: Request) -> Dict[str, Any]:
     global result
@@ -493,10 +514,12 @@ def parse_input(input_str: str) -> Dict[str, Any]:
         return {"text": input_str}
 
 def start_http_server(port):
-    workers = 1
+    # 多 worker 通过 WEB_CONCURRENCY 配置；开发环境热重载只支持单进程
+    workers = int(os.getenv("WEB_CONCURRENCY", "1"))
     reload = False
     if graph_helper.is_dev_env():
         reload = True
+        workers = 1
 
     logger.info(f"Start HTTP Server, Port: {port}, Workers: {workers}")
     uvicorn.run("main:app", host="0.0.0.0", port=port, reload=reload, workers=workers)
@@ -1,27 +1,57 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context
 import os
+import re
 import sys
+import json
+import uuid
 
 # 添加项目根目录到Python路径
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
 from agents.agent import build_agent
-from langgraph.checkpoint.memory import MemorySaver
+from agents.prompt_cache import get_prompt_cache_stats
+from langchain_core.messages import AIMessage, AIMessageChunk, ToolMessage
 
 app = Flask(__name__)
 
 # 初始化 Agent
 agent = None
-checkpointer = None
+
+# 会话配置：每个浏览器一个 session id，对应一个独立的 LangGraph thread
+SESSION_COOKIE_NAME = 'opc_session_id'
+SESSION_COOKIE_MAX_AGE = 30 * 24 * 60 * 60  # 30天
+_SESSION_ID_RE = re.compile(r'^[0-9a-f]{32}$')
 
 def init_agent():
     """初始化 Agent（延迟加载）"""
-    global agent, checkpointer
+    global agent
     if agent is None:
-        agent = build_agent()
-        checkpointer = MemorySaver()
+        # checkpointer 由 build_agent 内部的 get_memory_saver() 提供；Flask 同步调用 Agent，使用同步 PostgresSaver
+        agent = build_agent(async_mode=False)
     return agent
 
+def get_session_id() -> str:
+    """从 Cookie 读取会话ID，不存在或格式非法时生成新的"""
+    session_id = request.cookies.get(SESSION_COOKIE_NAME, '')
+    if not _SESSION_ID_RE.match(session_id):
+        session_id = uuid.uuid4().hex
+    return session_id
+
+def get_thread_config(session_id: str) -> dict:
+    """每个会话使用独立的 thread_id，只加载自己的 checkpoint"""
+    return {"configurable": {"thread_id": f"web:{session_id}"}}
+
+def attach_session_cookie(response, session_id: str):
+    """把会话ID写回浏览器 Cookie"""
+    response.set_cookie(
+        SESSION_COOKIE_NAME,
+        session_id,
+        max_age=SESSION_COOKIE_MAX_AGE,
+        httponly=True,
+        samesite='Lax',
+    )
+    return response
+
 @app.route('/')
 def index():
     """主页 - 聊天界面"""
@@ -341,6 +371,15 @@ def index():
                 margin: 0 3px;
                 animation: typing 1.4s infinite ease-in-out;
             }
+            .typing-indicator .tool-status {
+                display: none;
+                margin-top: 8px;
+                font-size: 13px;
+                color: #666;
+            }
+            .typing-indicator .tool-status.active {
+                display: block;
+            }
             .typing-indicator span:nth-child(1) { animation-delay: 0s; }
             .typing-indicator span:nth-child(2) { animation-delay: 0.2s; }
             .typing-indicator span:nth-child(3) { animation-delay: 0.4s; }
@@ -505,6 +544,7 @@ def index():
             <span></span>
             <span></span>
             <span></span>
+            <div class="tool-status" id="toolStatus"></div>
         </div>
 
         <div class="chat-input-area">
@@ -528,6 +568,7 @@ def index():
             const messageInput = document.getElementById('messageInput');
             const sendButton = document.getElementById('sendButton');
             const typingIndicator = document.getElementById('typingIndicator');
+            const toolStatus = document.getElementById('toolStatus');
 
             function addMessage(content, isUser) {
                 const messageDiv = document.createElement('div');
@@ -540,6 +581,7 @@ def index():
                 messageDiv.appendChild(bubble);
                 chatMessages.appendChild(messageDiv);
                 chatMessages.scrollTop = chatMessages.scrollHeight;
+                return bubble;
             }
 
             function showTyping() {
@@ -550,6 +592,31 @@ def index():
 
             function hideTyping() {
                 typingIndicator.classList.remove('active');
+                setToolStatus('');
+            }
+
+            function setToolStatus(text) {
+                toolStatus.textContent = text;
+                toolStatus.classList.toggle('active', !!text);
+            }
+
+            // 解析一条 SSE 事件（event: xxx / data: {...}）
+            function parseSSEEvent(raw) {
+                let event = 'message';
+                const dataLines = [];
+                raw.split('\\n').forEach(function(line) {
+                    if (line.startsWith('event:')) {
+                        event = line.slice(6).trim();
+                    } else if (line.startsWith('data:')) {
+                        dataLines.push(line.slice(5).trim());
+                    }
+                });
+                if (!dataLines.length) return null;
+                try {
+                    return { event: event, data: JSON.parse(dataLines.join('\\n')) };
+                } catch (e) {
+                    return null;
+                }
             }
 
             async function sendMessage() {
@@ -565,8 +632,29 @@ def index():
                 showTyping();
                 sendButton.disabled = true;
 
+                let bubble = null;
+                let reply = '';
+                let needBreak = false;
+
+                function appendReply(text) {
+                    if (!bubble) {
+                        bubble = addMessage('', false);
+                    }
+                    if (needBreak && reply) {
+                        reply += '\\n\\n';
+                    }
+                    needBreak = false;
+                    reply += text;
+                    bubble.innerHTML = reply.replace(/\\n/g, '<br>');
+                    // 保持输入指示器在最新回复之后
+                    if (typingIndicator.classList.contains('active')) {
+                        chatMessages.appendChild(typingIndicator);
+                    }
+                    chatMessages.scrollTop = chatMessages.scrollHeight;
+                }
+
                 try {
-                    const response = await fetch('/api/chat', {
+                    const response = await fetch('/api/chat/stream', {
                         method: 'POST',
                         headers: {
                             'Content-Type': 'application/json',
@@ -574,14 +662,43 @@ def index():
                         body: JSON.stringify({ message: message })
                     });
 
-                    const data = await response.json();
-                    
-                    hideTyping();
+                    if (!response.ok || !response.body) {
+                        const data = await response.json().catch(() => ({}));
+                        throw new Error(data.error || ('HTTP ' + response.status));
+                    }
 
-                    if (data.success) {
-                        addMessage(data.reply, false);
-                    } else {
-                        addMessage('抱歉，发生了错误：' + data.error, false);
+                    const reader = response.body.getReader();
+                    const decoder = new TextDecoder('utf-8');
+                    let buffer = '';
+
+                    while (true) {
+                        const { value, done } = await reader.read();
+                        if (done) break;
+                        buffer += decoder.decode(value, { stream: true });
+
+                        let sep;
+                        while ((sep = buffer.indexOf('\\n\\n')) !== -1) {
+                            const evt = parseSSEEvent(buffer.slice(0, sep));
+                            buffer = buffer.slice(sep + 2);
+                            if (!evt) continue;
+
+                            if (evt.event === 'token') {
+                                appendReply(evt.data.content || '');
+                            } else if (evt.event === 'tool_start') {
+                                needBreak = true;
+                                showTyping();
+                                setToolStatus('🔧 正在处理：' + (evt.data.name || '工具调用') + ' ...');
+                            } else if (evt.event === 'tool_end') {
+                                setToolStatus('');
+                            } else if (evt.event === 'error') {
+                                appendReply('\\n\\n抱歉，发生了错误：' + evt.data.error);
+                            }
+                        }
+                    }
+
+                    hideTyping();
+                    if (!bubble) {
+                        addMessage('抱歉，没有收到回复，请稍后重试。', false);
                     }
                 } catch (error) {
                     hideTyping();
@@ -702,16 +819,17 @@ def chat():
         current_agent = init_agent()
 
         # 调用 Agent
-        config = {"configurable": {"thread_id": "default"}}
+        session_id = get_session_id()
+        config = get_thread_config(session_id)
         response = current_agent.invoke({"messages": [message]}, config)
 
         # 提取回复
         reply = response['messages'][-1].content
 
-        return jsonify({
+        return attach_session_cookie(jsonify({
             'success': True,
             'reply': reply
-        })
+        }), session_id)
 
     except Exception as e:
         import traceback
@@ -721,11 +839,94 @@ def chat():
             'error': str(e)
         }), 500
 
+def _sse_event(event: str, data: dict) -> str:
+    """格式化一条 SSE 事件"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+
+def _stream_agent_events(current_agent, message: str, config: dict):
+    """
+    逐步产出 Agent 运行事件（SSE 格式）
+
+    - token: 模型生成的文本增量
+    - tool_start / tool_end: 工具调用进度
+    - done / error: 结束或异常
+    """
+    try:
+        for mode, chunk in current_agent.stream(
+            {"messages": [message]},
+            config,
+            stream_mode=["messages", "updates"],
+        ):
+            if mode == "messages":
+                msg, metadata = chunk
+                # 只推送模型节点的文本增量（不包含历史摘要等内部调用），工具结果通过 updates 事件推送
+                if metadata.get("langgraph_node", "model") != "model":
+                    continue
+                if isinstance(msg, AIMessageChunk) and isinstance(msg.content, str) and msg.content:
+                    yield _sse_event("token", {"content": msg.content})
+            elif mode == "updates":
+                for _node, update in (chunk or {}).items():
+                    if not isinstance(update, dict):
+                        continue
+                    for msg in update.get("messages", []) or []:
+                        if isinstance(msg, AIMessage) and msg.tool_calls:
+                            for tool_call in msg.tool_calls:
+                                yield _sse_event("tool_start", {"name": tool_call.get("name")})
+                        elif isinstance(msg, ToolMessage):
+                            yield _sse_event("tool_end", {"name": msg.name})
+
+        yield _sse_event("done", {})
+
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        yield _sse_event("error", {"error": str(e)})
+
+
+@app.route('/api/chat/stream', methods=['POST'])
+def chat_stream():
+    """流式聊天接口（SSE），边生成边推送"""
+    data = request.json or {}
+    message = data.get('message', '')
+
+    if not message:
+        return jsonify({'error': '请提供消息内容'}), 400
+
+    # 初始化 Agent
+    current_agent = init_agent()
+    session_id = get_session_id()
+    config = get_thread_config(session_id)
+
+    response = Response(
+        stream_with_context(_stream_agent_events(current_agent, message, config)),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            # 关闭反向代理缓冲，保证首个 token 立即送达
+            'X-Accel-Buffering': 'no',
+        }
+    )
+    return attach_session_cookie(response, session_id)
+
 @app.route('/api/health')
 def health():
     """健康检查"""
     return jsonify({'status': 'ok', 'service': 'opc-agent'})
 
+@app.route('/api/metrics')
+def metrics():
+    """运行指标"""
+    from storage.database.db import get_pool_stats
+    from utils.pdf.pdf_cache import get_pdf_cache_stats
+    from utils.pdf.render_pool import get_render_pool_stats
+    return jsonify({
+        'prompt_cache': get_prompt_cache_stats(),
+        'db_pool': get_pool_stats(),
+        'pdf_render': get_render_pool_stats(),
+        'pdf_cache': get_pdf_cache_stats(),
+    })
+
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
     # 生产环境：关闭调试模式，使用多线程
@@ -1,26 +1,121 @@
 """
 客户信息CRUD操作
 """
+from sqlalchemy import DateTime, func, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.orm import Session
 from typing import Optional, List, Dict, Any
+from collections import OrderedDict
 from datetime import datetime
+import copy
 import logging
+import os
+import threading
+import time
 
 from storage.database.db import get_session
 from storage.database.customer_models import User, UserProfile, Recommendation, Payment, ServiceRecord
 
 logger = logging.getLogger(__name__)
 
+# 客户摘要读缓存（进程内，按联系方式缓存）
+# 本模块的写操作只能失效本进程的条目，其他 worker 进程的写入要等 TTL 过期才可见：
+# 单进程时失效是准确的，默认缓存 300 秒；多 worker（WEB_CONCURRENCY>1）时默认只缓存 5 秒，
+# 只用来合并同一轮对话中的重复查询，其他进程写入后最多 5 秒读到新数据
+_WORKERS = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+SUMMARY_CACHE_TTL = float(os.getenv("CUSTOMER_SUMMARY_CACHE_TTL", "300" if _WORKERS == 1 else "5"))
+SUMMARY_CACHE_SIZE = int(os.getenv("CUSTOMER_SUMMARY_CACHE_SIZE", "1024"))
+
+_summary_cache: "OrderedDict[str, tuple]" = OrderedDict()  # contact_info -> (expires_at, summary)
+_summary_cache_users: Dict[int, str] = {}  # user_id -> contact_info
+_summary_cache_lock = threading.Lock()
+_summary_cache_version = 0  # 每次失效递增，防止并发读把失效前的旧数据写回缓存
+
+
+def _summary_cache_token() -> int:
+    """读取前记录缓存版本，写回缓存时用于判断期间是否发生过失效"""
+    return _summary_cache_version
+
+
+def _cache_get_summary(contact_info: str) -> Optional[Dict[str, Any]]:
+    with _summary_cache_lock:
+        entry = _summary_cache.get(contact_info)
+        if entry is None:
+            return None
+        expires_at, summary = entry
+        if expires_at < time.monotonic():
+            _summary_cache.pop(contact_info, None)
+            _summary_cache_users.pop(summary['user']['id'], None)
+            return None
+        _summary_cache.move_to_end(contact_info)
+        return copy.deepcopy(summary)
+
+
+def _cache_put_summary(contact_info: str, summary: Dict[str, Any], version: int) -> None:
+    if SUMMARY_CACHE_TTL <= 0 or SUMMARY_CACHE_SIZE <= 0:
+        return
+    with _summary_cache_lock:
+        if version != _summary_cache_version:
+            return
+        _summary_cache[contact_info] = (time.monotonic() + SUMMARY_CACHE_TTL, copy.deepcopy(summary))
+        _summary_cache.move_to_end(contact_info)
+        _summary_cache_users[summary['user']['id']] = contact_info
+        while len(_summary_cache) > SUMMARY_CACHE_SIZE:
+            _, (_, evicted) = _summary_cache.popitem(last=False)
+            _summary_cache_users.pop(evicted['user']['id'], None)
+
+
+def invalidate_customer_summary(contact_info: Optional[str] = None, user_id: Optional[int] = None) -> None:
+    """失效客户摘要缓存（按联系方式或用户ID）"""
+    global _summary_cache_version
+    with _summary_cache_lock:
+        _summary_cache_version += 1
+        if contact_info is None and user_id is not None:
+            contact_info = _summary_cache_users.get(user_id)
+        if contact_info is None:
+            return
+        entry = _summary_cache.pop(contact_info, None)
+        if entry is not None:
+            _summary_cache_users.pop(entry[1]['user']['id'], None)
+
+
+def clear_customer_summary_cache() -> None:
+    """清空客户摘要缓存"""
+    global _summary_cache_version
+    with _summary_cache_lock:
+        _summary_cache_version += 1
+        _summary_cache.clear()
+        _summary_cache_users.clear()
+
 
 # ==================== 用户操作 ====================
 
+def _user_upsert_stmt(contact_info: str):
+    """
+    按联系方式插入用户，已存在时只刷新活跃时间（INSERT ... ON CONFLICT DO UPDATE ... RETURNING id）
+
+    单条语句完成"查询或创建"，并发保存同一联系方式也不会产生重复用户
+    """
+    stmt = pg_insert(User).values(contact_info=contact_info)
+    return stmt.on_conflict_do_update(
+        index_elements=[User.contact_info],
+        # ON CONFLICT 不会触发 onupdate，需要显式更新 updated_at
+        set_={"last_active_at": func.now(), "updated_at": func.now()},
+    ).returning(User.id)
+
+
+def _upsert_user(session: Session, contact_info: str) -> int:
+    """插入或刷新用户，返回用户ID"""
+    return session.execute(_user_upsert_stmt(contact_info)).scalar_one()
+
+
 def create_user(contact_info: str) -> User:
-    """创建用户"""
+    """创建用户（联系方式已存在时返回已有用户）"""
     with get_session() as session:
-        user = User(contact_info=contact_info)
-        session.add(user)
+        user_id = _upsert_user(session, contact_info)
         session.commit()
-        session.refresh(user)
+        user = session.get(User, user_id)
+        invalidate_customer_summary(contact_info)
         logger.info(f"✓ 创建用户成功: {contact_info}")
         return user
 
@@ -44,11 +139,29 @@ def update_user_last_active(user_id: int):
         if user:
             user.last_active_at = datetime.now()
             session.commit()
+            invalidate_customer_summary(user_id=user_id)
             logger.debug(f"✓ 更新用户活跃时间: {user_id}")
 
 
 # ==================== 用户档案操作 ====================
 
+def _profile_upsert_stmt(user_id: int, values: Dict[str, Any]):
+    """插入用户档案，已存在时只更新非空字段（INSERT ... ON CONFLICT DO UPDATE ... RETURNING id）"""
+    values = {k: v for k, v in values.items() if v is not None}
+    stmt = pg_insert(UserProfile).values(user_id=user_id, **values)
+    # 没有需要更新的字段时做一次空更新，保证 RETURNING 能返回已有档案
+    update_values = {k: stmt.excluded[k] for k in values} or {'user_id': stmt.excluded.user_id}
+    return stmt.on_conflict_do_update(
+        index_elements=[UserProfile.user_id],
+        set_=update_values,
+    ).returning(UserProfile.id)
+
+
+def _upsert_profile(session: Session, user_id: int, values: Dict[str, Any]) -> int:
+    """插入或更新用户档案，返回档案ID"""
+    return session.execute(_profile_upsert_stmt(user_id, values)).scalar_one()
+
+
 def create_user_profile(
     user_id: int,
     target_city: Optional[str] = None,
@@ -59,21 +172,20 @@ def create_user_profile(
     time_commitment: Optional[str] = None,
     startup_budget: Optional[float] = None
 ) -> UserProfile:
-    """创建用户档案"""
+    """创建用户档案（已存在时更新传入的非空字段）"""
     with get_session() as session:
-        profile = UserProfile(
-            user_id=user_id,
-            target_city=target_city,
-            skills=skills,
-            work_experience=work_experience,
-            interests=interests,
-            risk_tolerance=risk_tolerance,
-            time_commitment=time_commitment,
-            startup_budget=startup_budget
-        )
-        session.add(profile)
+        profile_id = _upsert_profile(session, user_id, {
+            'target_city': target_city,
+            'skills': skills,
+            'work_experience': work_experience,
+            'interests': interests,
+            'risk_tolerance': risk_tolerance,
+            'time_commitment': time_commitment,
+            'startup_budget': startup_budget,
+        })
         session.commit()
-        session.refresh(profile)
+        profile = session.get(UserProfile, profile_id)
+        invalidate_customer_summary(user_id=user_id)
         logger.info(f"✓ 创建用户档案成功: user_id={user_id}")
         return profile
 
@@ -114,6 +226,7 @@ def update_user_profile(
                 profile.startup_budget = startup_budget
             session.commit()
             session.refresh(profile)
+            invalidate_customer_summary(user_id=user_id)
             logger.info(f"✓ 更新用户档案成功: user_id={user_id}")
             return profile
         return None
@@ -142,6 +255,7 @@ def create_recommendation(
         session.add(recommendation)
         session.commit()
         session.refresh(recommendation)
+        invalidate_customer_summary(user_id=user_id)
         logger.info(f"✓ 创建推荐记录成功: user_id={user_id}, project={project_name}")
         return recommendation
 
@@ -175,6 +289,7 @@ def create_payment(
         session.add(payment)
         session.commit()
         session.refresh(payment)
+        invalidate_customer_summary(user_id=user_id)
         logger.info(f"✓ 创建支付记录成功: user_id={user_id}, amount={amount}")
         return payment
 
@@ -187,6 +302,7 @@ def update_payment_status(payment_id: int, status: str) -> Optional[Payment]:
             payment.payment_status = status
             session.commit()
             session.refresh(payment)
+            invalidate_customer_summary(user_id=payment.user_id)
             logger.info(f"✓ 更新支付状态成功: payment_id={payment_id}, status={status}")
             return payment
         return None
@@ -223,6 +339,7 @@ def create_service_record(
         session.add(record)
         session.commit()
         session.refresh(record)
+        invalidate_customer_summary(user_id=user_id)
         logger.info(f"✓ 创建服务记录成功: user_id={user_id}")
         return record
 
@@ -244,6 +361,7 @@ def update_service_record(
                     record.group_joined_at = datetime.now()
             session.commit()
             session.refresh(record)
+            invalidate_customer_summary(user_id=record.user_id)
             logger.info(f"✓ 更新服务记录成功: record_id={record_id}")
             return record
         return None
@@ -270,46 +388,35 @@ def save_customer_info(
     """
     保存完整客户信息（用户+档案）
 
+    在同一个事务中用 INSERT ... ON CONFLICT DO UPDATE 写入用户和档案，
+    档案已存在时只更新传入的非空字段
+
     Returns:
         Dict containing user_id and profile_id
     """
-    # 创建或获取用户
-    user = get_user_by_contact(contact_info)
-    if not user:
-        user = create_user(contact_info)
-
-    # 创建或更新用户档案
-    profile = get_user_profile(user.id)
-    if profile:
-        profile = update_user_profile(
-            user.id,
-            target_city=target_city,
-            skills=skills,
-            work_experience=work_experience,
-            interests=interests,
-            risk_tolerance=risk_tolerance,
-            time_commitment=time_commitment,
-            startup_budget=startup_budget
-        )
-    else:
-        profile = create_user_profile(
-            user.id,
-            target_city=target_city,
-            skills=skills,
-            work_experience=work_experience,
-            interests=interests,
-            risk_tolerance=risk_tolerance,
-            time_commitment=time_commitment,
-            startup_budget=startup_budget
-        )
+    with get_session() as session:
+        # 创建或获取用户（同时更新最后活跃时间）
+        user_id = _upsert_user(session, contact_info)
+
+        # 创建或更新用户档案
+        profile_id = _upsert_profile(session, user_id, {
+            'target_city': target_city,
+            'skills': skills,
+            'work_experience': work_experience,
+            'interests': interests,
+            'risk_tolerance': risk_tolerance,
+            'time_commitment': time_commitment,
+            'startup_budget': startup_budget,
+        })
 
-    # 更新最后活跃时间
-    update_user_last_active(user.id)
+        session.commit()
+        invalidate_customer_summary(contact_info)
+        logger.info(f"✓ 保存客户信息成功: user_id={user_id}, profile_id={profile_id}")
 
     return {
-        'user_id': user.id,
-        'profile_id': profile.id,
-        'contact_info': user.contact_info
+        'user_id': user_id,
+        'profile_id': profile_id,
+        'contact_info': contact_info
     }
 
 
@@ -324,38 +431,88 @@ def save_payment_and_service(
     """
     保存支付信息和服务记录
 
+    用户查询/创建、支付记录、服务记录在同一个事务中写入
+
     Returns:
         Dict containing payment_id and service_record_id
     """
-    # 获取或创建用户
-    user = get_user_by_contact(contact_info)
-    if not user:
-        user = create_user(contact_info)
-
-    # 创建支付记录
-    payment = create_payment(
-        user.id,
-        amount=amount,
-        payment_method=payment_method,
-        payment_proof=payment_proof,
-        payment_status='paid'  # 假设已确认支付
-    )
-
-    # 创建服务记录
-    service_record = create_service_record(
-        user.id,
-        payment_id=payment.id,
-        pdf_url=pdf_url,
-        group_joined=group_joined
-    )
-
-    # 更新最后活跃时间
-    update_user_last_active(user.id)
+    with get_session() as session:
+        # 获取或创建用户（同时更新最后活跃时间）
+        user_id = _upsert_user(session, contact_info)
 
+        # 创建支付记录
+        payment = Payment(
+            user_id=user_id,
+            amount=amount,
+            payment_method=payment_method,
+            payment_proof=payment_proof,
+            payment_status='paid'  # 假设已确认支付
+        )
+        session.add(payment)
+        session.flush()
+
+        # 创建服务记录
+        service_record = ServiceRecord(
+            user_id=user_id,
+            payment_id=payment.id,
+            pdf_url=pdf_url,
+            group_joined=group_joined
+        )
+        session.add(service_record)
+        session.flush()
+
+        result = {
+            'user_id': user_id,
+            'payment_id': payment.id,
+            'service_record_id': service_record.id
+        }
+        session.commit()
+        invalidate_customer_summary(contact_info)
+        logger.info(f"✓ 保存支付和服务记录成功: user_id={user_id}, amount={amount}")
+
+    return result
+
+
+# 一条语句取回客户摘要：用户行 + 以 JSON 聚合的档案、推荐、支付、服务记录
+_CUSTOMER_SUMMARY_SQL = text("""
+    SELECT
+        row_to_json(u) AS "user",
+        (SELECT row_to_json(p) FROM user_profiles p
+         WHERE p.user_id = u.id ORDER BY p.id LIMIT 1) AS profile,
+        (SELECT COALESCE(json_agg(r ORDER BY r.created_at, r.id), '[]'::json) FROM recommendations r
+         WHERE r.user_id = u.id) AS recommendations,
+        (SELECT COALESCE(json_agg(pm ORDER BY pm.created_at, pm.id), '[]'::json) FROM payments pm
+         WHERE pm.user_id = u.id) AS payments,
+        (SELECT row_to_json(s) FROM service_records s
+         WHERE s.user_id = u.id ORDER BY s.id LIMIT 1) AS service_record
+    FROM users u
+    WHERE u.contact_info = :contact_info
+""")
+
+
+def _model_from_json(model_cls, data: Optional[Dict[str, Any]]):
+    """把 row_to_json 的结果还原为模型对象（时间字段转回 datetime），以复用 to_dict 的输出格式"""
+    if data is None:
+        return None
+    values = {}
+    for column in model_cls.__table__.columns:
+        value = data.get(column.name)
+        if value is not None and isinstance(column.type, DateTime):
+            value = datetime.fromisoformat(value)
+        values[column.key] = value
+    return model_cls(**values)
+
+
+def _summary_from_row(row) -> Dict[str, Any]:
+    """把摘要查询的结果行转换为摘要字典"""
+    profile = _model_from_json(UserProfile, row.profile)
+    service_record = _model_from_json(ServiceRecord, row.service_record)
     return {
-        'user_id': user.id,
-        'payment_id': payment.id,
-        'service_record_id': service_record.id
+        'user': _model_from_json(User, row.user).to_dict(),
+        'profile': profile.to_dict() if profile else None,
+        'recommendations': [_model_from_json(Recommendation, r).to_dict() for r in row.recommendations],
+        'payments': [_model_from_json(Payment, p).to_dict() for p in row.payments],
+        'service_record': service_record.to_dict() if service_record else None
     }
 
 
@@ -363,22 +520,21 @@ def get_customer_summary(contact_info: str) -> Optional[Dict[str, Any]]:
     """
     获取客户完整信息摘要
 
+    优先读进程内缓存；未命中时一次查询取回全部信息并写入缓存
+
     Returns:
         Dict containing all customer information
     """
-    user = get_user_by_contact(contact_info)
-    if not user:
-        return None
+    cached = _cache_get_summary(contact_info)
+    if cached is not None:
+        return cached
 
-    profile = get_user_profile(user.id)
-    recommendations = get_recommendations(user.id)
-    payments = get_user_payments(user.id)
-    service_record = get_user_service_record(user.id)
+    version = _summary_cache_token()
+    with get_session() as session:
+        row = session.execute(_CUSTOMER_SUMMARY_SQL, {'contact_info': contact_info}).first()
+    if row is None:
+        return None
 
-    return {
-        'user': user.to_dict(),
-        'profile': profile.to_dict() if profile else None,
-        'recommendations': [r.to_dict() for r in recommendations],
-        'payments': [p.to_dict() for p in payments],
-        'service_record': service_record.to_dict() if service_record else None
-    }
+    summary = _summary_from_row(row)
+    _cache_put_summary(contact_info, summary, version)
+    return summary
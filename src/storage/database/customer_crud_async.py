@@ -0,0 +1,400 @@
+"""
+客户信息CRUD操作（异步版本）
+与 customer_crud 中的同名函数一一对应，供运行在事件循环中的工具调用（graph.ainvoke），
+数据库 IO 期间让出事件循环；SQL 语句构造和客户摘要缓存与同步版本共用
+"""
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional, List, Dict, Any
+from datetime import datetime
+import logging
+
+from storage.database.db import get_async_session
+from storage.database.customer_models import User, UserProfile, Recommendation, Payment, ServiceRecord
+from storage.database.customer_crud import (
+    _CUSTOMER_SUMMARY_SQL,
+    _cache_get_summary,
+    _cache_put_summary,
+    _profile_upsert_stmt,
+    _summary_cache_token,
+    _summary_from_row,
+    _user_upsert_stmt,
+    invalidate_customer_summary,
+)
+
+logger = logging.getLogger(__name__)
+
+
+# ==================== 用户操作 ====================
+
+async def _upsert_user(session: AsyncSession, contact_info: str) -> int:
+    """插入或刷新用户，返回用户ID"""
+    return (await session.execute(_user_upsert_stmt(contact_info))).scalar_one()
+
+
+async def create_user(contact_info: str) -> User:
+    """创建用户（联系方式已存在时返回已有用户）"""
+    async with get_async_session() as session:
+        user_id = await _upsert_user(session, contact_info)
+        await session.commit()
+        user = await session.get(User, user_id)
+        invalidate_customer_summary(contact_info)
+        logger.info(f"✓ 创建用户成功: {contact_info}")
+        return user
+
+
+async def get_user_by_id(user_id: int) -> Optional[User]:
+    """根据ID获取用户"""
+    async with get_async_session() as session:
+        return await session.get(User, user_id)
+
+
+async def get_user_by_contact(contact_info: str) -> Optional[User]:
+    """根据联系方式获取用户"""
+    async with get_async_session() as session:
+        result = await session.execute(select(User).where(User.contact_info == contact_info))
+        return result.scalars().first()
+
+
+async def update_user_last_active(user_id: int):
+    """更新用户最后活跃时间"""
+    async with get_async_session() as session:
+        user = await session.get(User, user_id)
+        if user:
+            user.last_active_at = datetime.now()
+            await session.commit()
+            invalidate_customer_summary(user_id=user_id)
+            logger.debug(f"✓ 更新用户活跃时间: {user_id}")
+
+
+# ==================== 用户档案操作 ====================
+
+async def _upsert_profile(session: AsyncSession, user_id: int, values: Dict[str, Any]) -> int:
+    """插入或更新用户档案，返回档案ID"""
+    return (await session.execute(_profile_upsert_stmt(user_id, values))).scalar_one()
+
+
+async def create_user_profile(
+    user_id: int,
+    target_city: Optional[str] = None,
+    skills: Optional[str] = None,
+    work_experience: Optional[str] = None,
+    interests: Optional[str] = None,
+    risk_tolerance: Optional[str] = None,
+    time_commitment: Optional[str] = None,
+    startup_budget: Optional[float] = None
+) -> UserProfile:
+    """创建用户档案（已存在时更新传入的非空字段）"""
+    async with get_async_session() as session:
+        profile_id = await _upsert_profile(session, user_id, {
+            'target_city': target_city,
+            'skills': skills,
+            'work_experience': work_experience,
+            'interests': interests,
+            'risk_tolerance': risk_tolerance,
+            'time_commitment': time_commitment,
+            'startup_budget': startup_budget,
+        })
+        await session.commit()
+        profile = await session.get(UserProfile, profile_id)
+        invalidate_customer_summary(user_id=user_id)
+        logger.info(f"✓ 创建用户档案成功: user_id={user_id}")
+        return profile
+
+
+async def get_user_profile(user_id: int) -> Optional[UserProfile]:
+    """获取用户档案"""
+    async with get_async_session() as session:
+        result = await session.execute(select(UserProfile).where(UserProfile.user_id == user_id))
+        return result.scalars().first()
+
+
+async def update_user_profile(
+    user_id: int,
+    target_city: Optional[str] = None,
+    skills: Optional[str] = None,
+    work_experience: Optional[str] = None,
+    interests: Optional[str] = None,
+    risk_tolerance: Optional[str] = None,
+    time_commitment: Optional[str] = None,
+    startup_budget: Optional[float] = None
+) -> Optional[UserProfile]:
+    """更新用户档案"""
+    async with get_async_session() as session:
+        result = await session.execute(select(UserProfile).where(UserProfile.user_id == user_id))
+        profile = result.scalars().first()
+        if profile:
+            if target_city is not None:
+                profile.target_city = target_city
+            if skills is not None:
+                profile.skills = skills
+            if work_experience is not None:
+                profile.work_experience = work_experience
+            if interests is not None:
+                profile.interests = interests
+            if risk_tolerance is not None:
+                profile.risk_tolerance = risk_tolerance
+            if time_commitment is not None:
+                profile.time_commitment = time_commitment
+            if startup_budget is not None:
+                profile.startup_budget = startup_budget
+            await session.commit()
+            await session.refresh(profile)
+            invalidate_customer_summary(user_id=user_id)
+            logger.info(f"✓ 更新用户档案成功: user_id={user_id}")
+            return profile
+        return None
+
+
+# ==================== 推荐操作 ====================
+
+async def create_recommendation(
+    user_id: int,
+    project_name: Optional[str] = None,
+    core_advantage: Optional[str] = None,
+    estimated_income: Optional[str] = None,
+    startup_cost: Optional[str] = None,
+    ai_tools: Optional[Dict[str, Any]] = None
+) -> Recommendation:
+    """创建推荐记录"""
+    async with get_async_session() as session:
+        recommendation = Recommendation(
+            user_id=user_id,
+            project_name=project_name,
+            core_advantage=core_advantage,
+            estimated_income=estimated_income,
+            startup_cost=startup_cost,
+            ai_tools=ai_tools
+        )
+        session.add(recommendation)
+        await session.commit()
+        await session.refresh(recommendation)
+        invalidate_customer_summary(user_id=user_id)
+        logger.info(f"✓ 创建推荐记录成功: user_id={user_id}, project={project_name}")
+        return recommendation
+
+
+async def get_recommendations(user_id: int) -> List[Recommendation]:
+    """获取用户的所有推荐记录"""
+    async with get_async_session() as session:
+        result = await session.execute(select(Recommendation).where(Recommendation.user_id == user_id))
+        return list(result.scalars().all())
+
+
+# ==================== 支付操作 ====================
+
+async def create_payment(
+    user_id: int,
+    amount: float,
+    payment_method: Optional[str] = None,
+    payment_proof: Optional[str] = None,
+    transaction_id: Optional[str] = None,
+    payment_status: str = 'pending'
+) -> Payment:
+    """创建支付记录"""
+    async with get_async_session() as session:
+        payment = Payment(
+            user_id=user_id,
+            amount=amount,
+            payment_method=payment_method,
+            payment_proof=payment_proof,
+            transaction_id=transaction_id,
+            payment_status=payment_status
+        )
+        session.add(payment)
+        await session.commit()
+        await session.refresh(payment)
+        invalidate_customer_summary(user_id=user_id)
+        logger.info(f"✓ 创建支付记录成功: user_id={user_id}, amount={amount}")
+        return payment
+
+
+async def update_payment_status(payment_id: int, status: str) -> Optional[Payment]:
+    """更新支付状态"""
+    async with get_async_session() as session:
+        payment = await session.get(Payment, payment_id)
+        if payment:
+            payment.payment_status = status
+            await session.commit()
+            await session.refresh(payment)
+            invalidate_customer_summary(user_id=payment.user_id)
+            logger.info(f"✓ 更新支付状态成功: payment_id={payment_id}, status={status}")
+            return payment
+        return None
+
+
+async def get_payment(payment_id: int) -> Optional[Payment]:
+    """获取支付记录"""
+    async with get_async_session() as session:
+        return await session.get(Payment, payment_id)
+
+
+async def get_user_payments(user_id: int) -> List[Payment]:
+    """获取用户的所有支付记录"""
+    async with get_async_session() as session:
+        result = await session.execute(select(Payment).where(Payment.user_id == user_id))
+        return list(result.scalars().all())
+
+
+# ==================== 服务记录操作 ====================
+
+async def create_service_record(
+    user_id: int,
+    payment_id: Optional[int] = None,
+    pdf_url: Optional[str] = None,
+    group_joined: bool = False
+) -> ServiceRecord:
+    """创建服务记录"""
+    async with get_async_session() as session:
+        record = ServiceRecord(
+            user_id=user_id,
+            payment_id=payment_id,
+            pdf_url=pdf_url,
+            group_joined=group_joined
+        )
+        session.add(record)
+        await session.commit()
+        await session.refresh(record)
+        invalidate_customer_summary(user_id=user_id)
+        logger.info(f"✓ 创建服务记录成功: user_id={user_id}")
+        return record
+
+
+async def update_service_record(
+    record_id: int,
+    pdf_url: Optional[str] = None,
+    group_joined: Optional[bool] = None
+) -> Optional[ServiceRecord]:
+    """更新服务记录"""
+    async with get_async_session() as session:
+        record = await session.get(ServiceRecord, record_id)
+        if record:
+            if pdf_url is not None:
+                record.pdf_url = pdf_url
+            if group_joined is not None:
+                record.group_joined = group_joined
+                if group_joined and not record.group_joined_at:
+                    record.group_joined_at = datetime.now()
+            await session.commit()
+            await session.refresh(record)
+            invalidate_customer_summary(user_id=record.user_id)
+            logger.info(f"✓ 更新服务记录成功: record_id={record_id}")
+            return record
+        return None
+
+
+async def get_user_service_record(user_id: int) -> Optional[ServiceRecord]:
+    """获取用户的服务记录"""
+    async with get_async_session() as session:
+        result = await session.execute(select(ServiceRecord).where(ServiceRecord.user_id == user_id))
+        return result.scalars().first()
+
+
+# ==================== 组合操作 ====================
+
+async def save_customer_info(
+    contact_info: str,
+    target_city: Optional[str] = None,
+    skills: Optional[str] = None,
+    work_experience: Optional[str] = None,
+    interests: Optional[str] = None,
+    risk_tolerance: Optional[str] = None,
+    time_commitment: Optional[str] = None,
+    startup_budget: Optional[float] = None
+) -> Dict[str, Any]:
+    """
+    保存完整客户信息（用户+档案），单事务 upsert
+
+    Returns:
+        Dict containing user_id and profile_id
+    """
+    async with get_async_session() as session:
+        user_id = await _upsert_user(session, contact_info)
+        profile_id = await _upsert_profile(session, user_id, {
+            'target_city': target_city,
+            'skills': skills,
+            'work_experience': work_experience,
+            'interests': interests,
+            'risk_tolerance': risk_tolerance,
+            'time_commitment': time_commitment,
+            'startup_budget': startup_budget,
+        })
+        await session.commit()
+        invalidate_customer_summary(contact_info)
+        logger.info(f"✓ 保存客户信息成功: user_id={user_id}, profile_id={profile_id}")
+
+    return {
+        'user_id': user_id,
+        'profile_id': profile_id,
+        'contact_info': contact_info
+    }
+
+
+async def save_payment_and_service(
+    contact_info: str,
+    amount: float,
+    payment_method: Optional[str] = None,
+    payment_proof: Optional[str] = None,
+    pdf_url: Optional[str] = None,
+    group_joined: bool = False
+) -> Dict[str, Any]:
+    """
+    保存支付信息和服务记录（单事务）
+
+    Returns:
+        Dict containing payment_id and service_record_id
+    """
+    async with get_async_session() as session:
+        user_id = await _upsert_user(session, contact_info)
+
+        payment = Payment(
+            user_id=user_id,
+            amount=amount,
+            payment_method=payment_method,
+            payment_proof=payment_proof,
+            payment_status='paid'  # 假设已确认支付
+        )
+        session.add(payment)
+        await session.flush()
+
+        service_record = ServiceRecord(
+            user_id=user_id,
+            payment_id=payment.id,
+            pdf_url=pdf_url,
+            group_joined=group_joined
+        )
+        session.add(service_record)
+        await session.flush()
+
+        result = {
+            'user_id': user_id,
+            'payment_id': payment.id,
+            'service_record_id': service_record.id
+        }
+        await session.commit()
+        invalidate_customer_summary(contact_info)
+        logger.info(f"✓ 保存支付和服务记录成功: user_id={user_id}, amount={amount}")
+
+    return result
+
+
+async def get_customer_summary(contact_info: str) -> Optional[Dict[str, Any]]:
+    """
+    获取客户完整信息摘要（与同步版本共用进程内缓存）
+
+    Returns:
+        Dict containing all customer information
+    """
+    cached = _cache_get_summary(contact_info)
+    if cached is not None:
+        return cached
+
+    version = _summary_cache_token()
+    async with get_async_session() as session:
+        row = (await session.execute(_CUSTOMER_SUMMARY_SQL, {'contact_info': contact_info})).first()
+    if row is None:
+        return None
+
+    summary = _summary_from_row(row)
+    _cache_put_summary(contact_info, summary, version)
+    return summary
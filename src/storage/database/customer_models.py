@@ -3,7 +3,7 @@
 用于存储用户信息、创业信息、推荐记录、支付记录、服务记录
 """
 import datetime
-from sqlalchemy import BigInteger, DateTime, Integer, String, Text, Boolean, DECIMAL, JSON
+from sqlalchemy import BigInteger, DateTime, Index, Integer, String, Text, Boolean, DECIMAL, JSON
 from sqlalchemy.sql import func
 from sqlalchemy.orm import Mapped, mapped_column
 from typing import Optional, Dict, Any
@@ -14,6 +14,10 @@ from storage.database.shared.model import Base
 class User(Base):
     """用户基本信息表"""
     __tablename__ = 'users'
+    __table_args__ = (
+        # 所有工具都先按联系方式查用户，联系方式唯一
+        Index('uq_users_contact_info', 'contact_info', unique=True),
+    )
 
     id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
     contact_info: Mapped[str] = mapped_column(String(255), nullable=False, comment="联系方式（邮箱/手机号/微信号）")
@@ -34,6 +38,10 @@ class User(Base):
 class UserProfile(Base):
     """用户创业信息表"""
     __tablename__ = 'user_profiles'
+    __table_args__ = (
+        # 每个用户一份档案，保存信息时按 user_id 做 upsert
+        Index('uq_user_profiles_user_id', 'user_id', unique=True),
+    )
 
     id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
     user_id: Mapped[int] = mapped_column(BigInteger, nullable=False, comment="用户ID")
@@ -64,6 +72,10 @@ class UserProfile(Base):
 class Recommendation(Base):
     """推荐记录表"""
     __tablename__ = 'recommendations'
+    __table_args__ = (
+        # (user_id, created_at) 同时覆盖按用户查询和按时间排序的历史查询
+        Index('ix_recommendations_user_id_created_at', 'user_id', 'created_at'),
+    )
 
     id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
     user_id: Mapped[int] = mapped_column(BigInteger, nullable=False, comment="用户ID")
@@ -90,6 +102,9 @@ class Recommendation(Base):
 class Payment(Base):
     """支付记录表"""
     __tablename__ = 'payments'
+    __table_args__ = (
+        Index('ix_payments_user_id_created_at', 'user_id', 'created_at'),
+    )
 
     id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
     user_id: Mapped[int] = mapped_column(BigInteger, nullable=False, comment="用户ID")
@@ -116,6 +131,9 @@ class Payment(Base):
 class ServiceRecord(Base):
     """服务记录表"""
     __tablename__ = 'service_records'
+    __table_args__ = (
+        Index('ix_service_records_user_id_created_at', 'user_id', 'created_at'),
+    )
 
     id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
     user_id: Mapped[int] = mapped_column(BigInteger, nullable=False, comment="用户ID")
@@ -1,14 +1,40 @@
 import os
 import time
+import threading
+from typing import Any, Dict
 from sqlalchemy import create_engine, text
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.exc import OperationalError, TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 import logging
 
 logger = logging.getLogger(__name__)
 
 MAX_RETRY_TIME = 20  # 连接最大重试时间（秒）
 
+# 连接池配置（环境变量）
+#   DB_MAX_CONNECTIONS  本服务所有 worker 合计可占用的数据库连接数，按 WEB_CONCURRENCY 平分到每个进程
+#                       （需小于数据库 max_connections 减去管理/迁移预留的连接）；
+#                       每个进程分到的连接先扣除 checkpointer 连接池，剩余的再分给同步、异步两个引擎
+#   CHECKPOINT_POOL_SIZE 每个进程 checkpointer 连接池的上限（不超过分到的连接数的 1/4）
+#   DB_ASYNC_POOL_RATIO  引擎连接中分给异步引擎的比例（默认 0.5，其余归同步引擎）
+#   DB_POOL_SIZE        每个引擎常驻连接数（默认取该引擎分到的连接数的一半）
+#   DB_MAX_OVERFLOW     每个引擎突发时额外可建的连接数（默认取该引擎分到的连接数的剩余部分）
+#   DB_POOL_TIMEOUT     等待空闲连接的超时时间（秒）
+#   DB_POOL_RECYCLE     连接最长复用时间（秒）
+#   DB_POOL_PRE_PING    借出连接前是否先 ping（每次借出多一次往返，默认关闭）
+#   DB_POOL_LIFO        后进先出复用连接，让多余的空闲连接自然过期（默认开启）
+#   DB_POOLER_MODE      设为 pgbouncer 时按事务级连接池模式运行：关闭 prepared statements
+DB_MAX_CONNECTIONS = int(os.getenv("DB_MAX_CONNECTIONS", "80"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "false").lower() in ("1", "true", "yes")
+DB_POOL_LIFO = os.getenv("DB_POOL_LIFO", "true").lower() in ("1", "true", "yes")
+DB_POOLER_MODE = os.getenv("DB_POOLER_MODE", "").lower()
+CHECKPOINT_POOL_SIZE = int(os.getenv("CHECKPOINT_POOL_SIZE", "4"))
+DB_ASYNC_POOL_RATIO = float(os.getenv("DB_ASYNC_POOL_RATIO", "0.5"))
+
 # Load environment variables from .env if present
 try:
     from dotenv import load_dotenv
@@ -43,6 +69,134 @@ def get_db_url() -> str:
     raise ValueError("DATABASE_URL or PGDATABASE_URL is not set")
 _engine = None
 _SessionLocal = None
+_async_engine = None
+_AsyncSessionLocal = None
+
+
+def _split_pool(budget: int) -> Dict[str, int]:
+    """把一个引擎分到的连接数拆成常驻连接和突发连接（pool_size 至少为 1，0 在 QueuePool 中表示不限）"""
+    pool_size = int(os.getenv("DB_POOL_SIZE", str(max(1, budget // 2))))
+    max_overflow = int(os.getenv("DB_MAX_OVERFLOW", str(max(0, budget - pool_size))))
+    return {"pool_size": pool_size, "max_overflow": max_overflow}
+
+
+def get_pool_settings() -> Dict[str, Any]:
+    """
+    根据环境变量和 worker 数计算每个进程的连接池大小
+    每个进程的连接 = checkpointer 连接池 + 同步引擎 + 异步引擎，合计不超过 DB_MAX_CONNECTIONS // workers
+    """
+    workers = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+    per_process = DB_MAX_CONNECTIONS // workers
+    if per_process < 3:
+        logger.warning(
+            f"DB_MAX_CONNECTIONS={DB_MAX_CONNECTIONS} is too small for {workers} workers, "
+            "each process still needs 1 checkpointer + 1 sync + 1 async connection"
+        )
+        per_process = 3
+    checkpoint_pool_size = max(1, min(CHECKPOINT_POOL_SIZE, per_process // 4))
+    engine_budget = per_process - checkpoint_pool_size
+    async_budget = min(engine_budget - 1, max(1, int(engine_budget * DB_ASYNC_POOL_RATIO)))
+    sync_pool = _split_pool(engine_budget - async_budget)
+    async_pool = _split_pool(async_budget)
+    return {
+        "workers": workers,
+        "pool_size": sync_pool["pool_size"],
+        "max_overflow": sync_pool["max_overflow"],
+        "async_pool_size": async_pool["pool_size"],
+        "async_max_overflow": async_pool["max_overflow"],
+        "checkpoint_pool_size": checkpoint_pool_size,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+        "pool_use_lifo": DB_POOL_LIFO,
+        "pooler_mode": DB_POOLER_MODE or None,
+    }
+
+
+class PoolStats:
+    """进程级连接池统计：借出连接的等待时间与超时次数"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def record_wait(self, seconds: float, timed_out: bool = False) -> None:
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.wait_seconds += seconds
+            self.max_wait_seconds = max(self.max_wait_seconds, seconds)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            attempts = self.checkouts + self.timeouts
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "avg_wait_ms": round(self.wait_seconds / attempts * 1000, 3) if attempts else 0.0,
+                "max_wait_ms": round(self.max_wait_seconds * 1000, 3),
+            }
+
+
+sync_pool_stats = PoolStats()
+async_pool_stats = PoolStats()
+
+
+class _TimedPoolMixin:
+    """记录从连接池取连接的耗时（包含排队等待和新建连接）"""
+
+    stats: PoolStats
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            self.stats.record_wait(time.perf_counter() - start, timed_out=True)
+            raise
+        self.stats.record_wait(time.perf_counter() - start)
+        return connection
+
+
+class _TimedQueuePool(_TimedPoolMixin, QueuePool):
+    stats = sync_pool_stats
+
+
+class _TimedAsyncQueuePool(_TimedPoolMixin, AsyncAdaptedQueuePool):
+    stats = async_pool_stats
+
+
+def _engine_options(poolclass, is_async: bool = False) -> Dict[str, Any]:
+    """create_engine / create_async_engine 的连接池参数（两个引擎各用自己那一份连接预算）"""
+    settings = get_pool_settings()
+    prefix = "async_" if is_async else ""
+    options = {
+        "poolclass": poolclass,
+        "pool_size": settings[f"{prefix}pool_size"],
+        "max_overflow": settings[f"{prefix}max_overflow"],
+        "pool_timeout": settings["pool_timeout"],
+        "pool_recycle": settings["pool_recycle"],
+        "pool_pre_ping": settings["pool_pre_ping"],
+        "pool_use_lifo": settings["pool_use_lifo"],
+    }
+    connect_args = get_connect_args()
+    if connect_args:
+        options["connect_args"] = connect_args
+    return options
+
+
+def get_connect_args() -> Dict[str, Any]:
+    """psycopg 连接参数（引擎和 checkpointer 连接池共用，按 DB_POOLER_MODE 调整）"""
+    if get_pool_settings()["pooler_mode"] == "pgbouncer":
+        # 事务级连接池下，同一会话的语句可能落到不同的服务端连接，prepared statements 不可用
+        # （prepare_threshold=None 才是关闭；0 表示首次执行就 prepare）
+        return {"prepare_threshold": None}
+    return {}
 
 
 def _create_engine_with_retry():
@@ -51,19 +205,12 @@ def _create_engine_with_retry():
         logger.error("PGDATABASE_URL is not set")
         raise ValueError("PGDATABASE_URL is not set")
 
-    size = 100
-    overflow = 100
-    recycle = 1800
-    timeout = 30
-
-    engine = create_engine(
-        url,
-        pool_size=size,
-        max_overflow=overflow,
-        pool_pre_ping=True,
-        pool_recycle=recycle,
-        pool_timeout=timeout,
+    options = _engine_options(_TimedQueuePool)
+    logger.info(
+        f"Database pool: size={options['pool_size']}, overflow={options['max_overflow']}, "
+        f"lifo={options['pool_use_lifo']}, pre_ping={options['pool_pre_ping']}, pooler={DB_POOLER_MODE or 'none'}"
     )
+    engine = create_engine(url, **options)
 
     # 验证连接，带重试
     start_time = time.time()
@@ -90,6 +237,14 @@ def get_engine():
     return _engine
 
 
+def reset_engine_after_fork():
+    """fork 之后在子进程中调用：丢弃从父进程继承的连接（不关闭父进程的 socket），子进程按需重建"""
+    if _engine is not None:
+        _engine.dispose(close=False)
+    if _async_engine is not None:
+        _async_engine.sync_engine.dispose(close=False)
+
+
 def get_sessionmaker():
     global _SessionLocal
     if _SessionLocal is None:
@@ -103,9 +258,82 @@ def get_session():
     return SessionLocal()
 
 
+def _create_async_engine():
+    """
+    创建异步引擎（psycopg 异步驱动）
+    连接池与事件循环绑定，应在服务的事件循环内首次使用；池大小取每个进程连接预算中分给异步引擎的部分
+    """
+    url = get_db_url()
+    return create_async_engine(url, **_engine_options(_TimedAsyncQueuePool, is_async=True))
+
+
+def get_async_engine():
+    global _async_engine
+    if _async_engine is None:
+        _async_engine = _create_async_engine()
+    return _async_engine
+
+
+def get_async_sessionmaker():
+    global _AsyncSessionLocal
+    if _AsyncSessionLocal is None:
+        # expire_on_commit=False：提交后仍可直接读取对象属性，避免在异步上下文中触发隐式 IO
+        _AsyncSessionLocal = async_sessionmaker(
+            bind=get_async_engine(),
+            class_=AsyncSession,
+            autoflush=False,
+            expire_on_commit=False,
+        )
+    return _AsyncSessionLocal
+
+
+def get_async_session() -> AsyncSession:
+    """获取一个新的异步数据库 Session 实例（支持 async with）"""
+    AsyncSessionLocal = get_async_sessionmaker()
+    return AsyncSessionLocal()
+
+
+async def dispose_async_engine():
+    """关闭异步引擎的连接池（服务退出时调用）"""
+    global _async_engine, _AsyncSessionLocal
+    if _async_engine is not None:
+        await _async_engine.dispose()
+    _async_engine = None
+    _AsyncSessionLocal = None
+
+
+def _pool_snapshot(engine, stats: PoolStats) -> Dict[str, Any]:
+    snapshot = stats.snapshot()
+    if engine is not None:
+        pool = engine.pool
+        snapshot.update({
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "checked_in": pool.checkedin(),
+            "overflow": max(0, pool.overflow()),  # 未用满常驻连接时 SQLAlchemy 返回负数
+        })
+    return snapshot
+
+
+def get_pool_stats() -> Dict[str, Any]:
+    """获取连接池指标（配置、当前借出/溢出连接数、取连接等待时间）"""
+    return {
+        "settings": get_pool_settings(),
+        "sync": _pool_snapshot(_engine, sync_pool_stats),
+        "async": _pool_snapshot(_async_engine.sync_engine if _async_engine is not None else None, async_pool_stats),
+    }
+
+
 __all__ = [
     "get_db_url",
     "get_engine",
     "get_sessionmaker",
     "get_session",
+    "get_async_engine",
+    "get_async_sessionmaker",
+    "get_async_session",
+    "dispose_async_engine",
+    "get_pool_settings",
+    "get_pool_stats",
+    "reset_engine_after_fork",
 ]
@@ -1,11 +1,16 @@
 import psycopg
-from psycopg_pool import AsyncConnectionPool
+from psycopg.rows import dict_row
+from psycopg_pool import AsyncConnectionPool, ConnectionPool
 from langgraph.checkpoint.postgres import PostgresSaver
 from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver
 from langgraph.checkpoint.memory import MemorySaver
 from langgraph.checkpoint.base import BaseCheckpointSaver
-from typing import Optional, Union
+from collections import OrderedDict, defaultdict
+from typing import Any, Dict, Iterator, Optional, Sequence, Set, Tuple, Union
+import asyncio
 import logging
+import os
+import threading
 import time
 
 logger = logging.getLogger(__name__)
@@ -14,18 +19,208 @@ logger = logging.getLogger(__name__)
 DB_CONNECTION_TIMEOUT = 15
 DB_MAX_RETRIES = 2
 
+# 内存 checkpointer 上限（可通过环境变量调整）
+CHECKPOINT_MAX_THREADS = int(os.getenv("CHECKPOINT_MAX_THREADS", "5000"))
+CHECKPOINT_TTL_SECONDS = int(os.getenv("CHECKPOINT_TTL_SECONDS", str(2 * 60 * 60)))
+CHECKPOINT_MAX_BYTES = int(os.getenv("CHECKPOINT_MAX_BYTES", str(256 * 1024 * 1024)))
+CHECKPOINT_MAX_HISTORY = int(os.getenv("CHECKPOINT_MAX_HISTORY", "2"))
+
+
+def _saver_conn_kwargs() -> Dict[str, Any]:
+    """
+    PostgresSaver 要求连接为自动提交、按字典返回行；
+    prepared statements 按 storage/database/db.py 的 DB_POOLER_MODE 决定（pgbouncer 事务模式下关闭）
+    """
+    from storage.database.db import get_connect_args
+    return {"autocommit": True, "prepare_threshold": 0, "row_factory": dict_row, **get_connect_args()}
+
+
+class BoundedMemorySaver(MemorySaver):
+    """
+    有界内存 checkpointer
+
+    - 每个 thread 只保留最近 max_history 个 checkpoint
+    - thread 按 LRU 顺序淘汰，超过 max_threads 或 max_bytes 时淘汰最久未访问的 thread
+    - 超过 ttl_seconds 未访问的 thread 会被清理
+    """
+
+    def __init__(
+        self,
+        *,
+        max_threads: int = CHECKPOINT_MAX_THREADS,
+        ttl_seconds: int = CHECKPOINT_TTL_SECONDS,
+        max_bytes: int = CHECKPOINT_MAX_BYTES,
+        max_history: int = CHECKPOINT_MAX_HISTORY,
+        serde=None,
+    ):
+        super().__init__(serde=serde)
+        self.max_threads = max_threads
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.max_history = max(1, max_history)
+        self._lock = threading.RLock()
+        # thread_id -> 最后访问时间（按访问顺序排列，最久未访问的在最前）
+        self._access: "OrderedDict[str, float]" = OrderedDict()
+        self._thread_bytes: Dict[str, int] = {}
+        self._total_bytes = 0
+        # 按 thread 索引 blob / writes 的 key，避免淘汰时全表扫描
+        self._blob_keys: Dict[str, Set[Tuple]] = defaultdict(set)
+        self._write_keys: Dict[str, Set[Tuple]] = defaultdict(set)
+
+    @property
+    def total_bytes(self) -> int:
+        return self._total_bytes
+
+    def thread_count(self) -> int:
+        return len(self._access)
+
+    def _is_expired(self, thread_id: str, now: float) -> bool:
+        last = self._access.get(thread_id)
+        return bool(self.ttl_seconds) and last is not None and now - last > self.ttl_seconds
+
+    def _touch(self, thread_id: str, now: float) -> None:
+        self._access[thread_id] = now
+        self._access.move_to_end(thread_id)
+
+    def _measure_thread(self, thread_id: str) -> int:
+        size = 0
+        for checkpoints in self.storage.get(thread_id, {}).values():
+            for checkpoint, metadata, _parent in checkpoints.values():
+                size += len(checkpoint[1]) + len(metadata[1])
+        for key in self._blob_keys.get(thread_id, ()):
+            blob = self.blobs.get(key)
+            if blob is not None:
+                size += len(blob[1])
+        for key in self._write_keys.get(thread_id, ()):
+            for _task_id, _channel, value, _task_path in self.writes.get(key, {}).values():
+                size += len(value[1])
+        return size
+
+    def _update_size(self, thread_id: str) -> None:
+        size = self._measure_thread(thread_id)
+        self._total_bytes += size - self._thread_bytes.get(thread_id, 0)
+        self._thread_bytes[thread_id] = size
+
+    def _trim_history(self, thread_id: str) -> None:
+        """只保留每个 namespace 下最近的 max_history 个 checkpoint，并清理不再引用的 blob"""
+        trimmed = False
+        namespaces = self.storage.get(thread_id, {})
+        for checkpoint_ns, checkpoints in namespaces.items():
+            if len(checkpoints) <= self.max_history:
+                continue
+            # checkpoint id 为单调递增的 uuid6，排序即时间顺序
+            for checkpoint_id in sorted(checkpoints)[:-self.max_history]:
+                del checkpoints[checkpoint_id]
+                write_key = (thread_id, checkpoint_ns, checkpoint_id)
+                self.writes.pop(write_key, None)
+                self._write_keys[thread_id].discard(write_key)
+            trimmed = True
+
+        if not trimmed:
+            return
+
+        referenced = set()
+        for checkpoint_ns, checkpoints in namespaces.items():
+            for checkpoint, _metadata, _parent in checkpoints.values():
+                versions = self.serde.loads_typed(checkpoint).get("channel_versions", {})
+                for channel, version in versions.items():
+                    referenced.add((thread_id, checkpoint_ns, channel, version))
+        for key in list(self._blob_keys[thread_id]):
+            if key not in referenced:
+                self.blobs.pop(key, None)
+                self._blob_keys[thread_id].discard(key)
+
+    def _drop_thread(self, thread_id: str) -> None:
+        self.storage.pop(thread_id, None)
+        for key in self._blob_keys.pop(thread_id, ()):
+            self.blobs.pop(key, None)
+        for key in self._write_keys.pop(thread_id, ()):
+            self.writes.pop(key, None)
+        self._total_bytes -= self._thread_bytes.pop(thread_id, 0)
+        self._access.pop(thread_id, None)
+
+    def _evict(self, now: float) -> None:
+        """淘汰过期或超出容量的 thread（始终保留最近访问的一个）"""
+        while len(self._access) > 1:
+            thread_id, last = next(iter(self._access.items()))
+            if (
+                len(self._access) > self.max_threads
+                or self._total_bytes > self.max_bytes
+                or (self.ttl_seconds and now - last > self.ttl_seconds)
+            ):
+                self._drop_thread(thread_id)
+                logger.debug(f"Evicted checkpoint thread: {thread_id}")
+            else:
+                break
+
+    def get_tuple(self, config):
+        thread_id = config["configurable"]["thread_id"]
+        with self._lock:
+            now = time.monotonic()
+            if self._is_expired(thread_id, now):
+                self._drop_thread(thread_id)
+            result = super().get_tuple(config)
+            if thread_id in self._access:
+                self._touch(thread_id, now)
+            elif not any(self.storage.get(thread_id, {}).values()):
+                # 基类读取时会为不存在的 thread 创建空条目，这里顺手移除
+                self.storage.pop(thread_id, None)
+            return result
+
+    def list(self, config, *, filter=None, before=None, limit=None) -> Iterator[Any]:
+        with self._lock:
+            items = [*super().list(config, filter=filter, before=before, limit=limit)]
+            if config:
+                thread_id = config["configurable"]["thread_id"]
+                if thread_id in self._access:
+                    self._touch(thread_id, time.monotonic())
+                elif not any(self.storage.get(thread_id, {}).values()):
+                    self.storage.pop(thread_id, None)
+        yield from items
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"]["checkpoint_ns"]
+        with self._lock:
+            now = time.monotonic()
+            result = super().put(config, checkpoint, metadata, new_versions)
+            for channel, version in new_versions.items():
+                self._blob_keys[thread_id].add((thread_id, checkpoint_ns, channel, version))
+            self._trim_history(thread_id)
+            self._update_size(thread_id)
+            self._touch(thread_id, now)
+            self._evict(now)
+            return result
+
+    def put_writes(self, config, writes: Sequence[Tuple[str, Any]], task_id: str, task_path: str = "") -> None:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        with self._lock:
+            now = time.monotonic()
+            super().put_writes(config, writes, task_id, task_path)
+            self._write_keys[thread_id].add((thread_id, checkpoint_ns, checkpoint_id))
+            self._update_size(thread_id)
+            self._touch(thread_id, now)
+            self._evict(now)
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock:
+            self._drop_thread(thread_id)
+
 
 class MemoryManager:
     """Memory Manager 单例类"""
 
     _instance: Optional['MemoryManager'] = None
-    _checkpointer: Optional[Union[AsyncPostgresSaver, MemorySaver]] = None
-    _pool: Optional[AsyncConnectionPool] = None
     _setup_done: bool = False
 
     def __new__(cls):
         if cls._instance is None:
             cls._instance = super().__new__(cls)
+            # 同步 / 异步调用方各用一套 checkpointer，key 为 async_mode
+            cls._instance._checkpointers = {}  # type: Dict[bool, BaseCheckpointSaver]
+            cls._instance._pools = {}  # type: Dict[bool, Union[ConnectionPool, AsyncConnectionPool]]
         return cls._instance
 
     def _connect_with_retry(self, db_url: str) -> Optional[psycopg.Connection]:
@@ -34,7 +229,8 @@ class MemoryManager:
         for attempt in range(1, DB_MAX_RETRIES + 1):
             try:
                 logger.info(f"Attempting database connection (attempt {attempt}/{DB_MAX_RETRIES})")
-                conn = psycopg.connect(db_url, autocommit=True, connect_timeout=DB_CONNECTION_TIMEOUT)
+                conn = psycopg.connect(db_url, autocommit=True, connect_timeout=DB_CONNECTION_TIMEOUT,
+                                       prepare_threshold=_saver_conn_kwargs()["prepare_threshold"])
                 logger.info(f"Database connection established on attempt {attempt}")
                 return conn
             except Exception as e:
@@ -74,32 +270,54 @@ class MemoryManager:
             from storage.database.db import get_db_url
             db_url = get_db_url()
             if db_url and db_url.strip():
-                return db_url
+                # get_db_url 返回 SQLAlchemy 格式（postgresql+psycopg://），psycopg 只认 libpq 格式
+                return db_url.replace("postgresql+psycopg://", "postgresql://", 1)
             logger.warning("db_url is empty, will fallback to MemorySaver")
             return None
         except Exception as e:
             logger.warning(f"Failed to get db_url: {e}, will fallback to MemorySaver")
             return None
 
-    def _create_fallback_checkpointer(self) -> MemorySaver:
-        """创建内存兜底 checkpointer"""
-        self._checkpointer = MemorySaver()
+    def _create_fallback_checkpointer(self, async_mode: bool) -> MemorySaver:
+        """创建内存兜底 checkpointer（有界，按 LRU/TTL 淘汰会话）"""
+        checkpointer = self._checkpointers[async_mode] = BoundedMemorySaver()
         logger.warning("Using MemorySaver as fallback checkpointer (data will not persist across restarts)")
-        return self._checkpointer
+        if int(os.getenv("WEB_CONCURRENCY", "1")) > 1:
+            # 内存 checkpointer 只在本进程可见，多 worker 且没有会话粘滞时同一会话的历史会分散到不同进程
+            logger.error("MemorySaver is per-process but WEB_CONCURRENCY>1: conversation history will be "
+                         "split across workers; configure DATABASE_URL or run a single worker")
+        return checkpointer
+
+    def reset_after_fork(self) -> None:
+        """fork 之后在子进程中调用：丢弃从父进程继承的连接池和 checkpointer，由子进程按需重建"""
+        # 不关闭也不释放连接池：关闭或被回收时会在与父进程共享的 socket 上发送断开消息，
+        # 这里只保留引用，让子进程永远不碰这些连接
+        _inherited_pools.extend(self._pools.values())
+        self._pools = {}
+        self._checkpointers = {}
 
-    def get_checkpointer(self) -> BaseCheckpointSaver:
-        """获取 checkpointer，优先使用 PostgresSaver，失败时退化为 MemorySaver"""
-        if self._checkpointer is not None:
-            return self._checkpointer
+    def get_checkpointer(self, async_mode: Optional[bool] = None) -> BaseCheckpointSaver:
+        """
+        获取 checkpointer，优先使用 PostgresSaver，失败时退化为 MemorySaver
+
+        Args:
+            async_mode: 调用方是否通过 ainvoke / astream 使用 Agent（FastAPI 为 True，Flask 为 False）；
+                        为 None 时按当前线程是否运行着事件循环判断
+        """
+        if async_mode is None:
+            async_mode = in_event_loop()
+        checkpointer = self._checkpointers.get(async_mode)
+        if checkpointer is not None:
+            return checkpointer
 
         # 1. 尝试获取 db_url
         db_url = self._get_db_url_safe()
         if not db_url:
-            return self._create_fallback_checkpointer()
+            return self._create_fallback_checkpointer(async_mode)
 
         # 2. 尝试连接数据库并创建 schema/表（带重试）
         if not self._setup_schema_and_tables(db_url):
-            return self._create_fallback_checkpointer()
+            return self._create_fallback_checkpointer(async_mode)
 
         # 3. 连接字符串加上 search_path
         if "?" in db_url:
@@ -108,28 +326,68 @@ class MemoryManager:
             db_url = f"{db_url}?options=-csearch_path%3Dmemory"
 
         # 4. 尝试创建连接池和 checkpointer
+        #    异步调用方（FastAPI）用 AsyncPostgresSaver，需在事件循环内创建；
+        #    同步调用方（Flask / gunicorn 同步 worker）用同步连接池 + PostgresSaver，多个 worker 进程共享会话历史
         try:
-            self._pool = AsyncConnectionPool(
-                conninfo=db_url,
-                timeout=DB_CONNECTION_TIMEOUT,
-                min_size=1,
-                max_idle=300,
-                check=AsyncConnectionPool.check_connection,
-            )
-            self._checkpointer = AsyncPostgresSaver(self._pool)
-            logger.info("AsyncPostgresSaver initialized successfully")
+            # 连接池上限计入每个进程的数据库连接预算（见 storage/database/db.py 的 get_pool_settings）
+            from storage.database.db import get_pool_settings
+            pool_size = get_pool_settings()["checkpoint_pool_size"]
+            if async_mode:
+                pool = AsyncConnectionPool(
+                    conninfo=db_url,
+                    timeout=DB_CONNECTION_TIMEOUT,
+                    min_size=1,
+                    max_size=pool_size,
+                    max_idle=300,
+                    kwargs=_saver_conn_kwargs(),
+                    check=AsyncConnectionPool.check_connection,
+                )
+                checkpointer = AsyncPostgresSaver(pool)
+                logger.info("AsyncPostgresSaver initialized successfully")
+            else:
+                pool = ConnectionPool(
+                    conninfo=db_url,
+                    timeout=DB_CONNECTION_TIMEOUT,
+                    min_size=1,
+                    max_size=pool_size,
+                    max_idle=300,
+                    kwargs=_saver_conn_kwargs(),
+                    check=ConnectionPool.check_connection,
+                    open=True,
+                )
+                checkpointer = PostgresSaver(pool)
+                logger.info("PostgresSaver initialized successfully")
         except Exception as e:
-            logger.warning(f"Failed to create AsyncPostgresSaver: {e}, will fallback to MemorySaver")
-            return self._create_fallback_checkpointer()
+            logger.warning(f"Failed to create PostgresSaver: {e}, will fallback to MemorySaver")
+            return self._create_fallback_checkpointer(async_mode)
 
-        return self._checkpointer
+        self._pools[async_mode] = pool
+        self._checkpointers[async_mode] = checkpointer
+        return checkpointer
 
 _memory_manager: Optional[MemoryManager] = None
+# fork 时从父进程继承的连接池（只持有引用，不使用）
+_inherited_pools: list = []
+
 
+def in_event_loop() -> bool:
+    """当前线程是否运行着事件循环"""
+    try:
+        asyncio.get_running_loop()
+        return True
+    except RuntimeError:
+        return False
 
-def get_memory_saver() -> BaseCheckpointSaver:
+
+def get_memory_saver(async_mode: Optional[bool] = None) -> BaseCheckpointSaver:
     """获取 checkpointer，优先使用 PostgresSaver，db_url 不可用或连接失败时退化为 MemorySaver"""
     global _memory_manager
     if _memory_manager is None:
         _memory_manager = MemoryManager()
-    return _memory_manager.get_checkpointer()
\ No newline at end of file
+    return _memory_manager.get_checkpointer(async_mode)
+
+
+def reset_memory_saver_after_fork() -> None:
+    """fork 之后在子进程中调用，丢弃继承的 checkpointer 连接池"""
+    if _memory_manager is not None:
+        _memory_manager.reset_after_fork()
@@ -1,15 +1,36 @@
 import os
 import re
+import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional, Any, Dict, List, TypedDict, Iterable
+from typing import Optional, Any, Dict, List, TypedDict, Iterable, Iterator
 from uuid import uuid4
 
 import boto3
 from botocore.exceptions import ClientError
 from boto3.s3.transfer import TransferConfig
+from storage.s3.workload_token import get_token_cache
+from utils.http_client import get_http_session
 import logging
 logger = logging.getLogger(__name__)
 
+# 分片上传并发数、单个分片的重试次数与首次重试等待秒数
+S3_UPLOAD_CONCURRENCY = int(os.getenv("S3_UPLOAD_CONCURRENCY", "4"))
+S3_UPLOAD_PART_RETRIES = int(os.getenv("S3_UPLOAD_PART_RETRIES", "3"))
+S3_UPLOAD_RETRY_BACKOFF = float(os.getenv("S3_UPLOAD_RETRY_BACKOFF", "0.5"))
+
+# 流式读取 / 下载时每次读取的块大小
+S3_READ_CHUNK_SIZE = int(os.getenv("S3_READ_CHUNK_SIZE", str(1024 * 1024)))
+
+# 签名服务：并发请求数、请求超时（秒）
+S3_SIGN_CONCURRENCY = int(os.getenv("S3_SIGN_CONCURRENCY", "8"))
+S3_SIGN_TIMEOUT = float(os.getenv("S3_SIGN_TIMEOUT", "10"))
+# 签名 URL 缓存：最多缓存条数，剩余有效期不足多少秒时重新签名
+S3_PRESIGN_CACHE_SIZE = int(os.getenv("S3_PRESIGN_CACHE_SIZE", "4096"))
+S3_PRESIGN_REFRESH_MARGIN = float(os.getenv("S3_PRESIGN_REFRESH_MARGIN", "300"))
+
 # 允许的文件名字符集（面向用户输入的约束）
 FILE_NAME_ALLOWED_RE = re.compile(r"^[A-Za-z0-9._\-/]+$")
 
@@ -30,6 +51,9 @@ class S3SyncStorage:
         self.bucket_name = bucket_name
         self.region = region
         self._client = None
+        self._lock = threading.Lock()
+        # (bucket, key, expire_time) -> (url, 过期时间戳, 提前刷新秒数)，按最近使用排序
+        self._presign_cache: "OrderedDict[tuple, tuple]" = OrderedDict()
 
     def _get_client(self):
         if self._client is None:
@@ -63,16 +87,7 @@ class S3SyncStorage:
             # 注册 before-call 钩子，发送前注入 x-storage-token 头
             def _inject_header(**kwargs):
                 try:
-                    from coze_workload_identity import Client as CozeClient
-                    coze_client = CozeClient()
-                    try:
-                        token = coze_client.get_access_token()
-                    except Exception as e:
-                        logger.error("Error loading COZE_WORKLOAD_IDENTITY_TOKEN: %s", e)
-                        token = None
-                        raise e
-                    finally:
-                        coze_client.close()
+                    token = get_token_cache().get_token()
                     params = kwargs.get("params", {})
                     headers = params.setdefault("headers", {})
                     headers["x-storage-token"] = token
@@ -80,6 +95,12 @@ class S3SyncStorage:
                     logger.error("Error loading COZE_WORKLOAD_IDENTITY_TOKEN: %s", e)
                     pass
             client.meta.events.register("before-call.s3", _inject_header)
+
+            # 令牌被拒绝时丢弃缓存，下一次请求重新获取
+            def _drop_rejected_token(http_response=None, **kwargs):
+                if http_response is not None and http_response.status_code in (401, 403):
+                    get_token_cache().invalidate()
+            client.meta.events.register("after-call.s3", _drop_rejected_token)
             self._client = client
         return self._client
 
@@ -139,12 +160,13 @@ class S3SyncStorage:
             example = bad[0] if bad else "非法字符"
             raise ValueError(msg + f"（原因：包含非法字符，例如：{example}）")
 
-    def upload_file(self, *, file_content: bytes, file_name: str, content_type: str = "application/octet-stream", bucket: Optional[str] = None) -> str:
+    def upload_file(self, *, file_content: bytes, file_name: str, content_type: str = "application/octet-stream", bucket: Optional[str] = None, key: Optional[str] = None) -> str:
+        """上传文件；传入 key 时直接使用该 key（不追加随机后缀），用于内容寻址等需要固定 key 的场景"""
         # 先对输入文件名做规范校验，避免生成无效对象 key
-        self._validate_file_name(file_name)
+        self._validate_file_name(key or file_name)
         try:
             client = self._get_client()
-            object_key = self._generate_object_key(original_name=file_name)
+            object_key = key or self._generate_object_key(original_name=file_name)
             target_bucket = self._resolve_bucket(bucket)
             client.put_object(Bucket=target_bucket, Key=object_key, Body=file_content, ContentType=content_type)
             return object_key
@@ -157,6 +179,7 @@ class S3SyncStorage:
             client = self._get_client()
             target_bucket = self._resolve_bucket(bucket)
             client.delete_object(Bucket=target_bucket, Key=file_key)
+            self._invalidate_presigned_urls(file_key)
             return True
         except Exception as e:
             logger.error(self._error_msg("Error deleting file from S3", e))
@@ -178,25 +201,97 @@ class S3SyncStorage:
             logger.error(self._error_msg("Error checking file existence in S3", e))
             return False
 
-    def read_file(self, *, file_key: str, bucket: Optional[str] = None) -> bytes:
+    @staticmethod
+    def _range_header(start: Optional[int], end: Optional[int]) -> Optional[str]:
+        """构造 HTTP Range 头（end 为闭区间；start 为负数时表示读取最后 -start 个字节）"""
+        if start is None and end is None:
+            return None
+        if start is not None and start < 0:
+            if end is not None:
+                raise ValueError("读取末尾字节时不能同时指定 end")
+            return f"bytes={start}"
+        start = start or 0
+        if end is not None and end < start:
+            raise ValueError(f"无效的读取范围: {start}-{end}")
+        return f"bytes={start}-{'' if end is None else end}"
+
+    @staticmethod
+    def _close_body(body) -> None:
+        try:
+            body.close()
+        except Exception as ce:
+            # 资源关闭失败不影响读取结果，仅记录以便排查
+            logger.debug("Failed to close S3 response body: %s", ce)
+
+    def open_file(self, *, file_key: str, bucket: Optional[str] = None,
+                  start: Optional[int] = None, end: Optional[int] = None):
+        """以流的方式打开对象，返回带 read(n)/iter_chunks() 的响应体，调用方负责 close()
+        - start/end: 可选的字节范围（闭区间），只传 start 时读到末尾，start 为负数时读取末尾 -start 个字节
+        """
         try:
             client = self._get_client()
             target_bucket = self._resolve_bucket(bucket)
-            resp = client.get_object(Bucket=target_bucket, Key=file_key)
+            kwargs: Dict[str, Any] = {"Bucket": target_bucket, "Key": file_key}
+            range_header = self._range_header(start, end)
+            if range_header:
+                kwargs["Range"] = range_header
+            resp = client.get_object(**kwargs)
             body = resp.get("Body")
             if body is None:
                 raise RuntimeError("S3 get_object returned no Body")
-            try:
-                return body.read()
-            finally:
-                try:
-                    body.close()
-                except Exception as ce:
-                    # 资源关闭失败不影响读取结果，仅记录以便排查
-                    logger.debug("Failed to close S3 response body: %s", ce)
+            return body
+        except Exception as e:
+            logger.error(self._error_msg("Error opening file from S3", e))
+            raise e
+
+    def read_file(self, *, file_key: str, bucket: Optional[str] = None,
+                  start: Optional[int] = None, end: Optional[int] = None) -> bytes:
+        """读取对象内容；传入 start/end 时只读取该字节范围（HTTP Range）"""
+        body = self.open_file(file_key=file_key, bucket=bucket, start=start, end=end)
+        try:
+            return body.read()
         except Exception as e:
             logger.error(self._error_msg("Error reading file from S3", e))
             raise e
+        finally:
+            self._close_body(body)
+
+    def iter_file(self, *, file_key: str, bucket: Optional[str] = None, chunk_size: int = S3_READ_CHUNK_SIZE,
+                  start: Optional[int] = None, end: Optional[int] = None) -> Iterator[bytes]:
+        """按块迭代对象内容，内存中同时只保留一个块；迭代结束或中途退出时关闭连接"""
+        body = self.open_file(file_key=file_key, bucket=bucket, start=start, end=end)
+        try:
+            while True:
+                chunk = body.read(chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+        except Exception as e:
+            logger.error(self._error_msg("Error streaming file from S3", e))
+            raise e
+        finally:
+            self._close_body(body)
+
+    def download_to_path(self, *, file_key: str, path: str, bucket: Optional[str] = None,
+                         chunk_size: int = S3_READ_CHUNK_SIZE) -> int:
+        """分块下载对象到本地文件（先写临时文件，完成后原子重命名），返回写入的字节数"""
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.{uuid4().hex[:8]}.part"
+        written = 0
+        try:
+            with open(tmp_path, "wb") as f:
+                for chunk in self.iter_file(file_key=file_key, bucket=bucket, chunk_size=chunk_size):
+                    f.write(chunk)
+                    written += len(chunk)
+            os.replace(tmp_path, path)
+            return written
+        except Exception:
+            try:
+                os.remove(tmp_path)
+            except FileNotFoundError:
+                pass
+            raise
 
     def list_files(self, *, prefix: Optional[str] = None, bucket: Optional[str] = None, max_keys: int = 1000, continuation_token: Optional[str] = None) -> ListFilesResult:
         """列出对象，支持前缀过滤与分页；返回 keys/is_truncated/next_continuation_token。"""
@@ -230,21 +325,37 @@ class S3SyncStorage:
             logger.error(self._error_msg("Error listing files in S3", e))
             raise e
 
-    def generate_presigned_url(self, *, key: str, bucket: Optional[str] = None, expire_time: int = 1800) -> str:
-        """通过 S3 Proxy 生成签名 URL。"""
+    def _cached_presigned_url(self, cache_key) -> Optional[str]:
+        with self._lock:
+            entry = self._presign_cache.get(cache_key)
+            if entry is None:
+                return None
+            url, expires_at, margin = entry
+            if time.time() >= expires_at - margin:
+                del self._presign_cache[cache_key]
+                return None
+            self._presign_cache.move_to_end(cache_key)
+            return url
+
+    def _cache_presigned_url(self, cache_key, url: str, expires_at: float, expire_time: int) -> None:
+        # 剩余有效期不足 margin 时重新签名，短有效期的链接最多复用前一半时间
+        margin = min(S3_PRESIGN_REFRESH_MARGIN, expire_time / 2)
+        with self._lock:
+            self._presign_cache[cache_key] = (url, expires_at, margin)
+            self._presign_cache.move_to_end(cache_key)
+            while len(self._presign_cache) > S3_PRESIGN_CACHE_SIZE:
+                self._presign_cache.popitem(last=False)
+
+    def _invalidate_presigned_urls(self, key: str) -> None:
+        with self._lock:
+            for cache_key in [k for k in self._presign_cache if k[1] == key]:
+                del self._presign_cache[cache_key]
+
+    def _sign_url(self, *, key: str, bucket: str, expire_time: int) -> str:
+        """请求签名服务生成一个签名 URL"""
         import json
-        import urllib.request as urllib_request
         try:
-            from coze_workload_identity import Client as CozeClient
-            coze_client = CozeClient()
-            try:
-                token = coze_client.get_access_token()
-            finally:
-                try:
-                    coze_client.close()
-                except Exception:
-                    # 资源释放失败不影响后续流程
-                    pass
+            token = get_token_cache().get_token()
         except Exception as e:
             logger.error(f"Error loading x-storage-token: {e}")
             raise RuntimeError(f"获取 x-storage-token 失败: {e}")
@@ -259,35 +370,77 @@ class S3SyncStorage:
                 "x-storage-token": token,
             }
 
-            target_bucket = self._resolve_bucket(bucket)
-            payload = {"bucket_name": target_bucket, "path": key, "expire_time": expire_time}
+            payload = {"bucket_name": bucket, "path": key, "expire_time": expire_time}
             data = json.dumps(payload).encode("utf-8")
-            request = urllib_request.Request(sign_url_endpoint, data=data, headers=headers, method="POST")
         except Exception as e:
             logger.error(f"Error creating request for sign-url: {e}")
             raise RuntimeError(f"创建 sign-url 请求失败: {e}")
 
         try:
-            with urllib_request.urlopen(request) as resp:
-                resp_bytes = resp.read()
-                content_type = resp.headers.get("Content-Type", "")
-                text = resp_bytes.decode("utf-8", errors="replace")
-                if "application/json" in content_type or text.strip().startswith("{"):
-                    try:
-                        obj = json.loads(text)
-                    except Exception:
-                        return text
-                    data = obj.get("data")
-                    if isinstance(data, dict) and "url" in data:
-                        return data["url"]
-                    url_value = obj.get("url") or obj.get("signed_url") or obj.get("presigned_url")
-                    if url_value:
-                        return url_value
-                    raise ValueError("签名服务返回缺少 data.url/url 字段")
-                return text
+            resp = get_http_session().post(sign_url_endpoint, data=data, headers=headers, timeout=S3_SIGN_TIMEOUT)
+            if resp.status_code in (401, 403):
+                get_token_cache().invalidate()
+            resp.raise_for_status()
+            content_type = resp.headers.get("Content-Type", "")
+            text = resp.content.decode("utf-8", errors="replace")
+            if "application/json" in content_type or text.strip().startswith("{"):
+                try:
+                    obj = json.loads(text)
+                except Exception:
+                    return text
+                data = obj.get("data")
+                if isinstance(data, dict) and "url" in data:
+                    return data["url"]
+                url_value = obj.get("url") or obj.get("signed_url") or obj.get("presigned_url")
+                if url_value:
+                    return url_value
+                raise ValueError("签名服务返回缺少 data.url/url 字段")
+            return text
         except Exception as e:
             raise RuntimeError(f"生成签名URL失败: {e}")
 
+    def generate_presigned_url(self, *, key: str, bucket: Optional[str] = None, expire_time: int = 1800) -> str:
+        """通过 S3 Proxy 生成签名 URL；同一对象在链接临近过期前直接返回缓存的 URL。"""
+        target_bucket = self._resolve_bucket(bucket)
+        cache_key = (target_bucket, key, expire_time)
+        url = self._cached_presigned_url(cache_key)
+        if url:
+            return url
+        expires_at = time.time() + expire_time
+        url = self._sign_url(key=key, bucket=target_bucket, expire_time=expire_time)
+        self._cache_presigned_url(cache_key, url, expires_at, expire_time)
+        return url
+
+    def generate_presigned_urls(self, *, keys: Iterable[str], bucket: Optional[str] = None,
+                                expire_time: int = 1800, max_concurrency: int = S3_SIGN_CONCURRENCY) -> Dict[str, str]:
+        """批量生成签名 URL：缓存命中的直接返回，其余通过连接池并发签名
+        - keys: 对象 key 列表（重复的 key 只签名一次）
+        - max_concurrency: 同时进行的签名请求数
+        返回：key -> 签名 URL；任一 key 签名失败时抛出 RuntimeError
+        """
+        target_bucket = self._resolve_bucket(bucket)
+        result: Dict[str, str] = {}
+        missing: List[str] = []
+        for key in dict.fromkeys(keys):
+            url = self._cached_presigned_url((target_bucket, key, expire_time))
+            if url:
+                result[key] = url
+            else:
+                missing.append(key)
+        if not missing:
+            return result
+
+        def sign(key: str) -> str:
+            return self.generate_presigned_url(key=key, bucket=target_bucket, expire_time=expire_time)
+
+        if len(missing) == 1 or max_concurrency <= 1:
+            result.update((key, sign(key)) for key in missing)
+        else:
+            with ThreadPoolExecutor(max_workers=min(max_concurrency, len(missing)),
+                                    thread_name_prefix="s3-sign") as executor:
+                result.update(zip(missing, executor.map(sign, missing)))
+        return result
+
     def stream_upload_file(
             self,
             *,
@@ -297,24 +450,29 @@ class S3SyncStorage:
             bucket: Optional[str] = None,
             multipart_chunksize: int = 5 * 1024 * 1024,
             multipart_threshold: int = 5 * 1024 * 1024,
-            max_concurrency: int = 1,
-            use_threads: bool = False,
+            max_concurrency: int = S3_UPLOAD_CONCURRENCY,
+            use_threads: Optional[bool] = None,
+            key: Optional[str] = None,
     ) -> str:
         """流式上传（文件对象）
         - fileobj: 任何带有 read() 方法的文件对象（如 open(..., 'rb') 返回的对象、io.BytesIO 等）
         - file_name: 原始文件名，用于生成唯一 key
+        - key: 指定对象 key（不追加随机后缀），用于内容寻址等需要固定 key 的场景
         - content_type: MIME 类型
         - bucket: 目标桶；为空时取环境变量或实例默认值
         - multipart_chunksize: 分片大小（默认 5MB，以适配代理层限制）
         - multipart_threshold: 触发分片上传的阈值（默认 5MB）
-        - max_concurrency: 并发分片上传的并发数（默认 1，避免代理层节流影响）
-        - use_threads: 是否启用线程并发（默认 False）
+        - max_concurrency: 并发分片上传的并发数（默认取 S3_UPLOAD_CONCURRENCY；代理层节流时可设为 1）
+        - use_threads: 是否启用线程并发（默认 max_concurrency > 1 时启用）
         返回：最终写入的对象 key
         """
         try:
             client = self._get_client()
             target_bucket = self._resolve_bucket(bucket)
-            key = self._generate_object_key(original_name=file_name)
+            if key:
+                self._validate_file_name(key)
+            else:
+                key = self._generate_object_key(original_name=file_name)
 
             extra_args = {"ContentType": content_type} if content_type else {}
             # 使用 boto3 的高阶方法执行多段上传（传入 TransferConfig 控制分片大小）
@@ -323,7 +481,7 @@ class S3SyncStorage:
                 multipart_chunksize=multipart_chunksize,
                 multipart_threshold=multipart_threshold,
                 max_concurrency=max_concurrency,
-                use_threads=use_threads,
+                use_threads=max_concurrency > 1 if use_threads is None else use_threads,
             )
             client.upload_fileobj(Fileobj=fileobj, Bucket=target_bucket, Key=key, ExtraArgs=extra_args, Config=config)
             return key
@@ -344,16 +502,17 @@ class S3SyncStorage:
         - timeout: HTTP 请求超时时间（秒，默认 30）
         返回：最终写入的对象 key
         """
-        import urllib.request as urllib_request
         from urllib.parse import urlparse, unquote
         try:
-            request = urllib_request.Request(url)
-            with urllib_request.urlopen(request, timeout=timeout) as resp:
+            with get_http_session().get(url, stream=True, timeout=timeout) as resp:
+                resp.raise_for_status()
+                # 直接读取底层连接的响应流，按 Content-Encoding 解压
+                resp.raw.decode_content = True
                 parsed = urlparse(url)
                 file_name = Path(unquote(parsed.path)).name or "file"
                 content_type = resp.headers.get("Content-Type", "application/octet-stream")
                 return self.stream_upload_file(
-                    fileobj=resp,
+                    fileobj=resp.raw,
                     file_name=file_name,
                     content_type=content_type,
                     bucket=bucket,
@@ -362,20 +521,42 @@ class S3SyncStorage:
             logger.error(self._error_msg("Error uploading from URL to S3", e))
             raise e
 
+    def _upload_part_with_retry(self, client, *, bucket: str, key: str, upload_id: str, part_number: int,
+                                body, retries: int) -> Dict[str, Any]:
+        """上传单个分片，失败按指数退避重试"""
+        attempt = 0
+        while True:
+            try:
+                resp = client.upload_part(Bucket=bucket, Key=key, UploadId=upload_id, PartNumber=part_number, Body=body)
+                return {"PartNumber": part_number, "ETag": resp["ETag"]}
+            except Exception as e:
+                if attempt >= retries:
+                    raise
+                delay = S3_UPLOAD_RETRY_BACKOFF * (2 ** attempt)
+                attempt += 1
+                logger.warning(self._error_msg(f"upload_part {part_number} failed, retry {attempt}/{retries} in {delay:.1f}s", e))
+                time.sleep(delay)
+
     def trunk_upload_file(self, *, chunk_iter: Iterable[bytes], file_name: str,
                            content_type: str = "application/octet-stream", bucket: Optional[str] = None,
-                           part_size: int = 5 * 1024 * 1024) -> str:
-        """流式上传（字节迭代器，显式分片 Multipart Upload）
+                           part_size: int = 5 * 1024 * 1024, max_concurrency: int = S3_UPLOAD_CONCURRENCY,
+                           max_in_flight: Optional[int] = None, part_retries: int = S3_UPLOAD_PART_RETRIES) -> str:
+        """流式上传（字节迭代器，显式分片 Multipart Upload，分片并发上传）
         - chunk_iter: 可迭代对象，逐块产生 bytes；每块大小可变（内部累积到 part_size 再上传），最后一块可小于 5MB
         - file_name: 原始文件名，用于生成唯一 key
         - content_type: MIME 类型
         - bucket: 目标桶；为空时取环境或实例默认值
         - part_size: 每个 part 的最小大小（除最后一个）；默认 5MB
+        - max_concurrency: 同时上传的分片数（线程数）
+        - max_in_flight: 已读入内存但未上传完成的分片上限，内存占用约为 max_in_flight * part_size；默认 2 * max_concurrency
+        - part_retries: 单个分片失败后的重试次数
         返回：最终写入的对象 key
         """
         client = self._get_client()
         target_bucket = self._resolve_bucket(bucket)
         key = self._generate_object_key(original_name=file_name)
+        max_concurrency = max(1, max_concurrency)
+        max_in_flight = max(max_concurrency, max_in_flight or 2 * max_concurrency)
 
         # 初始化分片上传
         try:
@@ -385,27 +566,56 @@ class S3SyncStorage:
             logger.error(self._error_msg("create_multipart_upload failed", e))
             raise e
 
-        parts = []
-        part_number = 1
-        buffer = bytearray()
+        slots = threading.BoundedSemaphore(max_in_flight)
+        futures = []
+        errors = []
+        executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="s3-part")
+
+        def on_done(future) -> None:
+            slots.release()
+            if not future.cancelled() and future.exception() is not None:
+                errors.append(future.exception())
+
+        def submit(body, part_number: int) -> None:
+            # 在途分片达到上限时阻塞读取，直到有分片上传完成；已有分片失败则立即停止
+            slots.acquire()
+            if errors:
+                slots.release()
+                raise errors[0]
+            future = executor.submit(
+                self._upload_part_with_retry, client, bucket=target_bucket, key=key, upload_id=upload_id,
+                part_number=part_number, body=body, retries=part_retries,
+            )
+            future.add_done_callback(on_done)
+            futures.append(future)
+
         try:
+            part_number = 1
+            buffer = bytearray(part_size)
+            filled = 0
             for chunk in chunk_iter:
                 if not chunk:
                     continue
-                buffer.extend(chunk)
-                while len(buffer) >= part_size:
-                    data = bytes(buffer[:part_size])
-                    buffer = buffer[part_size:]
-                    resp = client.upload_part(Bucket=target_bucket, Key=key, UploadId=upload_id, PartNumber=part_number,
-                                              Body=data)
-                    parts.append({"PartNumber": part_number, "ETag": resp["ETag"]})
-                    part_number += 1
-
-            # 上传最后不足 part_size 的余量
-            if len(buffer) > 0:
-                resp = client.upload_part(Bucket=target_bucket, Key=key, UploadId=upload_id, PartNumber=part_number,
-                                          Body=bytes(buffer))
-                parts.append({"PartNumber": part_number, "ETag": resp["ETag"]})
+                # 用 memoryview 切片直接拷贝进当前分片，不再对剩余数据反复复制
+                view = memoryview(chunk)
+                offset = 0
+                while offset < len(view):
+                    n = min(part_size - filled, len(view) - offset)
+                    buffer[filled:filled + n] = view[offset:offset + n]
+                    filled += n
+                    offset += n
+                    if filled == part_size:
+                        submit(buffer, part_number)
+                        part_number += 1
+                        buffer = bytearray(part_size)
+                        filled = 0
+
+            # 上传最后不足 part_size 的余量（空文件也需要一个空分片）
+            if filled > 0 or part_number == 1:
+                del buffer[filled:]
+                submit(buffer, part_number)
+
+            parts = [future.result() for future in futures]
 
             # 完成分片
             client.complete_multipart_upload(
@@ -417,8 +627,30 @@ class S3SyncStorage:
             return key
         except Exception as e:
             logger.error(self._error_msg("multipart upload failed", e))
+            for future in futures:
+                future.cancel()
             try:
                 client.abort_multipart_upload(Bucket=target_bucket, Key=key, UploadId=upload_id)
             except Exception as ae:
                 logger.error(self._error_msg("abort_multipart_upload failed", ae))
             raise e
+        finally:
+            executor.shutdown(wait=True)
+
+_default_storage: Optional[S3SyncStorage] = None
+_default_storage_lock = threading.Lock()
+
+
+def get_default_storage() -> S3SyncStorage:
+    """按 COZE_BUCKET_* 环境变量创建进程内共享的存储实例（复用同一个 boto3 客户端）"""
+    global _default_storage
+    if _default_storage is None:
+        with _default_storage_lock:
+            if _default_storage is None:
+                _default_storage = S3SyncStorage(
+                    endpoint_url=os.getenv("COZE_BUCKET_ENDPOINT_URL"),
+                    access_key=os.getenv("COZE_BUCKET_ACCESS_KEY", ""),
+                    secret_key=os.getenv("COZE_BUCKET_SECRET_KEY", ""),
+                    bucket_name=os.getenv("COZE_BUCKET_NAME", ""),
+                )
+    return _default_storage
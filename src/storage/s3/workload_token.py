@@ -0,0 +1,131 @@
+"""
+工作负载身份令牌缓存
+对象存储的每次请求都需要携带 x-storage-token，原先每次请求都新建 coze_workload_identity.Client
+取一次令牌再关闭，相当于每个对象操作多一次网络往返。这里改为：
+1. 进程内复用同一个 Client，令牌缓存到过期前 TOKEN_REFRESH_MARGIN 秒
+2. 过期时单飞刷新：并发调用方只有一个去取令牌，其余等待并直接使用新令牌
+3. 过期时间优先取 JWT 的 exp 字段，解析不到时按 TOKEN_DEFAULT_TTL 计算
+"""
+import os
+import json
+import time
+import base64
+import logging
+import threading
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+# 无法从令牌解析出过期时间时的默认有效期（秒）
+TOKEN_DEFAULT_TTL = float(os.getenv("COZE_TOKEN_DEFAULT_TTL", "300"))
+# 提前刷新的秒数，避免令牌在请求途中过期
+TOKEN_REFRESH_MARGIN = float(os.getenv("COZE_TOKEN_REFRESH_MARGIN", "30"))
+
+
+def _default_client_factory():
+    from coze_workload_identity import Client as CozeClient
+    return CozeClient()
+
+
+def _jwt_expiry(token: str) -> Optional[float]:
+    """从 JWT 的 payload 中读取 exp（不校验签名，只用于决定何时刷新）"""
+    parts = token.split(".")
+    if len(parts) != 3:
+        return None
+    try:
+        payload = parts[1] + "=" * (-len(parts[1]) % 4)
+        exp = json.loads(base64.urlsafe_b64decode(payload)).get("exp")
+        return float(exp) if exp else None
+    except Exception:
+        return None
+
+
+class WorkloadTokenCache:
+    """带过期刷新的令牌缓存"""
+
+    def __init__(self, client_factory: Callable = _default_client_factory,
+                 default_ttl: float = TOKEN_DEFAULT_TTL, refresh_margin: float = TOKEN_REFRESH_MARGIN):
+        self.client_factory = client_factory
+        self.default_ttl = default_ttl
+        self.refresh_margin = refresh_margin
+        self._client = None
+        self._token: Optional[str] = None
+        self._expires_at = 0.0
+        self._lock = threading.Lock()
+        self.fetches = 0
+
+    def _valid_token(self) -> Optional[str]:
+        if self._token and time.time() < self._expires_at - self.refresh_margin:
+            return self._token
+        return None
+
+    def _fetch(self) -> str:
+        if self._client is None:
+            self._client = self.client_factory()
+        try:
+            token = self._client.get_access_token()
+        except Exception:
+            # 连接可能已失效，下次重新创建 Client
+            self._close_client()
+            raise
+        self.fetches += 1
+        self._expires_at = _jwt_expiry(token) or time.time() + self.default_ttl
+        self._token = token
+        return token
+
+    def get_token(self) -> str:
+        """获取令牌（缓存有效时不发起网络请求）"""
+        token = self._valid_token()
+        if token:
+            return token
+        with self._lock:
+            # 等锁期间其他线程可能已经刷新过
+            token = self._valid_token()
+            if token:
+                return token
+            return self._fetch()
+
+    def invalidate(self) -> None:
+        """丢弃缓存的令牌（服务端拒绝令牌时调用）"""
+        with self._lock:
+            self._token = None
+            self._expires_at = 0.0
+
+    def _close_client(self) -> None:
+        if self._client is not None:
+            try:
+                self._client.close()
+            except Exception:
+                # 资源释放失败不影响后续流程
+                pass
+            self._client = None
+
+    def close(self) -> None:
+        with self._lock:
+            self._close_client()
+            self._token = None
+            self._expires_at = 0.0
+
+
+_token_cache: Optional[WorkloadTokenCache] = None
+_token_cache_lock = threading.Lock()
+
+
+def get_token_cache() -> WorkloadTokenCache:
+    """获取进程内共享的令牌缓存"""
+    global _token_cache
+    if _token_cache is None:
+        with _token_cache_lock:
+            if _token_cache is None:
+                _token_cache = WorkloadTokenCache()
+    return _token_cache
+
+
+def reset_token_cache_after_fork() -> None:
+    """fork 出的子进程不能复用父进程的 Client 连接"""
+    global _token_cache
+    _token_cache = None
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=reset_token_cache_after_fork)
@@ -1,10 +1,13 @@
 """
 客户信息管理工具
+每个工具同时提供同步实现（invoke）和异步实现（ainvoke），
+异步实现走 customer_crud_async，数据库 IO 不阻塞事件循环
 """
 import json
 from typing import Dict, Any, Optional
 from langchain.tools import tool, ToolRuntime
 
+from storage.database import customer_crud_async
 from storage.database.customer_crud import (
     save_customer_info,
     save_payment_and_service,
@@ -12,6 +15,7 @@ from storage.database.customer_crud import (
     create_recommendation,
     update_service_record
 )
+from tools.tool_utils import async_impl
 
 
 @tool
@@ -65,7 +69,35 @@ def save_user_info(
         time_commitment=time_commitment,
         startup_budget=startup_budget
     )
+    return _save_user_info_message(result, target_city, skills, startup_budget)
 
+
+@async_impl(save_user_info)
+async def _asave_user_info(
+    contact_info: str,
+    target_city: str,
+    skills: str,
+    work_experience: str,
+    interests: str,
+    risk_tolerance: str,
+    time_commitment: str,
+    startup_budget: float,
+    runtime: ToolRuntime = None
+) -> str:
+    result = await customer_crud_async.save_customer_info(
+        contact_info=contact_info,
+        target_city=target_city,
+        skills=skills,
+        work_experience=work_experience,
+        interests=interests,
+        risk_tolerance=risk_tolerance,
+        time_commitment=time_commitment,
+        startup_budget=startup_budget
+    )
+    return _save_user_info_message(result, target_city, skills, startup_budget)
+
+
+def _save_user_info_message(result: Dict[str, Any], target_city: str, skills: str, startup_budget: float) -> str:
     return f"""✅ **用户信息保存成功！**
 
 📋 **保存的用户信息**：
@@ -122,7 +154,37 @@ def save_payment_and_pdf(
         pdf_url=pdf_url,
         group_joined=False
     )
+    return _save_payment_message(result, contact_info, amount, payment_proof, pdf_url, payment_method)
+
+
+@async_impl(save_payment_and_pdf)
+async def _asave_payment_and_pdf(
+    contact_info: str,
+    amount: float,
+    payment_proof: str,
+    pdf_url: str,
+    payment_method: str = "微信支付",
+    runtime: ToolRuntime = None
+) -> str:
+    result = await customer_crud_async.save_payment_and_service(
+        contact_info=contact_info,
+        amount=amount,
+        payment_method=payment_method,
+        payment_proof=payment_proof,
+        pdf_url=pdf_url,
+        group_joined=False
+    )
+    return _save_payment_message(result, contact_info, amount, payment_proof, pdf_url, payment_method)
+
 
+def _save_payment_message(
+    result: Dict[str, Any],
+    contact_info: str,
+    amount: float,
+    payment_proof: str,
+    pdf_url: str,
+    payment_method: str
+) -> str:
     return f"""✅ **支付信息保存成功！**
 
 💰 **支付记录**：
@@ -166,18 +228,45 @@ def mark_user_joined_group(
     )
 
     user = get_user_by_contact(contact_info)
+    service_record = get_user_service_record(user.id) if user else None
+    message = _check_join_group(contact_info, user, service_record)
+    if message:
+        return message
+
+    update_service_record(service_record.id, group_joined=True)
+    return _joined_group_message(contact_info, user, service_record)
+
+
+@async_impl(mark_user_joined_group)
+async def _amark_user_joined_group(
+    contact_info: str,
+    runtime: ToolRuntime = None
+) -> str:
+    user = await customer_crud_async.get_user_by_contact(contact_info)
+    service_record = await customer_crud_async.get_user_service_record(user.id) if user else None
+    message = _check_join_group(contact_info, user, service_record)
+    if message:
+        return message
+
+    await customer_crud_async.update_service_record(service_record.id, group_joined=True)
+    return _joined_group_message(contact_info, user, service_record)
+
+
+def _check_join_group(contact_info: str, user, service_record) -> Optional[str]:
+    """检查是否可以标记入群，不可以时返回提示信息"""
     if not user:
         return f"⚠️ **未找到用户**：联系方式 {contact_info} 不存在，请先保存用户信息"
 
-    service_record = get_user_service_record(user.id)
     if not service_record:
         return f"⚠️ **未找到服务记录**：用户 {contact_info} 尚未完成支付，无法标记入群"
 
     if service_record.group_joined:
         return f"ℹ️ **用户已入群**：用户 {contact_info} 已经在 {service_record.group_joined_at} 入群"
 
-    update_service_record(service_record.id, group_joined=True)
+    return None
+
 
+def _joined_group_message(contact_info: str, user, service_record) -> str:
     return f"""✅ **入群标记成功！**
 
 🎉 **用户信息**：
@@ -210,7 +299,19 @@ def get_customer_info(
         >>> get_customer_info(contact_info="user@example.com")
     """
     summary = get_customer_summary(contact_info)
+    return _customer_info_message(contact_info, summary)
+
+
+@async_impl(get_customer_info)
+async def _aget_customer_info(
+    contact_info: str,
+    runtime: ToolRuntime = None
+) -> str:
+    summary = await customer_crud_async.get_customer_summary(contact_info)
+    return _customer_info_message(contact_info, summary)
+
 
+def _customer_info_message(contact_info: str, summary: Optional[Dict[str, Any]]) -> str:
     if not summary:
         return f"⚠️ **未找到客户**：联系方式 {contact_info} 不存在"
 
@@ -298,20 +399,62 @@ def save_recommendations(
     if not user:
         return f"⚠️ **未找到用户**：联系方式 {contact_info} 不存在，请先保存用户信息"
 
-    try:
-        ai_tools_dict = json.loads(ai_tools) if ai_tools else None
-    except json.JSONDecodeError:
-        ai_tools_dict = None
-
     recommendation = create_recommendation(
         user_id=user.id,
         project_name=project_name,
         core_advantage=core_advantage,
         estimated_income=estimated_income,
         startup_cost=startup_cost,
-        ai_tools=ai_tools_dict
+        ai_tools=_parse_ai_tools(ai_tools)
+    )
+    return _save_recommendation_message(
+        contact_info, user, recommendation, project_name, core_advantage, estimated_income, startup_cost
+    )
+
+
+@async_impl(save_recommendations)
+async def _asave_recommendations(
+    contact_info: str,
+    project_name: str,
+    core_advantage: str,
+    estimated_income: str,
+    startup_cost: str,
+    ai_tools: str,
+    runtime: ToolRuntime = None
+) -> str:
+    user = await customer_crud_async.get_user_by_contact(contact_info)
+    if not user:
+        return f"⚠️ **未找到用户**：联系方式 {contact_info} 不存在，请先保存用户信息"
+
+    recommendation = await customer_crud_async.create_recommendation(
+        user_id=user.id,
+        project_name=project_name,
+        core_advantage=core_advantage,
+        estimated_income=estimated_income,
+        startup_cost=startup_cost,
+        ai_tools=_parse_ai_tools(ai_tools)
+    )
+    return _save_recommendation_message(
+        contact_info, user, recommendation, project_name, core_advantage, estimated_income, startup_cost
     )
 
+
+def _parse_ai_tools(ai_tools: str) -> Optional[Dict[str, Any]]:
+    try:
+        return json.loads(ai_tools) if ai_tools else None
+    except json.JSONDecodeError:
+        return None
+
+
+def _save_recommendation_message(
+    contact_info: str,
+    user,
+    recommendation,
+    project_name: str,
+    core_advantage: str,
+    estimated_income: str,
+    startup_cost: str
+) -> str:
     return f"""✅ **推荐项目保存成功！**
 
 🎯 **项目信息**：
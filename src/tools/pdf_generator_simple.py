@@ -1,32 +1,104 @@
 import os
-import hashlib
 import json
+import uuid
+import asyncio
+import tempfile
+from io import BytesIO
 from reportlab.lib.pagesizes import A4
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, PageBreak
+from reportlab.platypus import BaseDocTemplate, Frame, PageTemplate, Paragraph, Spacer, Table, TableStyle, PageBreak
 from reportlab.lib import colors
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
 from typing import Dict, List
 from langchain.tools import tool
 
-# 注册中文字体（使用系统自带的中文字体）
-try:
-    font_paths = [
-        '/usr/share/fonts/truetype/wqy/wqy-zenhei.ttc',
-        '/usr/share/fonts/truetype/wqy/wqy-microhei.ttc',
-        '/System/Library/Fonts/PingFang.ttc',
-        '/System/Library/Fonts/STHeiti Light.ttc',
-    ]
-    for font_path in font_paths:
-        if os.path.exists(font_path):
-            pdfmetrics.registerFont(TTFont('ChineseFont', font_path))
-            break
-    else:
-        print("Warning: Chinese font not found, using default font")
-except Exception as e:
-    print(f"Warning: Failed to register Chinese font: {e}")
+from tools.tool_utils import async_impl
+from utils.fonts import register_reportlab_font
+from utils.pdf.pdf_cache import get_pdf_cache, make_cache_key
+from utils.pdf.pdf_delivery import deliver_pdf, PDF_URL_EXPIRE_SECONDS
+from utils.pdf.render_pool import get_render_pool
+
+# 生成的 PDF 存放目录，每个请求使用独立的文件名
+PDF_OUTPUT_DIR = os.getenv("PDF_OUTPUT_DIR", os.path.join(tempfile.gettempdir(), "opc_pdfs"))
+
+# 文档版式版本号，修改渲染逻辑后递增，使旧的缓存结果失效
+PDF_TEMPLATE_VERSION = "2"
+
+# 注册中文字体（共享字体注册表，每个进程只加载一次字体文件）
+CHINESE_FONT = register_reportlab_font()
+
+
+# ==================== 预编译版式 ====================
+# 样式、页面模板和与用户无关的段落在导入时构建一次（渲染进程启动时完成），
+# 每次渲染只构建用户相关的段落。渲染进程一次只渲染一份文档，共享的 flowable 不会被并发使用
+
+_BASE_STYLES = getSampleStyleSheet()
+
+TITLE_STYLE = ParagraphStyle(
+    'CustomTitle',
+    parent=_BASE_STYLES['Heading1'],
+    fontSize=24,
+    textColor=colors.HexColor('#2E86AB'),
+    spaceAfter=30,
+    fontName=CHINESE_FONT or 'Helvetica-Bold'
+)
+
+HEADING_STYLE = ParagraphStyle(
+    'CustomHeading',
+    parent=_BASE_STYLES['Heading2'],
+    fontSize=16,
+    textColor=colors.HexColor('#444444'),
+    spaceAfter=12,
+    spaceBefore=20,
+    fontName=CHINESE_FONT or 'Helvetica-Bold'
+)
+
+NORMAL_STYLE = ParagraphStyle(
+    'CustomNormal',
+    parent=_BASE_STYLES['Normal'],
+    fontSize=11,
+    textColor=colors.HexColor('#333333'),
+    spaceAfter=8,
+    leading=16,
+    fontName=CHINESE_FONT or 'Helvetica'
+)
+
+# A4 纵向，四边 72pt 页边距（与 SimpleDocTemplate 默认单栏版式一致）
+PAGE_MARGIN = 72
+PAGE_TEMPLATES = [
+    PageTemplate(
+        id='OPCGuide',
+        frames=[Frame(PAGE_MARGIN, PAGE_MARGIN, A4[0] - 2 * PAGE_MARGIN, A4[1] - 2 * PAGE_MARGIN, id='normal')],
+        pagesize=A4,
+    )
+]
+
+# 与用户无关的静态段落
+SECTION_SPACER = Spacer(1, 20)
+ITEM_SPACER = Spacer(1, 8)
+PAGE_BREAK = PageBreak()
+PROFILE_HEADING = Paragraph("一、用户画像分析", HEADING_STYLE)
+PROJECTS_HEADING = Paragraph("三、精选创业项目推荐", HEADING_STYLE)
+GUIDE_HEADING = Paragraph("四、针对性启动指南", HEADING_STYLE)
+
+# 城市分析各小节（标签, city_analysis 字段）
+CITY_ANALYSIS_SECTIONS = [
+    ("人口结构", "population"),
+    ("产业结构", "industry"),
+    ("商业环境", "business"),
+    ("政府政策", "policy"),
+    ("创业机会", "opportunities"),
+    ("针对性建议", "recommendations"),
+]
+
+# 启动指南步骤模板（{city} 为用户所在城市）
+GUIDE_STEPS = [
+    "<b>1. 市场调研：</b>深入了解{city}目标用户需求和本地竞争对手情况。",
+    "<b>2. 最小可行产品（MVP）：</b>快速推出核心功能，在{city}市场进行验证。",
+    "<b>3. 品牌建设：</b>建立专业形象，针对{city}用户特点设计营销策略。",
+    "<b>4. 客户获取：</b>利用{city}本地资源和渠道，快速获取首批客户。",
+    "<b>5. 持续迭代：</b>根据{city}市场反馈不断优化产品和服务。",
+]
 
 def analyze_city(city: str, user_skills: str, user_experience: str, user_interests: str) -> str:
     """
@@ -51,22 +123,12 @@ def analyze_city(city: str, user_skills: str, user_experience: str, user_interes
         "recommendations": "结合当地产业特色，发挥自身优势，选择合适的创业方向。"
     }, ensure_ascii=False)
 
-@tool
-def generate_opc_pdf_simple(
-    user_info: str,
-    city: str,
-    projects: str
-) -> str:
+def render_opc_pdf(user_info: str, city: str, projects: str) -> bytes:
     """
-    生成OPC创业指导PDF文档（简化版，不上传对象存储）。
-
-    Args:
-        user_info: 用户信息（地址、技能、经验、兴趣）
-        city: 用户所在城市
-        projects: 推荐的创业项目列表（JSON字符串或格式化文本）
+    渲染OPC创业指导PDF（在渲染进程中执行）
 
     Returns:
-        str: PDF 文件路径
+        bytes: PDF 文件内容
     """
     # 解析用户信息
     user_data = {
@@ -123,106 +185,143 @@ def generate_opc_pdf_simple(
             "recommendations": "结合当地特色，发挥自身优势。"
         }
 
-    # 创建临时PDF文件
-    temp_pdf_path = "/tmp/opc_guide.pdf"
+    # 渲染到内存，不同请求之间互不影响
+    buffer = BytesIO()
+
+    # 创建PDF文档（复用预编译的页面模板）
+    doc = BaseDocTemplate(
+        buffer,
+        pagesize=A4,
+        rightMargin=PAGE_MARGIN,
+        leftMargin=PAGE_MARGIN,
+        topMargin=PAGE_MARGIN,
+        bottomMargin=PAGE_MARGIN,
+        pageTemplates=PAGE_TEMPLATES
+    )
+
+    city_name = user_data['city']
+
+    # 构建文档内容
+    story = []
+
+    # 标题
+    story.append(Paragraph(f"{city_name}OPC超级个体创业指导手册", TITLE_STYLE))
+    story.append(SECTION_SPACER)
+
+    # 用户画像分析
+    story.append(PROFILE_HEADING)
+    story.append(Paragraph(user_info.replace('\n', '<br/>'), NORMAL_STYLE))
+    story.append(SECTION_SPACER)
+
+    # 城市环境深度分析
+    story.append(PAGE_BREAK)
+    story.append(Paragraph(f"二、{city_name}创业环境深度分析", HEADING_STYLE))
+    for index, (label, field) in enumerate(CITY_ANALYSIS_SECTIONS):
+        if index:
+            story.append(ITEM_SPACER)
+        story.append(Paragraph(f"<b>{label}：</b>{city_analysis.get(field, '')}", NORMAL_STYLE))
+    story.append(SECTION_SPACER)
+
+    # 推荐创业项目
+    story.append(PAGE_BREAK)
+    story.append(PROJECTS_HEADING)
+    story.append(Paragraph(f"以下项目基于您的个人特点和{city_name}的市场环境精选而成：", NORMAL_STYLE))
+    story.append(Spacer(1, 10))
+    story.append(Paragraph(projects.replace('\n', '<br/>'), NORMAL_STYLE))
+    story.append(SECTION_SPACER)
+
+    # 针对性启动指南
+    story.append(GUIDE_HEADING)
+    story.append(Paragraph(f"基于{city_name}的市场环境，建议按以下步骤启动：", NORMAL_STYLE))
+    for step in GUIDE_STEPS:
+        story.append(Paragraph(step.format(city=city_name), NORMAL_STYLE))
 
+    # 生成PDF
+    doc.build(story)
+
+    return buffer.getvalue()
+
+
+def _save_pdf(pdf_bytes: bytes) -> str:
+    """写入本次请求独有的文件（先写临时文件再原子重命名），返回文件路径"""
+    os.makedirs(PDF_OUTPUT_DIR, exist_ok=True)
+    pdf_path = os.path.join(PDF_OUTPUT_DIR, f"opc_guide_{uuid.uuid4().hex}.pdf")
+    tmp_path = f"{pdf_path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(pdf_bytes)
+    os.replace(tmp_path, pdf_path)
+    return pdf_path
+
+
+def _deliver(pdf_bytes: bytes, key: str) -> str:
+    """优先上传对象存储返回下载链接（按内容哈希 key 存放，已上传过只重新签名）；未配置存储或上传失败时保存到本地"""
+    url = deliver_pdf(pdf_bytes, key)
+    if url:
+        return _pdf_url_message(url)
+    return _pdf_success_message(_save_pdf(pdf_bytes))
+
+
+def _pdf_url_message(url: str) -> str:
+    hours = max(1, PDF_URL_EXPIRE_SECONDS // 3600)
+    return f"✅ PDF文档已生成！\n\n📥 下载链接：{url}\n\n⏰ 链接有效期：{hours}小时，请及时下载保存。"
+
+
+def _pdf_success_message(pdf_path: str) -> str:
+    return f"✅ PDF文档已生成！\n\n📄 文件路径：{pdf_path}\n\n💡 提示：当前未配置对象存储，PDF保存在服务器上。"
+
+
+def _pdf_error_message(e: Exception) -> str:
+    import traceback
+    error_details = traceback.format_exc()
+    return f"❌ 生成PDF失败：{str(e)}\n\n详细信息：\n{error_details}"
+
+
+@tool
+def generate_opc_pdf_simple(
+    user_info: str,
+    city: str,
+    projects: str
+) -> str:
+    """
+    生成OPC创业指导PDF文档，上传对象存储并返回下载链接（未配置对象存储时保存在服务器本地）。
+
+    Args:
+        user_info: 用户信息（地址、技能、经验、兴趣）
+        city: 用户所在城市
+        projects: 推荐的创业项目列表（JSON字符串或格式化文本）
+
+    Returns:
+        str: PDF 下载链接（或本地文件路径）
+    """
     try:
-        # 创建PDF文档
-        doc = SimpleDocTemplate(
-            temp_pdf_path,
-            pagesize=A4,
-            rightMargin=72,
-            leftMargin=72,
-            topMargin=72,
-            bottomMargin=72
-        )
-
-        # 获取样式
-        styles = getSampleStyleSheet()
-
-        # 定义自定义样式
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=24,
-            textColor=colors.HexColor('#2E86AB'),
-            spaceAfter=30,
-            fontName='ChineseFont' if os.path.exists('/usr/share/fonts/truetype/wqy/wqy-zenhei.ttc') else 'Helvetica-Bold'
-        )
-
-        heading_style = ParagraphStyle(
-            'CustomHeading',
-            parent=styles['Heading2'],
-            fontSize=16,
-            textColor=colors.HexColor('#444444'),
-            spaceAfter=12,
-            spaceBefore=20,
-            fontName='ChineseFont' if os.path.exists('/usr/share/fonts/truetype/wqy/wqy-zenhei.ttc') else 'Helvetica-Bold'
-        )
-
-        normal_style = ParagraphStyle(
-            'CustomNormal',
-            parent=styles['Normal'],
-            fontSize=11,
-            textColor=colors.HexColor('#333333'),
-            spaceAfter=8,
-            leading=16,
-            fontName='ChineseFont' if os.path.exists('/usr/share/fonts/truetype/wqy/wqy-zenhei.ttc') else 'Helvetica'
-        )
-
-        # 构建文档内容
-        story = []
-
-        # 标题
-        story.append(Paragraph(f"{user_data['city']}OPC超级个体创业指导手册", title_style))
-        story.append(Spacer(1, 20))
-
-        # 用户画像分析
-        story.append(Paragraph("一、用户画像分析", heading_style))
-        story.append(Paragraph(user_info.replace('\n', '<br/>'), normal_style))
-        story.append(Spacer(1, 20))
-
-        # 城市环境深度分析
-        story.append(PageBreak())
-        story.append(Paragraph(f"二、{user_data['city']}创业环境深度分析", heading_style))
-        story.append(Paragraph(f"<b>人口结构：</b>{city_analysis.get('population', '')}", normal_style))
-        story.append(Spacer(1, 8))
-        story.append(Paragraph(f"<b>产业结构：</b>{city_analysis.get('industry', '')}", normal_style))
-        story.append(Spacer(1, 8))
-        story.append(Paragraph(f"<b>商业环境：</b>{city_analysis.get('business', '')}", normal_style))
-        story.append(Spacer(1, 8))
-        story.append(Paragraph(f"<b>政府政策：</b>{city_analysis.get('policy', '')}", normal_style))
-        story.append(Spacer(1, 8))
-        story.append(Paragraph(f"<b>创业机会：</b>{city_analysis.get('opportunities', '')}", normal_style))
-        story.append(Spacer(1, 8))
-        story.append(Paragraph(f"<b>针对性建议：</b>{city_analysis.get('recommendations', '')}", normal_style))
-        story.append(Spacer(1, 20))
-
-        # 推荐创业项目
-        story.append(PageBreak())
-        story.append(Paragraph("三、精选创业项目推荐", heading_style))
-        story.append(Paragraph(f"以下项目基于您的个人特点和{user_data['city']}的市场环境精选而成：", normal_style))
-        story.append(Spacer(1, 10))
-        story.append(Paragraph(projects.replace('\n', '<br/>'), normal_style))
-        story.append(Spacer(1, 20))
-
-        # 针对性启动指南
-        story.append(Paragraph("四、针对性启动指南", heading_style))
-        story.append(Paragraph(f"基于{user_data['city']}的市场环境，建议按以下步骤启动：", normal_style))
-        story.append(Paragraph(f"<b>1. 市场调研：</b>深入了解{user_data['city']}目标用户需求和本地竞争对手情况。", normal_style))
-        story.append(Paragraph(f"<b>2. 最小可行产品（MVP）：</b>快速推出核心功能，在{user_data['city']}市场进行验证。", normal_style))
-        story.append(Paragraph(f"<b>3. 品牌建设：</b>建立专业形象，针对{user_data['city']}用户特点设计营销策略。", normal_style))
-        story.append(Paragraph(f"<b>4. 客户获取：</b>利用{user_data['city']}本地资源和渠道，快速获取首批客户。", normal_style))
-        story.append(Paragraph(f"<b>5. 持续迭代：</b>根据{user_data['city']}市场反馈不断优化产品和服务。", normal_style))
-
-        # 生成PDF
-        doc.build(story)
-
-        return f"✅ PDF文档已生成！\n\n📄 文件路径：{temp_pdf_path}\n\n💡 提示：当前为简化版本，PDF保存在服务器上。"
+        cache = get_pdf_cache()
+        key = make_cache_key(PDF_TEMPLATE_VERSION, user_info, city, projects)
+        pdf_bytes = cache.get(key) if cache else None
+        if pdf_bytes is None:
+            pdf_bytes = get_render_pool().render(render_opc_pdf, user_info, city, projects)
+            if cache:
+                cache.put(key, pdf_bytes)
+        return _deliver(pdf_bytes, key)
+    except Exception as e:
+        return _pdf_error_message(e)
 
+
+@async_impl(generate_opc_pdf_simple)
+async def _agenerate_opc_pdf_simple(
+    user_info: str,
+    city: str,
+    projects: str
+) -> str:
+    try:
+        cache = get_pdf_cache()
+        key = make_cache_key(PDF_TEMPLATE_VERSION, user_info, city, projects)
+        pdf_bytes = await asyncio.to_thread(cache.get, key) if cache else None
+        if pdf_bytes is None:
+            pdf_bytes = await get_render_pool().render_async(render_opc_pdf, user_info, city, projects)
+            if cache:
+                await asyncio.to_thread(cache.put, key, pdf_bytes)
+        return await asyncio.to_thread(_deliver, pdf_bytes, key)
     except Exception as e:
-        import traceback
-        error_details = traceback.format_exc()
-        return f"❌ 生成PDF失败：{str(e)}\n\n详细信息：\n{error_details}"
+        return _pdf_error_message(e)
 
     
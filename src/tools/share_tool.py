@@ -1,10 +1,11 @@
-import os
 import qrcode
-from PIL import Image, ImageDraw, ImageFont
+from PIL import Image, ImageDraw
 from io import BytesIO
 import base64
 import logging
 
+from utils.fonts import get_pil_font
+
 logger = logging.getLogger(__name__)
 
 # 图片尺寸配置
@@ -12,6 +13,9 @@ POSTER_WIDTH = 600
 POSTER_HEIGHT = 800
 QR_CODE_SIZE = 200
 PADDING = 40
+FONT_SIZE_LARGE = 32
+FONT_SIZE_MEDIUM = 24
+FONT_SIZE_SMALL = 18
 
 
 def generate_share_poster(share_url: str, base_url: str = "https://opc-agent.onrender.com") -> str:
@@ -43,43 +47,10 @@ def generate_share_poster(share_url: str, base_url: str = "https://opc-agent.onr
         poster = Image.new('RGB', (POSTER_WIDTH, POSTER_HEIGHT), color='white')
         draw = ImageDraw.Draw(poster)
 
-        # 尝试加载中文字体
-        try:
-            # 优先使用系统字体
-            font_paths = [
-                '/usr/share/fonts/truetype/wqy/wqy-zenhei.ttc',
-                '/usr/share/fonts/truetype/wqy/wqy-microhei.ttc',
-                '/System/Library/Fonts/PingFang.ttc',
-                '/System/Library/Fonts/STHeiti Light.ttc',
-                'C:\\Windows\\Fonts\\msyh.ttc',
-                'C:\\Windows\\Fonts\\simhei.ttf',
-            ]
-
-            font_large = None
-            font_medium = None
-            font_small = None
-
-            for font_path in font_paths:
-                if os.path.exists(font_path):
-                    try:
-                        font_large = ImageFont.truetype(font_path, 32)
-                        font_medium = ImageFont.truetype(font_path, 24)
-                        font_small = ImageFont.truetype(font_path, 18)
-                        break
-                    except:
-                        continue
-
-            # 如果加载失败，使用默认字体
-            if font_large is None:
-                font_large = ImageFont.load_default()
-                font_medium = ImageFont.load_default()
-                font_small = ImageFont.load_default()
-
-        except Exception as e:
-            logger.warning(f"Failed to load Chinese font: {e}, using default font")
-            font_large = ImageFont.load_default()
-            font_medium = ImageFont.load_default()
-            font_small = ImageFont.load_default()
+        # 中文字体（共享字体注册表按字号缓存）
+        font_large = get_pil_font(FONT_SIZE_LARGE)
+        font_medium = get_pil_font(FONT_SIZE_MEDIUM)
+        font_small = get_pil_font(FONT_SIZE_SMALL)
 
         # 绘制标题
         title = "🚀 OPC 超级个体孵化助手"
@@ -0,0 +1,16 @@
+"""
+工具定义的公共辅助函数
+"""
+
+
+def async_impl(sync_tool):
+    """
+    为已定义的同步工具注册异步实现（参数需与同步实现一致）
+
+    同步实现供 invoke 使用（Flask 路径），异步实现供 ainvoke 使用（graph.ainvoke），
+    IO 或耗时计算期间不阻塞事件循环
+    """
+    def decorator(coroutine):
+        sync_tool.coroutine = coroutine
+        return coroutine
+    return decorator
@@ -0,0 +1,275 @@
+"""
+远程文件下载缓存
+以 URL 的哈希作为 key 把下载结果保存在本地，同一文件的重复读取不再重新下载：
+1. 缓存在 DOWNLOAD_CACHE_TTL 秒内直接使用；过期后带 ETag / Last-Modified 发条件请求，304 时继续使用本地文件
+2. 先写临时文件，下载完成后原子重命名，其他进程不会读到写了一半的文件
+3. 同一 URL 的并发请求共用一次下载（按 key 分段加锁）
+4. 按最近使用时间（文件 mtime）做 LRU 淘汰，同一目录下所有进程合计不超过上限
+"""
+import os
+import json
+import time
+import hashlib
+import logging
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Any, BinaryIO, Dict, List, Optional, Tuple
+
+import requests
+
+from utils.http_client import get_http_session
+
+logger = logging.getLogger(__name__)
+
+DOWNLOAD_CACHE_ENABLED = os.getenv("DOWNLOAD_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+DOWNLOAD_CACHE_DIR = os.getenv("DOWNLOAD_CACHE_DIR", os.path.join(tempfile.gettempdir(), "opc_download_cache"))
+DOWNLOAD_CACHE_MAX_BYTES = int(os.getenv("DOWNLOAD_CACHE_MAX_BYTES", str(1024 * 1024 * 1024)))
+# 在该时间内直接使用缓存，不向源站确认（秒）
+DOWNLOAD_CACHE_TTL = float(os.getenv("DOWNLOAD_CACHE_TTL", "300"))
+DOWNLOAD_TIMEOUT = 120
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3'
+}
+
+# 分段锁数量：同一 URL 总是落到同一把锁上
+_LOCK_STRIPES = 64
+
+
+class DownloadCache:
+    """按 URL 缓存远程文件，支持条件请求重新验证"""
+
+    def __init__(self, cache_dir: str = DOWNLOAD_CACHE_DIR, max_bytes: int = DOWNLOAD_CACHE_MAX_BYTES,
+                 ttl: float = DOWNLOAD_CACHE_TTL, max_file_size: Optional[int] = None):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.max_file_size = max_file_size
+        self._lock = threading.Lock()
+        self._key_locks = [threading.Lock() for _ in range(_LOCK_STRIPES)]
+        self._entries: "OrderedDict[str, int]" = OrderedDict()  # key -> 文件大小，上次扫描目录的结果加本进程的访问
+        self._total_bytes = 0
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(cache_dir, exist_ok=True)
+        self._load_index()
+
+    @staticmethod
+    def make_key(url: str) -> str:
+        return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+    def _data_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.data")
+
+    def _meta_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _tmp_path(self, path: str) -> str:
+        return f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+    def _scan(self) -> List[Tuple[float, str, int]]:
+        """扫描缓存目录，返回按修改时间（命中时会更新，即最近使用时间）排序的 (mtime, key, size)"""
+        files = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".data"):
+                continue
+            try:
+                st = os.stat(os.path.join(self.cache_dir, name))
+            except FileNotFoundError:
+                continue
+            files.append((st.st_mtime, name[:-5], st.st_size))
+        files.sort()
+        return files
+
+    def _load_index(self) -> None:
+        """启动时按目录重建 LRU 顺序"""
+        with self._lock:
+            self._evict()
+
+    def _remove_files(self, key: str) -> None:
+        for path in (self._data_path(key), self._meta_path(key)):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def _drop(self, key: str) -> None:
+        """删除某个缓存条目"""
+        with self._lock:
+            size = self._entries.pop(key, None)
+            if size is not None:
+                self._total_bytes -= size
+            self._remove_files(key)
+
+    def _evict(self, keep: Optional[str] = None) -> None:
+        """
+        淘汰最久未使用的文件（调用方持有 self._lock）；keep 为刚写入的 key，不会被淘汰
+        缓存目录由多个 worker 进程共用，每次都以目录为准重新统计：上限对所有进程合计生效，
+        淘汰顺序按 mtime 而不是本进程的访问记录
+        """
+        files = self._scan()
+        total = sum(size for _, _, size in files)
+        entries: "OrderedDict[str, int]" = OrderedDict()
+        for _, key, size in files:
+            if total > self.max_bytes and key != keep:
+                total -= size
+                self.evictions += 1
+                self._remove_files(key)
+                continue
+            entries[key] = size
+        self._entries = entries
+        self._total_bytes = total
+
+    def _read_meta(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._meta_path(key), "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        if not os.path.exists(self._data_path(key)):
+            return None
+        return meta
+
+    def _write_meta(self, key: str, meta: Dict[str, Any]) -> None:
+        path = self._meta_path(key)
+        tmp_path = self._tmp_path(path)
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, path)
+
+    def _touch(self, key: str) -> None:
+        now = time.time()
+        try:
+            os.utime(self._data_path(key), (now, now))
+        except FileNotFoundError:
+            pass
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+
+    def _download(self, key: str, url: str, resp) -> None:
+        """把响应体写入临时文件，完成后原子替换缓存文件"""
+        content_length = resp.headers.get("Content-Length")
+        if self.max_file_size and content_length and int(content_length) > self.max_file_size:
+            raise Exception(f"文件大小 ({int(content_length)} bytes) 超过限制 {self.max_file_size} bytes，已终止下载。")
+
+        path = self._data_path(key)
+        tmp_path = self._tmp_path(path)
+        size = 0
+        try:
+            with open(tmp_path, "wb") as f:
+                for chunk in resp.iter_content(chunk_size=65536):
+                    if chunk:
+                        size += len(chunk)
+                        if self.max_file_size and size > self.max_file_size:
+                            raise Exception(f"检测到文件超过 {self.max_file_size} bytes，已中断。")
+                        f.write(chunk)
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except FileNotFoundError:
+                pass
+            raise
+
+        self._write_meta(key, {
+            "url": url,
+            "etag": resp.headers.get("ETag"),
+            "last_modified": resp.headers.get("Last-Modified"),
+            "size": size,
+            "checked_at": time.time(),
+        })
+        with self._lock:
+            self._evict(keep=key)
+
+    def fetch(self, url: str) -> str:
+        """
+        获取 URL 对应的本地缓存文件路径（必要时下载或重新验证）
+
+        Raises:
+            RuntimeError: 源站返回 4xx（同时删除本地缓存），或网络请求失败且没有可用的本地缓存
+        """
+        key = self.make_key(url)
+        with self._key_locks[int(key[:8], 16) % _LOCK_STRIPES]:
+            meta = self._read_meta(key)
+            if meta and time.time() - meta.get("checked_at", 0) < self.ttl:
+                self._touch(key)
+                with self._lock:
+                    self.hits += 1
+                return self._data_path(key)
+
+            headers = dict(DEFAULT_HEADERS)
+            if meta:
+                if meta.get("etag"):
+                    headers["If-None-Match"] = meta["etag"]
+                if meta.get("last_modified"):
+                    headers["If-Modified-Since"] = meta["last_modified"]
+
+            try:
+                with get_http_session().get(url, headers=headers, stream=True, timeout=DOWNLOAD_TIMEOUT) as resp:
+                    if meta and resp.status_code == 304:
+                        meta["checked_at"] = time.time()
+                        self._write_meta(key, meta)
+                        self._touch(key)
+                        with self._lock:
+                            self.revalidated += 1
+                        return self._data_path(key)
+                    if 400 <= resp.status_code < 500:
+                        # 文件已删除或访问权限已收回（404 / 403 / 410 等）：丢弃本地副本，不再继续提供
+                        if meta:
+                            self._drop(key)
+                        raise RuntimeError(f"网络请求失败: HTTP {resp.status_code} ({url})")
+                    resp.raise_for_status()
+                    self._download(key, url, resp)
+            except requests.RequestException as e:
+                if meta:
+                    # 源站暂时不可用（连接失败、超时、5xx）时继续使用旧文件
+                    logger.warning(f"Revalidation failed for {url}, using cached copy: {e}")
+                    return self._data_path(key)
+                raise RuntimeError(f"网络请求失败: {e}")
+
+            with self._lock:
+                self.misses += 1
+            return self._data_path(key)
+
+    def open(self, url: str) -> BinaryIO:
+        """获取并打开缓存文件（打开后即使被淘汰，已打开的句柄仍可读）"""
+        try:
+            return open(self.fetch(url), "rb")
+        except FileNotFoundError:
+            # fetch 返回后、打开前刚好被其他线程淘汰，重新获取一次
+            return open(self.fetch(url), "rb")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.revalidated + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "revalidated": self.revalidated,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round((self.hits + self.revalidated) / lookups, 4) if lookups else 0.0,
+            }
+
+
+_download_cache: Optional[DownloadCache] = None
+_download_cache_lock = threading.Lock()
+
+
+def get_download_cache() -> Optional[DownloadCache]:
+    """获取进程内共享的下载缓存（DOWNLOAD_CACHE_ENABLED=false 时返回 None）"""
+    global _download_cache
+    if not DOWNLOAD_CACHE_ENABLED:
+        return None
+    if _download_cache is None:
+        with _download_cache_lock:
+            if _download_cache is None:
+                from utils.file.file import MAX_FILE_SIZE
+                _download_cache = DownloadCache(max_file_size=MAX_FILE_SIZE)
+    return _download_cache
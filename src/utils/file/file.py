@@ -1,14 +1,38 @@
 import os
 import requests
 import uuid
+import shutil
+import tempfile
 import chardet
 from io import BytesIO
-from typing import Literal,Callable, Any, Optional,Union
+from typing import Literal,Callable, Any, Optional,Union, BinaryIO, Iterable, Iterator
 from pydantic import BaseModel, Field, field_validator,PrivateAttr,ConfigDict
 from urllib.parse import urlparse
 from pptx import Presentation
 
+from utils.file.download_cache import get_download_cache
+from utils.http_client import get_http_session
+from utils.file.parallel_extract import iter_pages_parallel, should_parallelize
+
 MAX_FILE_SIZE = 100 * 1024 * 1024
+# 远程文件超过该大小时从内存转存到临时文件
+SPOOL_MAX_MEMORY = int(os.getenv("FILE_SPOOL_MAX_MEMORY", str(8 * 1024 * 1024)))
+# 文本提取预算（0 表示不限制）：最多字符数、最多页数
+EXTRACT_MAX_CHARS = int(os.getenv("FILE_EXTRACT_MAX_CHARS", "0"))
+EXTRACT_MAX_PAGES = int(os.getenv("FILE_EXTRACT_MAX_PAGES", "0"))
+# 表格每块转换的行数
+EXTRACT_SHEET_ROWS = 500
+
+DOCUMENT_EXTS = ['.pdf', '.doc', '.docx', '.xls', '.xlsx', '.csv', '.ppt', '.pptx']
+# 各格式页与页之间的分隔符
+DOCUMENT_SEPARATORS = {
+    '.pdf': '\n',
+    '.doc': '\n\n',
+    '.docx': '\n\n',
+    '.ppt': '\n\n',
+    '.pptx': '\n\n',
+}
+TRUNCATED_NOTICE = "[已达到提取上限，之后的内容未提取]"
 
 class File(BaseModel):
     """
@@ -99,16 +123,25 @@ class FileOps:
     DOWNLOAD_DIR = "/tmp"
 
     @staticmethod
-    def _get_bytes_stream(file_obj:File) -> tuple[bytes, str]:
+    def _open_stream(file_obj: File) -> tuple[BinaryIO, str]:
         """
-        获取文件内容和后缀, 大小限制检查, 超出抛异常
+        打开文件内容流和后缀, 大小限制检查, 超出抛异常
+        远程文件优先走下载缓存（见 download_cache）；未开启缓存时下载到 SpooledTemporaryFile：
+        小于 SPOOL_MAX_MEMORY 时留在内存，超过后自动落盘，不会在内存中同时保留多份完整内容；
+        本地文件直接打开，不整体读入内存。
+        调用方负责关闭返回的流。
         """
         _, ext = infer_file_category(file_obj.url)
 
         if file_obj.is_remote:
+            cache = get_download_cache()
+            if cache is not None:
+                return cache.open(file_obj.url), ext
+
+            spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY, dir=FileOps.DOWNLOAD_DIR)
             try:
                 # stream=True: 此时只下载 Headers，连接保持打开，还没下载 Body
-                with requests.get(file_obj.url, stream=True, timeout=60) as resp:
+                with get_http_session().get(file_obj.url, stream=True, timeout=60) as resp:
                     resp.raise_for_status()
 
                     content_length = resp.headers.get('Content-Length')
@@ -118,35 +151,44 @@ class FileOps:
                         )
 
                     # 场景：Header 缺失 Content-Length 或服务器 Header 欺骗
-                    downloaded_content = BytesIO()
                     current_size = 0
 
-                    # 分块读取，每块 8KB
-                    for chunk in resp.iter_content(chunk_size=8192):
+                    # 分块读取，每块 64KB
+                    for chunk in resp.iter_content(chunk_size=65536):
                         if chunk:
                             current_size += len(chunk)
                             if current_size > MAX_FILE_SIZE:
                                 raise Exception(f"检测到文件超过 100MB，已中断。")
-                            downloaded_content.write(chunk)
+                            spool.write(chunk)
 
-                    # 获取完整 bytes
-                    return downloaded_content.getvalue(), ext
+                spool.seek(0)
+                return spool, ext
 
             except requests.RequestException as e:
+                spool.close()
                 raise RuntimeError(f"网络请求失败: {e}")
+            except Exception:
+                spool.close()
+                raise
 
         else:
             if not os.path.exists(file_obj.url):
                 raise FileNotFoundError(f"本地文件不存在: {file_obj.url}")
 
-            '''
             file_size = os.path.getsize(file_obj.url)
             if file_size > MAX_FILE_SIZE:
-                 raise Exception(f"本地文件大小 ({file_size} bytes) 超过限制 100MB")
-            '''
+                raise Exception(f"本地文件大小 ({file_size} bytes) 超过限制 100MB")
 
-            with open(file_obj.url, 'rb') as f:
-                return f.read(), ext
+            return open(file_obj.url, 'rb'), ext
+
+    @staticmethod
+    def _get_bytes_stream(file_obj:File) -> tuple[bytes, str]:
+        """
+        获取文件内容和后缀, 大小限制检查, 超出抛异常
+        """
+        stream, ext = FileOps._open_stream(file_obj)
+        with stream:
+            return stream.read(), ext
 
     @staticmethod
     def save_to_local(file_obj: File, filename: str) -> str:
@@ -162,14 +204,19 @@ class FileOps:
 
         try:
             os.makedirs(FileOps.DOWNLOAD_DIR, exist_ok=True)
-
-            # 简单的文件名生成策略 (真实场景建议用 url hash 避免重复下载)
-            # ext = os.path.splitext(file_obj.url.split('?')[0])[1] or ".tmp"
-            # filename = f"{uuid.uuid4().hex}{ext}"
             local_path = os.path.join(FileOps.DOWNLOAD_DIR, filename)
 
+            cache = get_download_cache()
+            if cache is not None:
+                # 同一 URL 只下载一次；复制一份到目标路径，调用方修改文件不会影响缓存
+                tmp_path = f"{local_path}.{uuid.uuid4().hex}.tmp"
+                with cache.open(file_obj.url) as src, open(tmp_path, 'wb') as dst:
+                    shutil.copyfileobj(src, dst)
+                os.replace(tmp_path, local_path)
+                return local_path
+
             headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3'}
-            with requests.get(file_obj.url, headers=headers, stream=True, timeout=120) as r:
+            with get_http_session().get(file_obj.url, headers=headers, stream=True, timeout=120) as r:
                 r.raise_for_status()
                 with open(local_path, 'wb') as f:
                     for chunk in r.iter_content(chunk_size=8192):
@@ -189,137 +236,234 @@ class FileOps:
         return content
 
     @staticmethod
-    def extract_text(file_obj: File) -> str:
+    def extract_text(file_obj: File, max_chars: Optional[int] = None, max_pages: Optional[int] = None) -> str:
         """
         提取文本内容
         场景：RAG、HTML解析、文档分析
+        max_chars / max_pages: 提取预算，达到后不再解析后续页面（默认取 FILE_EXTRACT_MAX_CHARS / FILE_EXTRACT_MAX_PAGES，0 表示不限制）
         """
         try:
-            content, ext = FileOps._get_bytes_stream(file_obj)
-
-            if ext in ['.pdf', '.doc', '.docx', '.xls', '.xlsx', '.ppt', '.pptx']:
-                return FileOps._parse_document_bytes(file_obj, content, ext)
+            stream, ext = FileOps._open_stream(file_obj)
+            with stream:
+                if ext in DOCUMENT_EXTS:
+                    return FileOps._parse_document_bytes(file_obj, stream, ext, max_chars=max_chars, max_pages=max_pages)
 
-            # 默认直接读
-            charset = chardet.detect(content)
-            if 'encoding' in charset:
-                return content.decode(charset['encoding'])
-            else:
-                return content.decode('utf-8')
+                # 默认直接读
+                content = stream.read()
+            return collect_text([_decode_text(content)], "", max_chars=max_chars)
 
         except Exception as e:
             return f"[FileOps Error] Failed to read content: {str(e)}"
 
     @staticmethod
-    def _parse_document_bytes(file_obj: File, content: bytes, ext:str) -> str:
-        stream = BytesIO(content)
-        text_result = ""
+    def iter_text(file_obj: File) -> Iterator[str]:
+        """
+        逐页产出文本（PDF 页 / 表格行块 / PPT 幻灯片 / Word 段落），调用方拿到足够内容后可随时停止迭代，
+        后续页面不会被解析；迭代结束或中途停止时关闭文件
+        """
+        stream, ext = FileOps._open_stream(file_obj)
+        with stream:
+            if ext in DOCUMENT_EXTS:
+                yield from iter_document_text(stream, ext)
+                return
+            content = stream.read()
+        yield _decode_text(content)
+
+    @staticmethod
+    def _parse_document_bytes(file_obj: File, content: Union[bytes, BinaryIO], ext:str,
+                              max_chars: Optional[int] = None, max_pages: Optional[int] = None) -> str:
+        """
+        解析文档文本；content 可以是 bytes，也可以是可 seek 的文件对象（直接交给解析库，不再复制一份 bytes）
+        """
+        stream = BytesIO(content) if isinstance(content, (bytes, bytearray)) else content
 
         try:
-            if ext == '.pdf':
-                import pypdf
-                reader = pypdf.PdfReader(stream)
-                for page in reader.pages:
-                    text_result += page.extract_text() + "\n"
-            elif ext in ['.docx', '.doc']:
-                text_result = read_docx(stream)
-            elif ext in ['.xlsx', '.xls', '.csv']:
-                import pandas as pd
-                if ext == '.csv':
-                    df = pd.read_csv(stream)
-                else:
-                    df = pd.read_excel(stream)
-                text_result = df.to_string()
-            elif ext in ['.ppt', '.pptx']:
-                text_result = read_ppt(stream)
-            else:
-                text_result = f"[暂不支持解析该文档格式: {ext}]"
+            return collect_text(iter_document_text(stream, ext), DOCUMENT_SEPARATORS.get(ext, "\n"),
+                                max_chars=max_chars, max_pages=max_pages)
         except ImportError as e:
-            text_result = f"[解析库缺失] {e}"
+            return f"[解析库缺失] {e}"
         except Exception as e:
-            text_result = f"[解析失败] {e}"
+            return f"[解析失败] {e}"
 
-        return text_result
 
-def read_docx(cont_stream) -> str:
+def _decode_text(content: bytes) -> str:
+    charset = chardet.detect(content)
+    if 'encoding' in charset:
+        return content.decode(charset['encoding'])
+    else:
+        return content.decode('utf-8')
+
+
+def collect_text(chunks: Iterable[str], sep: str = "\n", max_chars: Optional[int] = None,
+                 max_pages: Optional[int] = None) -> str:
     """
-    使用docx2python按顺序读取内容
+    按预算收集分页文本：先放进列表最后一次 join（避免字符串反复拼接），
+    超出 max_chars / max_pages 时停止迭代并追加截断提示
+    """
+    max_chars = EXTRACT_MAX_CHARS if max_chars is None else max_chars
+    max_pages = EXTRACT_MAX_PAGES if max_pages is None else max_pages
+    parts = []
+    total = 0
+    truncated = False
+    iterator = iter(chunks)
+    try:
+        for text in iterator:
+            # 分隔符也计入字数
+            gap = len(sep) if parts else 0
+            if max_chars and total + gap + len(text) > max_chars:
+                remaining = max_chars - total - gap
+                if remaining > 0:
+                    parts.append(text[:remaining])
+                truncated = True
+                break
+            parts.append(text)
+            total += gap + len(text)
+            if max_pages and len(parts) >= max_pages:
+                # 恰好取完最后一页时不算截断：再取一页确认后面还有内容
+                truncated = next(iterator, None) is not None
+                break
+    finally:
+        # 提前停止时关闭生成器，释放解析库持有的资源
+        close = getattr(iterator, "close", None)
+        if close:
+            close()
+
+    result = sep.join(parts)
+    if truncated:
+        result += f"\n\n{TRUNCATED_NOTICE}"
+    return result
+
+
+def iter_document_text(stream: BinaryIO, ext: str) -> Iterator[str]:
+    """
+    按页产出文档文本，只有被迭代到的页面才会被解析
+    页数较多的 PDF 交给进程池按页码区间并行提取（见 parallel_extract）
+    """
+    if ext == '.pdf':
+        import pypdf
+        reader = pypdf.PdfReader(stream)
+        if should_parallelize(len(reader.pages), ext):
+            yield from iter_pages_parallel(stream, ext, len(reader.pages))
+            return
+        for page in reader.pages:
+            yield page.extract_text() or ""
+    elif ext in ['.docx', '.doc']:
+        yield from iter_docx(stream)
+    elif ext in ['.xlsx', '.xls', '.csv']:
+        yield from iter_sheets(stream, ext)
+    elif ext in ['.ppt', '.pptx']:
+        prs = Presentation(stream)
+        for i, slide in enumerate(prs.slides):
+            yield _slide_text(i, slide)
+    else:
+        yield f"[暂不支持解析该文档格式: {ext}]"
+
+
+def iter_sheets(stream: BinaryIO, ext: str) -> Iterator[str]:
+    """按 EXTRACT_SHEET_ROWS 行一块产出表格文本；CSV 分块读取，Excel 逐个工作表处理"""
+    import pandas as pd
+    if ext == '.csv':
+        # 按开头一段内容识别编码（国内常见 GBK 导出的 CSV）
+        sample = stream.read(64 * 1024)
+        stream.seek(0)
+        encoding = chardet.detect(sample).get('encoding') or 'utf-8'
+        reader = pd.read_csv(stream, chunksize=EXTRACT_SHEET_ROWS, encoding=encoding, encoding_errors='replace')
+        for i, df in enumerate(reader):
+            yield df.to_string(header=i == 0)
+        return
+
+    with pd.ExcelFile(stream) as xls:
+        for sheet_name in xls.sheet_names:
+            df = xls.parse(sheet_name)
+            for start in range(0, max(len(df), 1), EXTRACT_SHEET_ROWS):
+                block = df.iloc[start:start + EXTRACT_SHEET_ROWS].to_string(header=start == 0)
+                yield f"=== {sheet_name} ===\n{block}" if start == 0 else block
+
+
+def iter_docx(cont_stream) -> Iterator[str]:
+    """
+    使用docx2python按顺序逐段产出内容
     """
     from docx2python import docx2python
     doc_result = docx2python(cont_stream)
 
-    # 获取文档结构
-    all_parts = []
-
-    # docx2python以嵌套列表形式返回内容
-    # 遍历文档主体
-    for section in doc_result.body:
-        if isinstance(section, list):
-            for item in section:
-                if isinstance(item, list):
-                    # 可能是表格或多级内容
-                    for sub_item in item:
-                        if isinstance(sub_item, str) and sub_item.strip():
-                            all_parts.append(sub_item.strip())
-                        elif isinstance(sub_item, list):
-                            # 表格行
-                            row_text = "\n".join([str(cell).strip() for cell in sub_item if str(cell).strip()])
-                            if row_text:
-                                all_parts.append(row_text)
-                elif isinstance(item, str) and item.strip():
-                    all_parts.append(item.strip())
-
-    # 关闭文档
-    doc_result.close()
-
-    return "\n\n".join(all_parts)
+    try:
+        # docx2python以嵌套列表形式返回内容
+        # 遍历文档主体
+        for section in doc_result.body:
+            if isinstance(section, list):
+                for item in section:
+                    if isinstance(item, list):
+                        # 可能是表格或多级内容
+                        for sub_item in item:
+                            if isinstance(sub_item, str) and sub_item.strip():
+                                yield sub_item.strip()
+                            elif isinstance(sub_item, list):
+                                # 表格行
+                                row_text = "\n".join([str(cell).strip() for cell in sub_item if str(cell).strip()])
+                                if row_text:
+                                    yield row_text
+                    elif isinstance(item, str) and item.strip():
+                        yield item.strip()
+    finally:
+        # 关闭文档
+        doc_result.close()
 
-def read_ppt(file_input: Union[str, bytes, BytesIO]) -> str:
-    if not Presentation:
-        return "[Error] 未安装 python-pptx 库，无法解析 PPT 文件"
 
-    # 1. 统一转换为文件流对象 (BytesIO)
+def read_docx(cont_stream) -> str:
+    """
+    使用docx2python按顺序读取内容
+    """
+    return "\n\n".join(iter_docx(cont_stream))
+
+
+def _slide_text(index: int, slide) -> str:
+    page_content = []
+    page_content.append(f"=== 第 {index+1} 页 ===")
+
+    # shape.text_frame 包含了形状内的文本段落
+    for shape in slide.shapes:
+        # 提取普通文本框
+        if hasattr(shape, "text") and shape.text.strip():
+            page_content.append(shape.text.strip())
+
+        # B. 提取表格内容 (普通 shape.text 无法获取表格内的字)
+        if shape.has_table:
+            table_texts = []
+            for row in shape.table.rows:
+                row_cells = [cell.text_frame.text.strip() for cell in row.cells if cell.text_frame.text.strip()]
+                if row_cells:
+                    table_texts.append(" | ".join(row_cells))
+            if table_texts:
+                page_content.append("[表格]\n" + "\n".join(table_texts))
+
+    # 很多重要信息藏在备注里
+    if slide.has_notes_slide:
+        notes = slide.notes_slide.notes_text_frame.text
+        if notes.strip():
+            page_content.append(f"[备注]: {notes.strip()}")
+
+    return "\n".join(page_content)
+
+
+def iter_ppt(file_input: Union[str, bytes, BinaryIO]) -> Iterator[str]:
+    """逐页产出幻灯片文本"""
     if isinstance(file_input, str):
         with open(file_input, 'rb') as f:
-            ppt_stream = BytesIO(f.read())
-    elif isinstance(file_input, bytes):
-        ppt_stream = BytesIO(file_input)
-    else:
-        ppt_stream = file_input
+            yield from iter_ppt(f)
+        return
 
-    try:
-        prs = Presentation(ppt_stream)
-        full_text = []
+    prs = Presentation(BytesIO(file_input) if isinstance(file_input, bytes) else file_input)
+    for i, slide in enumerate(prs.slides):
+        yield _slide_text(i, slide)
 
-        for i, slide in enumerate(prs.slides):
-            page_content = []
-            page_content.append(f"=== 第 {i+1} 页 ===")
-
-            # shape.text_frame 包含了形状内的文本段落
-            for shape in slide.shapes:
-                # 提取普通文本框
-                if hasattr(shape, "text") and shape.text.strip():
-                    page_content.append(shape.text.strip())
-
-                # B. 提取表格内容 (普通 shape.text 无法获取表格内的字)
-                if shape.has_table:
-                    table_texts = []
-                    for row in shape.table.rows:
-                        row_cells = [cell.text_frame.text.strip() for cell in row.cells if cell.text_frame.text.strip()]
-                        if row_cells:
-                            table_texts.append(" | ".join(row_cells))
-                    if table_texts:
-                        page_content.append("[表格]\n" + "\n".join(table_texts))
-
-            # 很多重要信息藏在备注里
-            if slide.has_notes_slide:
-                notes = slide.notes_slide.notes_text_frame.text
-                if notes.strip():
-                    page_content.append(f"[备注]: {notes.strip()}")
-
-            full_text.append("\n".join(page_content))
-
-        return "\n\n".join(full_text)
+
+def read_ppt(file_input: Union[str, bytes, BytesIO]) -> str:
+    if not Presentation:
+        return "[Error] 未安装 python-pptx 库，无法解析 PPT 文件"
+
+    try:
+        return "\n\n".join(iter_ppt(file_input))
 
     except Exception as e:
         return f"[PPT解析失败] {str(e)}"
@@ -0,0 +1,178 @@
+"""
+多进程文档文本提取
+大 PDF 的逐页文本提取是纯 CPU 计算，按页码区间切分后交给进程池并行处理：
+1. 先把文档复制为本次提取专用的临时文件，每个任务只传该路径和页码区间，子进程自行打开，不在进程间传输整个文档
+   （pypdf 按需解析页面，子进程打开文件只读取交叉引用表，切分后的解析开销不会成倍增加）
+2. 按页码顺序产出结果；在途任务数有上限，调用方提前停止迭代（达到字数/页数预算）时不会白白解析整份文档
+3. 整份文档有时间预算，超时后停止并追加提示，已提取的内容照常返回；
+   仍在运行的任务无法取消，超时后回收整个进程池（结束子进程），下次使用时重建，
+   同时在用该进程池的其他文档把未完成的页码区间重新提交到新进程池
+PPT 不切分：python-pptx 打开文件时会解析整份演示文稿，每个任务都要重复解析一遍，
+而逐页取文本本身很快，在当前进程解析一次后逐页产出更省
+页数少于 FILE_EXTRACT_PARALLEL_MIN_PAGES 或只有一个 CPU 时同样在当前进程逐页提取
+"""
+import os
+import time
+import atexit
+import shutil
+import logging
+import tempfile
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from typing import BinaryIO, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def _cpu_count() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+# 提取进程数（≤1 表示不启用进程池）
+EXTRACT_WORKERS = int(os.getenv("FILE_EXTRACT_WORKERS", str(min(4, _cpu_count()))))
+# 页数达到该值才并行提取
+EXTRACT_PARALLEL_MIN_PAGES = int(os.getenv("FILE_EXTRACT_PARALLEL_MIN_PAGES", "16"))
+# 每个任务处理的页数
+EXTRACT_PAGES_PER_TASK = int(os.getenv("FILE_EXTRACT_PAGES_PER_TASK", "8"))
+# 单份文档并行提取的时间预算（秒）
+EXTRACT_TIME_BUDGET = float(os.getenv("FILE_EXTRACT_TIME_BUDGET", "60"))
+
+PARALLEL_EXTS = ('.pdf',)
+TIMEOUT_NOTICE = "[解析超时，之后的内容未提取]"
+
+
+def extract_page_range(path: str, ext: str, start: int, end: int) -> List[str]:
+    """在子进程中提取 PDF [start, end) 页的文本"""
+    import pypdf
+    reader = pypdf.PdfReader(path)
+    return [reader.pages[i].extract_text() or "" for i in range(start, end)]
+
+
+def should_parallelize(page_count: int, ext: str = '.pdf') -> bool:
+    return ext in PARALLEL_EXTS and EXTRACT_WORKERS > 1 and page_count >= EXTRACT_PARALLEL_MIN_PAGES
+
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_extract_executor() -> ProcessPoolExecutor:
+    """获取进程内共享的提取进程池（首次使用时才启动子进程）"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                # spawn：避免从多线程的 Web worker 中 fork 出持有锁的子进程
+                _executor = ProcessPoolExecutor(
+                    max_workers=max(1, EXTRACT_WORKERS),
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+                atexit.register(_executor.shutdown, wait=False, cancel_futures=True)
+                logger.info(f"Document extract pool started: workers={EXTRACT_WORKERS}")
+    return _executor
+
+
+def _recycle_executor(executor: ProcessPoolExecutor) -> None:
+    """
+    回收进程池：取消排队中的任务并结束子进程（运行中的任务无法通过 future 取消，会一直占着子进程）
+    共享进程池被回收后由下次 get_extract_executor 重新创建
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is executor:
+            _executor = None
+    processes = [p for p in (getattr(executor, "_processes", None) or {}).values() if p.is_alive()]
+    executor.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        process.terminate()
+    if processes:
+        logger.warning(f"Document extract pool recycled, terminated {len(processes)} worker processes")
+
+
+def _materialize(stream: BinaryIO, ext: str) -> str:
+    """
+    把已打开的文件复制为本次提取专用的临时文件，返回路径（调用方用完删除）
+    不直接把 stream.name 交给子进程：下载缓存中的文件可能在提取过程中被淘汰或被新版本替换，
+    从已打开的句柄复制则始终是调用方拿到的那份内容
+    """
+    stream.seek(0)
+    with tempfile.NamedTemporaryFile(suffix=ext, delete=False) as f:
+        shutil.copyfileobj(stream, f)
+        return f.name
+
+
+def iter_pages_parallel(stream: BinaryIO, ext: str, page_count: int, executor=None,
+                        pages_per_task: Optional[int] = None, time_budget: Optional[float] = None) -> Iterator[str]:
+    """
+    按页码区间并行提取，按原始顺序逐页产出文本
+    超过时间预算时产出 TIMEOUT_NOTICE 后结束，并回收进程池（调用方传入的 executor 此后不能再使用）
+    """
+    shared = executor is None
+    executor = executor or get_extract_executor()
+    pages_per_task = max(1, pages_per_task or EXTRACT_PAGES_PER_TASK)
+    time_budget = EXTRACT_TIME_BUDGET if time_budget is None else time_budget
+    window = 2 * max(1, getattr(executor, "_max_workers", EXTRACT_WORKERS))
+
+    path = _materialize(stream, ext)
+    deadline = time.monotonic() + time_budget
+    ranges = iter([(s, min(s + pages_per_task, page_count)) for s in range(0, page_count, pages_per_task)])
+    pending = deque()  # (start, end, future)
+    resubmitted = False
+
+    def submit(start: int, end: int):
+        nonlocal executor
+        try:
+            return executor.submit(extract_page_range, path, ext, start, end)
+        except (RuntimeError, BrokenProcessPool):
+            # 共享进程池刚被其他请求回收（已 shutdown），换用新的进程池
+            if not shared:
+                raise
+            executor = get_extract_executor()
+            return executor.submit(extract_page_range, path, ext, start, end)
+
+    try:
+        # 只保持 window 个在途任务，消费一个再提交一个
+        for start, end in ranges:
+            pending.append((start, end, submit(start, end)))
+            if len(pending) >= window:
+                break
+        while pending:
+            start, end, future = pending[0]
+            try:
+                pages = future.result(timeout=max(0.0, deadline - time.monotonic()))
+            except FutureTimeoutError:
+                logger.warning(f"Document extraction exceeded {time_budget}s budget ({page_count} pages)")
+                for _, _, f in pending:
+                    f.cancel()
+                pending.clear()
+                # 超时的任务仍在子进程中运行，回收进程池，避免它继续占用子进程拖慢后续请求
+                _recycle_executor(executor)
+                yield TIMEOUT_NOTICE
+                return
+            except BrokenProcessPool:
+                # 进程池被其他请求超时回收（或子进程崩溃）：回收后把未完成的区间重新提交一次
+                if not shared or resubmitted:
+                    raise
+                resubmitted = True
+                _recycle_executor(executor)
+                executor = get_extract_executor()
+                pending = deque((s, e, submit(s, e)) for s, e, _ in pending)
+                continue
+            pending.popleft()
+            next_range = next(ranges, None)
+            if next_range:
+                pending.append((*next_range, submit(*next_range)))
+            yield from pages
+    finally:
+        for _, _, future in pending:
+            future.cancel()
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,83 @@
+"""
+共享字体注册表
+PDF 生成（ReportLab）和分享海报（PIL）使用同一套中文字体：
+1. 字体文件路径只探测一次
+2. PIL 字体对象按字号缓存，海报生成不再每次读取字体文件
+3. ReportLab 字体每个进程只注册一次；TTFont 只把文档中实际用到的字形子集嵌入 PDF
+"""
+import os
+import logging
+import threading
+from functools import lru_cache
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# 可通过 CJK_FONT_PATH 指定字体文件，否则按顺序查找系统中文字体
+CJK_FONT_PATHS = [
+    '/usr/share/fonts/truetype/wqy/wqy-zenhei.ttc',
+    '/usr/share/fonts/truetype/wqy/wqy-microhei.ttc',
+    '/usr/share/fonts/opentype/noto/NotoSansCJK-Regular.ttc',
+    '/System/Library/Fonts/PingFang.ttc',
+    '/System/Library/Fonts/STHeiti Light.ttc',
+    'C:\\Windows\\Fonts\\msyh.ttc',
+    'C:\\Windows\\Fonts\\simhei.ttf',
+]
+
+# ReportLab 中注册的中文字体名
+REPORTLAB_FONT_NAME = 'ChineseFont'
+
+_reportlab_lock = threading.Lock()
+_reportlab_font: Optional[str] = None
+_reportlab_checked = False
+
+
+@lru_cache(maxsize=1)
+def find_cjk_font() -> Optional[str]:
+    """查找可用的中文字体文件（结果在进程内缓存）"""
+    candidates = [os.getenv("CJK_FONT_PATH")] + CJK_FONT_PATHS
+    for font_path in candidates:
+        if font_path and os.path.exists(font_path):
+            return font_path
+    logger.warning("Chinese font not found, using default font")
+    return None
+
+
+@lru_cache(maxsize=32)
+def get_pil_font(size: int):
+    """获取指定字号的 PIL 字体（按字号缓存，找不到中文字体时使用默认字体）"""
+    from PIL import ImageFont
+
+    font_path = find_cjk_font()
+    if font_path:
+        try:
+            return ImageFont.truetype(font_path, size)
+        except Exception as e:
+            logger.warning(f"Failed to load font {font_path}: {e}, using default font")
+    return ImageFont.load_default()
+
+
+def register_reportlab_font() -> Optional[str]:
+    """
+    在 ReportLab 中注册中文字体（每个进程只注册一次）
+
+    Returns:
+        注册成功时返回字体名，否则返回 None
+    """
+    global _reportlab_font, _reportlab_checked
+    if _reportlab_checked:
+        return _reportlab_font
+
+    with _reportlab_lock:
+        if not _reportlab_checked:
+            font_path = find_cjk_font()
+            if font_path:
+                try:
+                    from reportlab.pdfbase import pdfmetrics
+                    from reportlab.pdfbase.ttfonts import TTFont
+                    pdfmetrics.registerFont(TTFont(REPORTLAB_FONT_NAME, font_path))
+                    _reportlab_font = REPORTLAB_FONT_NAME
+                except Exception as e:
+                    logger.warning(f"Failed to register Chinese font: {e}")
+            _reportlab_checked = True
+    return _reportlab_font
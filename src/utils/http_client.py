@@ -0,0 +1,83 @@
+"""
+共享 HTTP 客户端
+进程内所有出站 HTTP 请求（远程文件读取、URL 转存、对象存储签名）共用一个 requests.Session：
+1. keep-alive 连接池，同一主机的后续请求复用已建立的 TCP/TLS 连接
+2. 按主机限制连接数（HTTP_POOL_MAXSIZE），连接池满时阻塞等待而不是无限新建连接
+3. 连接失败和 429/5xx 响应按指数退避自动重试（非幂等请求只重试连接阶段的失败）
+"""
+import os
+import logging
+import threading
+from typing import Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+# 缓存连接池的主机数
+HTTP_POOL_CONNECTIONS = int(os.getenv("HTTP_POOL_CONNECTIONS", "32"))
+# 每个主机的最大连接数
+HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "16"))
+# 重试次数与退避系数（第 n 次重试前等待 backoff * 2^(n-1) 秒）
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "3"))
+HTTP_BACKOFF = float(os.getenv("HTTP_BACKOFF", "0.5"))
+HTTP_RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+def _create_session() -> requests.Session:
+    retry = Retry(
+        total=HTTP_RETRIES,
+        connect=HTTP_RETRIES,
+        read=HTTP_RETRIES,
+        status=HTTP_RETRIES,
+        backoff_factor=HTTP_BACKOFF,
+        status_forcelist=HTTP_RETRY_STATUSES,
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=HTTP_POOL_CONNECTIONS,
+        pool_maxsize=HTTP_POOL_MAXSIZE,
+        max_retries=retry,
+        pool_block=True,
+    )
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    logger.info(f"HTTP session created: pool_maxsize={HTTP_POOL_MAXSIZE}, retries={HTTP_RETRIES}")
+    return session
+
+
+def get_http_session() -> requests.Session:
+    """获取进程内共享的 HTTP 会话"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _create_session()
+    return _session
+
+
+def close_http_session() -> None:
+    """关闭共享会话（下次调用 get_http_session 时重新创建）"""
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
+
+
+def _reset_after_fork() -> None:
+    # fork 出的子进程不能复用父进程的 socket
+    global _session, _session_lock
+    _session = None
+    _session_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,238 @@
+"""
+PDF 内容寻址缓存
+以渲染输入的哈希作为 key 缓存渲染结果，相同输入（重复请求、工具出错后重试、断线重连后重新生成）
+直接返回已有文件，不再重新渲染：
+1. 本地磁盘缓存，按最近使用时间（文件 mtime）做 LRU 淘汰，同一目录下所有进程合计不超过上限
+2. 可选 S3SyncStorage 作为二级缓存，多实例之间共享渲染结果
+3. 记录命中率指标
+"""
+import os
+import json
+import time
+import hashlib
+import logging
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from utils.pdf.pdf_delivery import PDF_OBJECT_PREFIX
+
+logger = logging.getLogger(__name__)
+
+PDF_CACHE_ENABLED = os.getenv("PDF_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+PDF_CACHE_DIR = os.getenv("PDF_CACHE_DIR", os.path.join(tempfile.gettempdir(), "opc_pdf_cache"))
+PDF_CACHE_MAX_BYTES = int(os.getenv("PDF_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+# 是否使用对象存储作为二级缓存（需配置 COZE_BUCKET_NAME 等存储环境变量）
+PDF_CACHE_S3 = os.getenv("PDF_CACHE_S3", "false").lower() in ("1", "true", "yes")
+# 默认与 PDF 交付使用同一前缀：二级缓存里的对象就是交付给用户的对象，只上传一次
+PDF_CACHE_S3_PREFIX = os.getenv("PDF_CACHE_S3_PREFIX", PDF_OBJECT_PREFIX)
+# 写入中断（进程被杀）遗留的临时文件超过该时长（秒）后在扫描目录时清理
+PDF_CACHE_TMP_MAX_AGE = float(os.getenv("PDF_CACHE_TMP_MAX_AGE", "3600"))
+
+
+def make_cache_key(*parts: Any) -> str:
+    """根据渲染输入计算内容哈希"""
+    raw = json.dumps(parts, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class PdfCache:
+    """磁盘 LRU 缓存 + 可选的对象存储二级缓存"""
+
+    def __init__(self, cache_dir: str = PDF_CACHE_DIR, max_bytes: int = PDF_CACHE_MAX_BYTES,
+                 storage=None, s3_prefix: str = PDF_CACHE_S3_PREFIX):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.storage = storage
+        self.s3_prefix = s3_prefix
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, int]" = OrderedDict()  # key -> 文件大小，上次扫描目录的结果加本进程的访问
+        self._total_bytes = 0
+        self.hits = 0
+        self.s3_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(cache_dir, exist_ok=True)
+        self._load_index()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.pdf")
+
+    def _s3_key(self, key: str) -> str:
+        return f"{self.s3_prefix}{key}.pdf"
+
+    def _scan(self) -> List[Tuple[float, str, int]]:
+        """
+        扫描缓存目录，返回按修改时间（读取时会更新，即最近使用时间）排序的 (mtime, key, size)
+        顺带删除过期的写入临时文件（正在写入的临时文件 mtime 很新，不会被误删）
+        """
+        files = []
+        now = time.time()
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".tmp"):
+                self._remove_stale_tmp(os.path.join(self.cache_dir, name), now)
+                continue
+            if not name.endswith(".pdf"):
+                continue
+            try:
+                st = os.stat(os.path.join(self.cache_dir, name))
+            except FileNotFoundError:
+                continue
+            files.append((st.st_mtime, name[:-4], st.st_size))
+        files.sort()
+        return files
+
+    @staticmethod
+    def _remove_stale_tmp(path: str, now: float) -> None:
+        try:
+            if now - os.stat(path).st_mtime > PDF_CACHE_TMP_MAX_AGE:
+                os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def _load_index(self) -> None:
+        """启动时按目录重建 LRU 顺序（进程重启后缓存仍然有效）"""
+        with self._lock:
+            self._evict()
+
+    def _evict(self, keep: Optional[str] = None) -> None:
+        """
+        淘汰最久未使用的文件（调用方持有 self._lock）；keep 为刚写入的 key，不会被淘汰
+        缓存目录由多个 worker 进程共用，每次都以目录为准重新统计：上限对所有进程合计生效，
+        淘汰顺序按 mtime 而不是本进程的访问记录
+        """
+        files = self._scan()
+        total = sum(size for _, _, size in files)
+        entries: "OrderedDict[str, int]" = OrderedDict()
+        for _, key, size in files:
+            if total > self.max_bytes and key != keep:
+                total -= size
+                self.evictions += 1
+                try:
+                    os.remove(self._path(key))
+                except FileNotFoundError:
+                    pass
+                continue
+            entries[key] = size
+        self._entries = entries
+        self._total_bytes = total
+
+    def _get_local(self, key: str) -> Optional[bytes]:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            # 可能已被同一目录下的其他进程淘汰
+            with self._lock:
+                size = self._entries.pop(key, None)
+                if size is not None:
+                    self._total_bytes -= size
+            return None
+        now = time.time()
+        try:
+            os.utime(path, (now, now))
+        except FileNotFoundError:
+            pass
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = len(data)
+                self._total_bytes += len(data)
+            self._entries.move_to_end(key)
+        return data
+
+    def _put_local(self, key: str, data: bytes) -> None:
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._evict(keep=key)
+
+    def get(self, key: str) -> Optional[bytes]:
+        """读取缓存，本地未命中时尝试对象存储"""
+        data = self._get_local(key)
+        if data is not None:
+            with self._lock:
+                self.hits += 1
+            return data
+
+        if self.storage is not None:
+            s3_key = self._s3_key(key)
+            try:
+                # 先检查对象是否存在：未命中是常态，直接读取会在存储层按错误记录日志
+                data = None
+                if self.storage.file_exists(file_key=s3_key):
+                    data = self.storage.read_file(file_key=s3_key)
+            except Exception as e:
+                logger.debug(f"PDF cache S3 miss: {key}: {e}")
+                data = None
+            if data:
+                self._put_local(key, data)
+                with self._lock:
+                    self.s3_hits += 1
+                return data
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: str, data: bytes) -> None:
+        """写入缓存（写对象存储失败只记录日志，不影响本次结果）"""
+        self._put_local(key, data)
+        if self.storage is not None:
+            try:
+                self.storage.upload_file(
+                    file_content=data,
+                    file_name=f"{key}.pdf",
+                    content_type="application/pdf",
+                    key=self._s3_key(key),
+                )
+            except Exception as e:
+                logger.warning(f"Failed to upload PDF cache entry to S3: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.s3_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "s3_hits": self.s3_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round((self.hits + self.s3_hits) / lookups, 4) if lookups else 0.0,
+            }
+
+
+def _default_storage():
+    """按环境变量创建对象存储（未开启时返回 None）"""
+    if not PDF_CACHE_S3:
+        return None
+    from storage.s3.s3_storage import get_default_storage
+    return get_default_storage()
+
+
+_pdf_cache: Optional[PdfCache] = None
+_pdf_cache_lock = threading.Lock()
+
+
+def get_pdf_cache() -> Optional[PdfCache]:
+    """获取进程内共享的 PDF 缓存（PDF_CACHE_ENABLED=false 时返回 None）"""
+    global _pdf_cache
+    if not PDF_CACHE_ENABLED:
+        return None
+    if _pdf_cache is None:
+        with _pdf_cache_lock:
+            if _pdf_cache is None:
+                _pdf_cache = PdfCache(storage=_default_storage())
+    return _pdf_cache
+
+
+def get_pdf_cache_stats() -> Dict[str, Any]:
+    """获取 PDF 缓存指标"""
+    cache = get_pdf_cache()
+    return cache.stats() if cache is not None else {"enabled": False}
@@ -0,0 +1,117 @@
+"""
+PDF 交付
+渲染结果直接写入对象存储并返回签名下载链接，多实例部署时任意实例生成的文件都能下载：
+1. 从内存缓冲区流式上传（超过分片阈值自动走分片上传，每次只读取一个分片），不落地临时文件
+2. 按内容哈希存放（pdfs/<hash>.pdf）：相同内容只上传一次，重复生成、重试只重新签名，不在桶里留下重复对象
+3. 上传后通过 generate_presigned_url 生成有时效的下载链接（签名结果有进程内缓存）
+4. 未配置对象存储时 get_pdf_storage 返回 None，由调用方回退为保存到本地
+"""
+import os
+import logging
+import threading
+from io import BytesIO
+from collections import OrderedDict
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# 是否上传对象存储（默认在配置了 COZE_BUCKET_NAME 时开启）
+PDF_STORAGE_ENABLED = os.getenv(
+    "PDF_STORAGE_ENABLED", "true" if os.getenv("COZE_BUCKET_NAME") else "false"
+).lower() in ("1", "true", "yes")
+# 下载链接有效期（秒）
+PDF_URL_EXPIRE_SECONDS = int(os.getenv("PDF_URL_EXPIRE_SECONDS", str(24 * 3600)))
+# 分片大小与分片阈值（对象存储代理层限制单次请求 5MB）
+PDF_UPLOAD_PART_SIZE = int(os.getenv("PDF_UPLOAD_PART_SIZE", str(5 * 1024 * 1024)))
+
+# 按内容哈希存放的对象 key 前缀（PDF 缓存的对象存储二级缓存默认使用同一前缀，两者共用一份对象）
+PDF_OBJECT_PREFIX = os.getenv("PDF_OBJECT_PREFIX", "pdfs/")
+
+PDF_FILE_NAME = "opc_guide.pdf"
+
+_pdf_storage = None
+
+# 本进程确认过已在对象存储中的 key，命中时不再 HEAD 检查
+_UPLOADED_KEYS_MAX = 4096
+_uploaded_keys: "OrderedDict[str, None]" = OrderedDict()
+_uploaded_keys_lock = threading.Lock()
+
+
+def get_pdf_storage():
+    """获取用于交付 PDF 的对象存储（未开启时返回 None）"""
+    global _pdf_storage
+    if not PDF_STORAGE_ENABLED:
+        return None
+    if _pdf_storage is None:
+        from storage.s3.s3_storage import get_default_storage
+        _pdf_storage = get_default_storage()
+    return _pdf_storage
+
+
+def pdf_object_key(content_key: str) -> str:
+    """内容哈希对应的对象 key"""
+    return f"{PDF_OBJECT_PREFIX}{content_key}.pdf"
+
+
+def _is_uploaded(storage, key: str) -> bool:
+    with _uploaded_keys_lock:
+        if key in _uploaded_keys:
+            _uploaded_keys.move_to_end(key)
+            return True
+    return storage.file_exists(file_key=key)
+
+
+def _mark_uploaded(key: str) -> None:
+    with _uploaded_keys_lock:
+        _uploaded_keys[key] = None
+        _uploaded_keys.move_to_end(key)
+        while len(_uploaded_keys) > _UPLOADED_KEYS_MAX:
+            _uploaded_keys.popitem(last=False)
+
+
+def upload_pdf(storage, pdf_bytes: bytes, content_key: Optional[str] = None, file_name: str = PDF_FILE_NAME,
+               expire_time: int = PDF_URL_EXPIRE_SECONDS) -> str:
+    """
+    上传 PDF 并返回签名下载链接
+
+    Args:
+        storage: S3SyncStorage 实例
+        pdf_bytes: 渲染结果
+        content_key: 渲染输入的内容哈希；给出时存放在 pdfs/<hash>.pdf，对象已存在则跳过上传只签名
+        file_name: 未给出 content_key 时的原始文件名，对象 key 在此基础上追加随机后缀
+        expire_time: 链接有效期（秒）
+
+    Returns:
+        签名下载链接
+    """
+    key = pdf_object_key(content_key) if content_key else None
+    if key and _is_uploaded(storage, key):
+        logger.info(f"PDF already in storage: key={key}")
+    else:
+        # BytesIO 直接引用 bytes 的缓冲区，不会额外复制一份
+        key = storage.stream_upload_file(
+            fileobj=BytesIO(pdf_bytes),
+            file_name=file_name,
+            content_type="application/pdf",
+            multipart_chunksize=PDF_UPLOAD_PART_SIZE,
+            multipart_threshold=PDF_UPLOAD_PART_SIZE,
+            key=key,
+        )
+        logger.info(f"PDF uploaded: key={key}, size={len(pdf_bytes)}")
+    if content_key:
+        _mark_uploaded(key)
+    return storage.generate_presigned_url(key=key, expire_time=expire_time)
+
+
+def deliver_pdf(pdf_bytes: bytes, content_key: Optional[str] = None) -> Optional[str]:
+    """
+    上传到对象存储并返回下载链接；未配置存储或上传失败时返回 None（只记录日志）
+    """
+    storage = get_pdf_storage()
+    if storage is None:
+        return None
+    try:
+        return upload_pdf(storage, pdf_bytes, content_key=content_key)
+    except Exception as e:
+        logger.warning(f"Failed to deliver PDF via object storage, falling back to local file: {e}")
+        return None
@@ -0,0 +1,157 @@
+"""
+PDF 渲染进程池
+ReportLab 渲染是纯 CPU 计算且长时间持有 GIL，放到独立进程中执行：
+1. 进程池按 CPU 核数并行渲染，不阻塞 Web worker 的线程和事件循环
+2. 排队 + 运行中的任务数有上限，队列满时等待一段时间后拒绝（背压），避免请求堆积拖垮内存
+3. 渲染结果以 bytes 返回，由调用方决定写入位置，不同请求之间不共享任何输出文件
+"""
+import os
+import asyncio
+import atexit
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def _cpu_count() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+# 渲染进程数（0 表示不启用进程池，在线程中渲染，便于本地调试）
+PDF_RENDER_WORKERS = int(os.getenv("PDF_RENDER_WORKERS", str(min(4, _cpu_count()))))
+# 排队 + 运行中的最大任务数
+PDF_RENDER_QUEUE_SIZE = int(os.getenv("PDF_RENDER_QUEUE_SIZE", str(max(1, PDF_RENDER_WORKERS) * 4)))
+# 队列满时提交方最多等待的秒数，超时抛出 PdfRenderBusyError
+PDF_RENDER_QUEUE_TIMEOUT = float(os.getenv("PDF_RENDER_QUEUE_TIMEOUT", "10"))
+# 子进程启动方式：默认 spawn，避免从多线程的 Web worker 中 fork 出持有锁的子进程
+PDF_RENDER_START_METHOD = os.getenv("PDF_RENDER_START_METHOD", "spawn")
+
+
+class PdfRenderBusyError(RuntimeError):
+    """渲染队列已满"""
+
+
+class PdfRenderPool:
+    """有界的 PDF 渲染进程池"""
+
+    def __init__(
+        self,
+        workers: int = PDF_RENDER_WORKERS,
+        queue_size: int = PDF_RENDER_QUEUE_SIZE,
+        queue_timeout: float = PDF_RENDER_QUEUE_TIMEOUT,
+        start_method: str = PDF_RENDER_START_METHOD,
+    ):
+        self.workers = workers
+        self.queue_size = max(1, queue_size)
+        self.queue_timeout = queue_timeout
+        self.start_method = start_method
+        self._slots = threading.BoundedSemaphore(self.queue_size)
+        self._executor = None
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.submitted = 0
+        self.rejected = 0
+        self.failed = 0
+        self.in_flight = 0
+
+    def _get_executor(self):
+        # 首次提交时才创建：gunicorn master 预加载模块时不会启动子进程
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    if self.workers > 0:
+                        self._executor = ProcessPoolExecutor(
+                            max_workers=self.workers,
+                            mp_context=multiprocessing.get_context(self.start_method),
+                        )
+                    else:
+                        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="pdf-render")
+                    logger.info(f"PDF render pool started: workers={self.workers}, queue_size={self.queue_size}")
+        return self._executor
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        """
+        提交渲染任务（fn 及其参数需可 pickle，即模块级函数）
+
+        Raises:
+            PdfRenderBusyError: 队列在 queue_timeout 内一直是满的
+        """
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            with self._stats_lock:
+                self.rejected += 1
+            raise PdfRenderBusyError(
+                f"PDF 渲染队列已满（{self.queue_size} 个任务），请稍后重试"
+            )
+
+        try:
+            future = self._get_executor().submit(fn, *args, **kwargs)
+        except Exception:
+            self._slots.release()
+            raise
+
+        with self._stats_lock:
+            self.submitted += 1
+            self.in_flight += 1
+        future.add_done_callback(self._on_done)
+        return future
+
+    def _on_done(self, future: Future) -> None:
+        self._slots.release()
+        with self._stats_lock:
+            self.in_flight -= 1
+            if future.cancelled() or future.exception() is not None:
+                self.failed += 1
+
+    def render(self, fn: Callable, *args, **kwargs) -> Any:
+        """同步提交并等待结果"""
+        return self.submit(fn, *args, **kwargs).result()
+
+    async def render_async(self, fn: Callable, *args, **kwargs) -> Any:
+        """异步提交并等待结果；等待队列空位的过程放到线程中，不阻塞事件循环"""
+        loop = asyncio.get_running_loop()
+        future = await loop.run_in_executor(None, lambda: self.submit(fn, *args, **kwargs))
+        return await asyncio.wrap_future(future)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            return {
+                "workers": self.workers,
+                "queue_size": self.queue_size,
+                "in_flight": self.in_flight,
+                "submitted": self.submitted,
+                "rejected": self.rejected,
+                "failed": self.failed,
+            }
+
+    def shutdown(self, wait: bool = True) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=wait, cancel_futures=True)
+                self._executor = None
+
+
+_render_pool: Optional[PdfRenderPool] = None
+_render_pool_lock = threading.Lock()
+
+
+def get_render_pool() -> PdfRenderPool:
+    """获取进程内共享的渲染池"""
+    global _render_pool
+    if _render_pool is None:
+        with _render_pool_lock:
+            if _render_pool is None:
+                _render_pool = PdfRenderPool()
+                atexit.register(_render_pool.shutdown, False)
+    return _render_pool
+
+
+def get_render_pool_stats() -> Dict[str, Any]:
+    """获取渲染池指标（只创建池对象，不会因此启动子进程）"""
+    return get_render_pool().stats()
@@ -0,0 +1,74 @@
+"""
+服务预热
+分两步，避免 fork 出的 worker 继承父进程中已经打开的连接和后台线程：
+1. preload_modules：在 gunicorn master 中导入工具模块、注册字体，worker 直接继承（只有纯内存对象）
+2. warmup_worker：在每个 worker 启动后构建 Agent（含 checkpointer 连接池，仅 Flask 应用）并初始化数据库引擎
+首个用户请求不再承担冷启动开销。
+"""
+import os
+import sys
+import logging
+
+# 确保 src 目录在 Python 路径中
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+logger = logging.getLogger(__name__)
+
+
+def preload_modules():
+    """预加载工具模块和字体（不创建任何连接，可在 fork 之前调用；失败不影响服务启动）"""
+    try:
+        # 导入 agent 模块会连带导入全部工具模块（PDF 工具导入时注册中文字体）
+        import agents.agent  # noqa: F401
+        import tools.share_tool as share_tool
+        from utils.fonts import get_pil_font
+        for size in (share_tool.FONT_SIZE_LARGE, share_tool.FONT_SIZE_MEDIUM, share_tool.FONT_SIZE_SMALL):
+            get_pil_font(size)
+    except Exception as e:
+        logger.warning(f"Failed to preload tool modules: {e}")
+
+
+def warmup_worker():
+    """构建 Agent 图并初始化数据库引擎（会打开连接池，只在 worker 进程中调用）"""
+    # 只为 Flask 应用预构建同步 Agent；ASGI 应用（UvicornWorker）此时事件循环还没启动，
+    # 异步 checkpointer 必须在事件循环内创建，由 main.py 的 startup 钩子负责
+    if "main_flask" in sys.modules:
+        try:
+            sys.modules["main_flask"].init_agent()
+            logger.info("Agent graph preloaded")
+        except Exception as e:
+            logger.warning(f"Failed to preload agent graph: {e}")
+
+    try:
+        from storage.database.db import get_engine
+        get_engine()
+        logger.info("Database engine preloaded")
+    except Exception as e:
+        logger.warning(f"Failed to preload database engine: {e}")
+
+
+def warmup():
+    """单进程启动时的完整预热"""
+    preload_modules()
+    warmup_worker()
+
+
+def reset_after_fork():
+    """
+    worker fork 之后调用：丢弃从 master 继承的数据库连接、checkpointer 连接池和已构建的 Agent，
+    由 worker 按需重建（正常情况下 master 只预加载模块，这里兜底）
+    """
+    try:
+        from storage.database.db import reset_engine_after_fork
+        reset_engine_after_fork()
+    except Exception as e:
+        logger.warning(f"Failed to reset database pool after fork: {e}")
+
+    try:
+        from storage.memory.memory_saver import reset_memory_saver_after_fork
+        reset_memory_saver_after_fork()
+        if "main_flask" in sys.modules:
+            # Agent 持有 checkpointer 引用，需一起丢弃
+            sys.modules["main_flask"].agent = None
+    except Exception as e:
+        logger.warning(f"Failed to reset checkpointer after fork: {e}")
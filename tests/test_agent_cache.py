@@ -0,0 +1,66 @@
+"""
+测试 Agent 进程级缓存与配置热加载
+"""
+import sys
+import os
+import json
+import shutil
+import tempfile
+
+# 添加src目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import agents.agent as agent_module
+
+PROJECT_CONFIG = os.path.join(os.path.dirname(__file__), '..', 'config', 'agent_llm_config.json')
+
+
+def test_agent_cached_and_hot_reloaded():
+    """测试配置不变时复用 Agent，配置修改后重新构建"""
+    print("=" * 60)
+    print("测试: Agent 缓存与热加载")
+    print("=" * 60)
+
+    tmp_dir = tempfile.mkdtemp()
+    config_path = os.path.join(tmp_dir, "agent_llm_config.json")
+    shutil.copy(PROJECT_CONFIG, config_path)
+
+    original = agent_module.LLM_CONFIG
+    original_key = os.environ.get("COZE_WORKLOAD_IDENTITY_API_KEY")
+    agent_module.LLM_CONFIG = config_path
+    os.environ["COZE_WORKLOAD_IDENTITY_API_KEY"] = original_key or "test-key"
+    try:
+        first = agent_module.build_agent()
+        second = agent_module.build_agent()
+        assert first is second
+        print("✓ 配置未变化时复用同一个 Agent")
+
+        # 同步 / 异步调用方各自缓存，不会拿到对方的图
+        async_agent = agent_module.build_agent(async_mode=True)
+        assert async_agent is not first
+        assert agent_module.build_agent(async_mode=False) is first
+        assert agent_module.build_agent(async_mode=True) is async_agent
+        print("✓ 同步 / 异步 Agent 分开缓存")
+
+        with open(config_path, 'r', encoding='utf-8') as f:
+            cfg = json.load(f)
+        cfg['config']['temperature'] = 0.3
+        with open(config_path, 'w', encoding='utf-8') as f:
+            json.dump(cfg, f, ensure_ascii=False)
+        # 确保 mtime 变化
+        stat = os.stat(config_path)
+        os.utime(config_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+        reloaded = agent_module.build_agent()
+        assert reloaded is not first
+        assert agent_module.load_llm_config()[0]['config']['temperature'] == 0.3
+        print("✓ 配置修改后重新构建 Agent")
+    finally:
+        agent_module.LLM_CONFIG = original
+        if original_key is None:
+            os.environ.pop("COZE_WORKLOAD_IDENTITY_API_KEY", None)
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    test_agent_cached_and_hot_reloaded()
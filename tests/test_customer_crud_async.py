@@ -0,0 +1,100 @@
+"""
+测试异步客户信息CRUD与异步工具
+"""
+import sys
+import os
+import asyncio
+
+# 添加src目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from storage.database import customer_crud, customer_crud_async
+from storage.database.db import dispose_async_engine
+from tools.customer_db_tools import get_customer_info, save_user_info
+
+
+async def _run_crud():
+    contact = "async_crud@example.com"
+    try:
+        result = await customer_crud_async.save_customer_info(
+            contact_info=contact,
+            target_city="杭州",
+            skills="写作",
+            startup_budget=8.0
+        )
+        print(f"✓ 异步保存客户信息: {result}")
+
+        # 并发保存同一联系方式不会产生重复用户
+        results = await asyncio.gather(*[
+            customer_crud_async.save_customer_info(contact_info=contact, target_city=f"城市{i}")
+            for i in range(8)
+        ])
+        assert {r['user_id'] for r in results} == {result['user_id']}
+        assert {r['profile_id'] for r in results} == {result['profile_id']}
+
+        await customer_crud_async.create_recommendation(user_id=result['user_id'], project_name="异步项目")
+        await customer_crud_async.save_payment_and_service(
+            contact_info=contact,
+            amount=68.0,
+            payment_method="微信支付",
+            payment_proof="已转账",
+            pdf_url="https://example.com/async.pdf"
+        )
+
+        summary = await customer_crud_async.get_customer_summary(contact)
+        print(f"✓ 异步查询摘要: 推荐={len(summary['recommendations'])}, 支付={len(summary['payments'])}")
+        assert summary['user']['id'] == result['user_id']
+        assert "异步项目" in [r['project_name'] for r in summary['recommendations']]
+        assert summary['service_record']['pdf_url'] == "https://example.com/async.pdf"
+
+        # 与同步版本结果一致
+        customer_crud.clear_customer_summary_cache()
+        assert customer_crud.get_customer_summary(contact) == summary
+    finally:
+        await dispose_async_engine()
+
+
+async def _run_tools():
+    contact = "async_tool@example.com"
+    try:
+        message = await save_user_info.ainvoke({
+            "contact_info": contact,
+            "target_city": "上海",
+            "skills": "编程",
+            "work_experience": "3年",
+            "interests": "AI",
+            "risk_tolerance": "中等",
+            "time_commitment": "全职",
+            "startup_budget": 10,
+        })
+        assert "用户信息保存成功" in message
+
+        messages = await asyncio.gather(*[get_customer_info.ainvoke({"contact_info": contact}) for _ in range(5)])
+        assert all("上海" in m for m in messages)
+    finally:
+        await dispose_async_engine()
+
+
+def test_async_crud():
+    """测试异步CRUD与同步版本行为一致"""
+    print("=" * 60)
+    print("测试1: 异步CRUD")
+    print("=" * 60)
+
+    asyncio.run(_run_crud())
+    print("\n✓ 异步CRUD测试通过！")
+
+
+def test_async_tools():
+    """测试工具的异步实现"""
+    print("\n" + "=" * 60)
+    print("测试2: 异步工具")
+    print("=" * 60)
+
+    asyncio.run(_run_tools())
+    print("\n✓ 异步工具测试通过！")
+
+
+if __name__ == "__main__":
+    test_async_crud()
+    test_async_tools()
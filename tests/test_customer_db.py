@@ -3,6 +3,7 @@
 """
 import sys
 import os
+import importlib
 
 # 添加项目根目录到Python路径
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
@@ -21,6 +22,7 @@ from src.storage.database.customer_crud import (
     save_payment_and_service,
     get_customer_summary
 )
+import src.storage.database.customer_crud as customer_crud
 
 
 def test_basic_operations():
@@ -207,6 +209,83 @@ def test_duplicate_user():
     return True
 
 
+def test_concurrent_save():
+    """测试并发保存同一联系方式不会产生重复用户或档案"""
+    print("\n" + "=" * 60)
+    print("测试4: 并发保存同一联系方式")
+    print("=" * 60)
+
+    from concurrent.futures import ThreadPoolExecutor
+
+    contact = "concurrent@example.com"
+
+    def save(i):
+        return save_customer_info(contact_info=contact, target_city=f"城市{i}", startup_budget=float(i))
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(save, range(16)))
+
+    user_ids = {r['user_id'] for r in results}
+    profile_ids = {r['profile_id'] for r in results}
+    print(f"✓ 并发保存完成: user_ids={user_ids}, profile_ids={profile_ids}")
+    assert len(user_ids) == 1
+    assert len(profile_ids) == 1
+
+    print("\n✓ 并发保存测试通过！")
+    return True
+
+
+def test_summary_cache():
+    """测试客户摘要缓存命中与写操作失效"""
+    print("\n" + "=" * 60)
+    print("测试5: 客户摘要缓存")
+    print("=" * 60)
+
+    contact = "summary_cache@example.com"
+    result = save_customer_info(contact_info=contact, target_city="成都", startup_budget=3.0)
+    customer_crud.clear_customer_summary_cache()
+
+    print("\n5.1 首次查询写入缓存，再次查询命中缓存...")
+    summary1 = get_customer_summary(contact)
+    assert contact in customer_crud._summary_cache
+    summary1['profile']['target_city'] = "被调用方修改"
+    summary2 = get_customer_summary(contact)
+    assert summary2['profile']['target_city'] == "成都"
+    print("✓ 缓存命中，且返回的是副本")
+
+    print("\n5.2 按用户ID写入后缓存失效...")
+    create_recommendation(user_id=result['user_id'], project_name="缓存测试项目")
+    assert contact not in customer_crud._summary_cache
+    summary3 = get_customer_summary(contact)
+    assert [r['project_name'] for r in summary3['recommendations']][-1] == "缓存测试项目"
+
+    print("\n5.3 按联系方式写入后缓存失效...")
+    save_customer_info(contact_info=contact, target_city="重庆")
+    summary4 = get_customer_summary(contact)
+    assert summary4['profile']['target_city'] == "重庆"
+    print("✓ 写操作后读到最新数据")
+
+    print("\n5.4 多 worker 时默认缩短缓存时间...")
+    saved = {k: os.environ.get(k) for k in ("WEB_CONCURRENCY", "CUSTOMER_SUMMARY_CACHE_TTL")}
+    try:
+        os.environ.pop("CUSTOMER_SUMMARY_CACHE_TTL", None)
+        os.environ["WEB_CONCURRENCY"] = "4"
+        assert importlib.reload(customer_crud).SUMMARY_CACHE_TTL == 5
+        os.environ["WEB_CONCURRENCY"] = "1"
+        assert importlib.reload(customer_crud).SUMMARY_CACHE_TTL == 300
+    finally:
+        for key, value in saved.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+        importlib.reload(customer_crud)
+    print("✓ 其他进程的写入最多 5 秒后可见")
+
+    print("\n✓ 客户摘要缓存测试通过！")
+    return True
+
+
 def run_all_tests():
     """运行所有测试"""
     print("\n" + "=" * 60)
@@ -223,6 +302,12 @@ def run_all_tests():
         # 测试3: 重复联系方式处理
         test_duplicate_user()
 
+        # 测试4: 并发保存
+        test_concurrent_save()
+
+        # 测试5: 客户摘要缓存
+        test_summary_cache()
+
         print("\n" + "=" * 60)
         print("✓ 所有测试通过！")
         print("=" * 60)
@@ -0,0 +1,137 @@
+"""
+测试数据库连接池配置与指标
+"""
+import sys
+import os
+
+# 添加src目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+import storage.database.db as db
+
+
+def _process_limit(settings):
+    """单个进程最多占用的连接数：两个引擎的上限加 checkpointer 连接池"""
+    return (settings["pool_size"] + settings["max_overflow"]
+            + settings["async_pool_size"] + settings["async_max_overflow"]
+            + settings["checkpoint_pool_size"])
+
+
+def test_pool_settings_from_workers():
+    """测试连接池大小按 worker 数平分连接上限，同步、异步引擎和 checkpointer 共用每个进程的预算"""
+    print("=" * 60)
+    print("测试1: 连接池大小推导")
+    print("=" * 60)
+
+    saved = {k: os.environ.get(k) for k in ("WEB_CONCURRENCY", "DB_POOL_SIZE", "DB_MAX_OVERFLOW")}
+    saved_ratio = db.DB_ASYNC_POOL_RATIO
+    try:
+        for key in saved:
+            os.environ.pop(key, None)
+        os.environ["WEB_CONCURRENCY"] = "4"
+        settings = db.get_pool_settings()
+        print(f"4 个 worker: {settings}")
+        assert _process_limit(settings) == db.DB_MAX_CONNECTIONS // 4
+        assert settings["async_pool_size"] >= 1 and settings["pool_size"] >= 1
+
+        # 任意 worker 数下，所有进程合计不超过 DB_MAX_CONNECTIONS
+        for workers in (1, 2, 3, 5, 7, 16, 26):
+            os.environ["WEB_CONCURRENCY"] = str(workers)
+            settings = db.get_pool_settings()
+            engines = (settings["pool_size"] + settings["max_overflow"]
+                       + settings["async_pool_size"] + settings["async_max_overflow"])
+            assert engines * workers <= db.DB_MAX_CONNECTIONS, (workers, settings)
+            assert _process_limit(settings) * workers <= db.DB_MAX_CONNECTIONS, (workers, settings)
+
+        # 比例可调：全部偏向同步引擎时异步引擎仍保留 1 个连接
+        os.environ["WEB_CONCURRENCY"] = "1"
+        db.DB_ASYNC_POOL_RATIO = 0
+        settings = db.get_pool_settings()
+        assert settings["async_pool_size"] + settings["async_max_overflow"] == 1
+        assert _process_limit(settings) == db.DB_MAX_CONNECTIONS
+
+        os.environ["DB_POOL_SIZE"] = "3"
+        os.environ["DB_MAX_OVERFLOW"] = "1"
+        settings = db.get_pool_settings()
+        assert (settings["pool_size"], settings["max_overflow"]) == (3, 1)
+        assert (settings["async_pool_size"], settings["async_max_overflow"]) == (3, 1)
+    finally:
+        db.DB_ASYNC_POOL_RATIO = saved_ratio
+        for key, value in saved.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+    print("\n✓ 连接池大小推导测试通过！")
+
+
+def test_pool_wait_metrics():
+    """测试取连接的等待时间与超时统计"""
+    print("\n" + "=" * 60)
+    print("测试2: 连接池等待指标")
+    print("=" * 60)
+
+    original_stats = db._TimedQueuePool.stats
+    db._TimedQueuePool.stats = db.PoolStats()
+    engine = create_engine(
+        "sqlite://",
+        poolclass=db._TimedQueuePool,
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=0.05,
+        pool_use_lifo=True,
+    )
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+            print(f"借出中: checked_out={engine.pool.checkedout()}")
+            assert engine.pool.checkedout() == 1
+            try:
+                engine.connect()
+                assert False, "连接池已满，应当超时"
+            except PoolTimeoutError:
+                pass
+
+        stats = db._pool_snapshot(engine, db._TimedQueuePool.stats)
+        print(f"指标: {stats}")
+        assert stats["checkouts"] == 1
+        assert stats["timeouts"] == 1
+        assert stats["checked_out"] == 0
+        assert stats["max_wait_ms"] >= 50
+    finally:
+        engine.dispose()
+        db._TimedQueuePool.stats = original_stats
+    print("\n✓ 连接池等待指标测试通过！")
+
+
+def test_pooler_mode_disables_prepare():
+    """测试 pgbouncer 模式下引擎和 checkpointer 连接池都关闭 prepared statements"""
+    print("\n" + "=" * 60)
+    print("测试3: pgbouncer 模式")
+    print("=" * 60)
+
+    from storage.memory.memory_saver import _saver_conn_kwargs
+    original = db.DB_POOLER_MODE
+    try:
+        db.DB_POOLER_MODE = "pgbouncer"
+        options = db._engine_options(db._TimedQueuePool)
+        kwargs = _saver_conn_kwargs()
+        print(f"引擎: {options['connect_args']}, checkpointer: prepare_threshold={kwargs['prepare_threshold']}")
+        # prepare_threshold=None 才是关闭，0 表示首次执行就 prepare
+        assert options["connect_args"]["prepare_threshold"] is None
+        assert "prepare_threshold" in kwargs and kwargs["prepare_threshold"] is None
+
+        db.DB_POOLER_MODE = ""
+        assert "connect_args" not in db._engine_options(db._TimedQueuePool)
+        assert _saver_conn_kwargs()["prepare_threshold"] == 0
+    finally:
+        db.DB_POOLER_MODE = original
+    print("\n✓ pgbouncer 模式测试通过！")
+
+
+if __name__ == "__main__":
+    test_pool_settings_from_workers()
+    test_pool_wait_metrics()
+    test_pooler_mode_disables_prepare()
@@ -0,0 +1,235 @@
+"""
+测试远程文件下载缓存
+"""
+import sys
+import os
+import time
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 添加src目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import utils.http_client as http_client
+import utils.file.download_cache as download_cache
+from utils.file.download_cache import DownloadCache
+from utils.file.file import File, FileOps
+
+
+class ETagHandler(BaseHTTPRequestHandler):
+    """按路径返回内容，支持 If-None-Match，记录每次请求的状态码"""
+
+    files = {}
+    statuses = {}  # path -> 强制返回的错误状态码
+    log = []
+    delay = 0.0
+
+    def do_GET(self):
+        status = ETagHandler.statuses.get(self.path)
+        if status:
+            ETagHandler.log.append((self.path, status))
+            self.send_response(status)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        data = ETagHandler.files[self.path]
+        etag = f'"{hash(data) & 0xffffffff:x}"'
+        if self.headers.get("If-None-Match") == etag:
+            ETagHandler.log.append((self.path, 304))
+            self.send_response(304)
+            self.end_headers()
+            return
+        ETagHandler.log.append((self.path, 200))
+        time.sleep(ETagHandler.delay)
+        self.send_response(200)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+def _start_server(files, delay=0.0):
+    ETagHandler.files = files
+    ETagHandler.statuses = {}
+    ETagHandler.log = []
+    ETagHandler.delay = delay
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ETagHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def test_revalidation():
+    """测试 TTL 内直接命中，过期后用 ETag 重新验证，内容变化时重新下载"""
+    print("=" * 60)
+    print("测试1: 条件请求重新验证")
+    print("=" * 60)
+
+    server, base = _start_server({"/a.txt": b"version-1"})
+    try:
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache = DownloadCache(cache_dir=cache_dir, ttl=0.2)
+            url = f"{base}/a.txt"
+            path = cache.fetch(url)
+            assert cache.fetch(url) == path
+            assert ETagHandler.log == [("/a.txt", 200)]
+
+            time.sleep(0.25)
+            with cache.open(url) as f:
+                assert f.read() == b"version-1"
+            assert ETagHandler.log[-1] == ("/a.txt", 304)
+
+            ETagHandler.files["/a.txt"] = b"version-2"
+            time.sleep(0.25)
+            with open(cache.fetch(url), "rb") as f:
+                assert f.read() == b"version-2"
+            assert ETagHandler.log[-1] == ("/a.txt", 200)
+
+            stats = cache.stats()
+            print(f"统计: {stats}")
+            assert (stats["hits"], stats["revalidated"], stats["misses"]) == (1, 1, 2)
+            assert not [n for n in os.listdir(cache_dir) if n.endswith(".tmp")]
+    finally:
+        server.shutdown()
+    print("\n✓ 条件请求重新验证测试通过！")
+
+
+def test_revalidation_errors():
+    """测试重新验证时 4xx 删除本地副本并报错，5xx 时继续使用旧文件"""
+    print("\n" + "=" * 60)
+    print("测试1b: 重新验证失败")
+    print("=" * 60)
+
+    original_backoff = http_client.HTTP_BACKOFF
+    http_client.HTTP_BACKOFF = 0.01
+    http_client.close_http_session()
+    server, base = _start_server({"/gone.txt": b"secret", "/flaky.txt": b"still-here"})
+    try:
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache = DownloadCache(cache_dir=cache_dir, ttl=0.1)
+            gone, flaky = f"{base}/gone.txt", f"{base}/flaky.txt"
+            gone_path = cache.fetch(gone)
+            cache.fetch(flaky)
+            time.sleep(0.15)
+
+            ETagHandler.statuses = {"/gone.txt": 404, "/flaky.txt": 503}
+            try:
+                cache.fetch(gone)
+                assert False, "源站返回 404 时不应继续提供旧文件"
+            except RuntimeError as e:
+                print(f"✓ 404: {e}")
+            assert not os.path.exists(gone_path)
+            assert cache.stats()["entries"] == 1
+
+            with open(cache.fetch(flaky), "rb") as f:
+                assert f.read() == b"still-here"
+            print("✓ 503 时继续使用旧文件")
+    finally:
+        server.shutdown()
+        http_client.HTTP_BACKOFF = original_backoff
+        http_client.close_http_session()
+    print("\n✓ 重新验证失败测试通过！")
+
+
+def test_single_download_and_eviction():
+    """测试并发请求同一 URL 只下载一次，超过容量时淘汰最久未使用的文件"""
+    print("\n" + "=" * 60)
+    print("测试2: 并发共用下载与 LRU 淘汰")
+    print("=" * 60)
+
+    files = {f"/{i}.bin": bytes([i]) * 100 for i in range(3)}
+    server, base = _start_server(files, delay=0.1)
+    try:
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache = DownloadCache(cache_dir=cache_dir, max_bytes=250)
+            threads = [threading.Thread(target=cache.fetch, args=(f"{base}/0.bin",)) for _ in range(5)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            print(f"请求记录: {ETagHandler.log}")
+            assert ETagHandler.log == [("/0.bin", 200)]
+
+            cache.fetch(f"{base}/1.bin")
+            cache.fetch(f"{base}/0.bin")  # 0 变为最近使用
+            cache.fetch(f"{base}/2.bin")
+            stats = cache.stats()
+            print(f"统计: {stats}")
+            assert stats["evictions"] == 1
+            assert stats["bytes"] <= 250
+            assert not os.path.exists(cache._data_path(cache.make_key(f"{base}/1.bin")))
+            assert os.path.exists(cache._data_path(cache.make_key(f"{base}/0.bin")))
+    finally:
+        server.shutdown()
+    print("\n✓ 并发共用下载与 LRU 淘汰测试通过！")
+
+
+def test_shared_dir_cap():
+    """测试多个进程共用缓存目录时上限按目录合计生效"""
+    print("\n" + "=" * 60)
+    print("测试2b: 共享目录容量上限")
+    print("=" * 60)
+
+    files = {f"/{i}.bin": bytes([i]) * 100 for i in range(3)}
+    server, base = _start_server(files)
+    try:
+        with tempfile.TemporaryDirectory() as cache_dir:
+            # 两个实例模拟两个 worker 进程
+            worker1 = DownloadCache(cache_dir=cache_dir, max_bytes=250)
+            worker2 = DownloadCache(cache_dir=cache_dir, max_bytes=250)
+            worker1.fetch(f"{base}/0.bin")
+            worker2.fetch(f"{base}/1.bin")
+            worker2.fetch(f"{base}/0.bin")  # 其他进程命中同样刷新最近使用时间
+            worker2.fetch(f"{base}/2.bin")
+
+            data_files = [name for name in os.listdir(cache_dir) if name.endswith(".data")]
+            total = sum(os.path.getsize(os.path.join(cache_dir, name)) for name in data_files)
+            print(f"缓存文件数: {len(data_files)}, 合计 {total} bytes")
+            assert total <= 250
+            assert not os.path.exists(worker1._data_path(worker1.make_key(f"{base}/1.bin")))
+            assert os.path.exists(worker1._data_path(worker1.make_key(f"{base}/0.bin")))
+    finally:
+        server.shutdown()
+    print("\n✓ 共享目录容量上限测试通过！")
+
+
+def test_file_ops_uses_cache():
+    """测试 FileOps 重复读取同一 URL 不再重新下载"""
+    print("\n" + "=" * 60)
+    print("测试3: FileOps 使用下载缓存")
+    print("=" * 60)
+
+    server, base = _start_server({"/note.txt": "创业笔记".encode("utf-8")})
+    original = download_cache._download_cache
+    try:
+        with tempfile.TemporaryDirectory() as cache_dir, tempfile.TemporaryDirectory() as out_dir:
+            download_cache._download_cache = DownloadCache(cache_dir=cache_dir)
+            file_obj = File(url=f"{base}/note.txt")
+            assert FileOps.read_bytes(file_obj) == "创业笔记".encode("utf-8")
+            assert FileOps.extract_text(file_obj) == "创业笔记"
+
+            original_dir = FileOps.DOWNLOAD_DIR
+            FileOps.DOWNLOAD_DIR = out_dir
+            try:
+                path = FileOps.save_to_local(file_obj, "note.txt")
+            finally:
+                FileOps.DOWNLOAD_DIR = original_dir
+            with open(path, "rb") as f:
+                assert f.read() == "创业笔记".encode("utf-8")
+            print(f"请求记录: {ETagHandler.log}")
+            assert ETagHandler.log == [("/note.txt", 200)]
+    finally:
+        download_cache._download_cache = original
+        server.shutdown()
+    print("\n✓ FileOps 下载缓存测试通过！")
+
+
+if __name__ == "__main__":
+    test_revalidation()
+    test_revalidation_errors()
+    test_single_download_and_eviction()
+    test_shared_dir_cap()
+    test_file_ops_uses_cache()
@@ -0,0 +1,236 @@
+"""
+测试 FileOps 文件读取与文本提取
+"""
+import sys
+import os
+import tempfile
+import threading
+from io import BytesIO
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 添加src目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import utils.file.file as file_module
+import utils.file.download_cache as download_cache
+from utils.file.file import File, FileOps
+
+
+class FileHandler(BaseHTTPRequestHandler):
+    """按路径返回 FileHandler.files 中的内容"""
+
+    files = {}
+
+    def do_GET(self):
+        data = FileHandler.files.get(self.path)
+        if data is None:
+            self.send_response(404)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+def _start_server(files):
+    FileHandler.files = files
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FileHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def _make_pptx(slides):
+    from pptx import Presentation
+    from pptx.util import Inches
+    prs = Presentation()
+    for text in slides:
+        slide = prs.slides.add_slide(prs.slide_layouts[6])
+        slide.shapes.add_textbox(Inches(1), Inches(1), Inches(4), Inches(1)).text_frame.text = text
+    buffer = BytesIO()
+    prs.save(buffer)
+    return buffer.getvalue()
+
+
+def test_remote_spool():
+    """测试远程文件超过内存阈值后转存到临时文件"""
+    print("=" * 60)
+    print("测试1: 远程文件落盘缓冲")
+    print("=" * 60)
+
+    data = os.urandom(300_000)
+    server = _start_server({"/big.bin": data, "/deck.pptx": _make_pptx(["第一页内容", "第二页内容"])})
+    original = file_module.SPOOL_MAX_MEMORY
+    file_module.SPOOL_MAX_MEMORY = 64 * 1024
+    # 关闭下载缓存，走 SpooledTemporaryFile 路径
+    cache_enabled = download_cache.DOWNLOAD_CACHE_ENABLED
+    download_cache.DOWNLOAD_CACHE_ENABLED = False
+    try:
+        base = f"http://127.0.0.1:{server.server_port}"
+        stream, ext = FileOps._open_stream(File(url=f"{base}/big.bin"))
+        with stream:
+            print(f"后缀: {ext}, 已落盘: {stream._rolled}")
+            assert stream._rolled
+            assert stream.read() == data
+        assert FileOps.read_bytes(File(url=f"{base}/big.bin")) == data
+
+        text = FileOps.extract_text(File(url=f"{base}/deck.pptx"))
+        print(text)
+        assert "第一页内容" in text and "第二页内容" in text
+    finally:
+        file_module.SPOOL_MAX_MEMORY = original
+        download_cache.DOWNLOAD_CACHE_ENABLED = cache_enabled
+        server.shutdown()
+    print("\n✓ 远程文件落盘缓冲测试通过！")
+
+
+def test_local_size_limit():
+    """测试本地文件同样受大小限制"""
+    print("\n" + "=" * 60)
+    print("测试2: 本地文件大小限制")
+    print("=" * 60)
+
+    original = file_module.MAX_FILE_SIZE
+    file_module.MAX_FILE_SIZE = 1000
+    try:
+        with tempfile.NamedTemporaryFile(suffix=".txt", delete=False) as f:
+            f.write("你好，世界".encode("utf-8") * 100)
+            path = f.name
+        try:
+            FileOps.read_bytes(File(url=path))
+            assert False, "超过大小限制应当报错"
+        except Exception as e:
+            print(f"✓ 拒绝: {e}")
+            assert "超过限制" in str(e)
+
+        file_module.MAX_FILE_SIZE = original
+        assert FileOps.extract_text(File(url=path)).startswith("你好，世界")
+        os.remove(path)
+    finally:
+        file_module.MAX_FILE_SIZE = original
+    print("\n✓ 本地文件大小限制测试通过！")
+
+
+def _make_pdf(pages):
+    from reportlab.pdfgen import canvas
+    buffer = BytesIO()
+    c = canvas.Canvas(buffer)
+    for text in pages:
+        c.drawString(72, 720, text)
+        c.showPage()
+    c.save()
+    return buffer.getvalue()
+
+
+def test_extract_budget():
+    """测试逐页提取与字数/页数预算"""
+    print("\n" + "=" * 60)
+    print("测试3: 逐页提取与预算")
+    print("=" * 60)
+
+    import pandas as pd
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        pdf_path = os.path.join(tmp_dir, "report.pdf")
+        with open(pdf_path, "wb") as f:
+            f.write(_make_pdf([f"Page {i} content" for i in range(1, 6)]))
+        pptx_path = os.path.join(tmp_dir, "deck.pptx")
+        with open(pptx_path, "wb") as f:
+            f.write(_make_pptx([f"幻灯片{i}" for i in range(1, 6)]))
+        xlsx_path = os.path.join(tmp_dir, "data.xlsx")
+        with pd.ExcelWriter(xlsx_path) as writer:
+            pd.DataFrame({"城市": ["杭州", "成都"]}).to_excel(writer, sheet_name="A", index=False)
+            pd.DataFrame({"项目": ["写作"]}).to_excel(writer, sheet_name="B", index=False)
+
+        full = FileOps.extract_text(File(url=pdf_path))
+        assert all(f"Page {i} content" in full for i in range(1, 6))
+        assert file_module.TRUNCATED_NOTICE not in full
+
+        limited = FileOps.extract_text(File(url=pdf_path), max_pages=2)
+        print(limited)
+        assert "Page 2 content" in limited and "Page 3 content" not in limited
+        assert limited.endswith(file_module.TRUNCATED_NOTICE)
+
+        limited = FileOps.extract_text(File(url=pptx_path), max_chars=20)
+        assert limited.startswith("=== 第 1 页 ===")
+        assert len(limited.replace(file_module.TRUNCATED_NOTICE, "").strip()) <= 20
+
+        pages = FileOps.iter_text(File(url=pptx_path))
+        assert "幻灯片1" in next(pages)
+        pages.close()
+
+        sheets = FileOps.extract_text(File(url=xlsx_path))
+        print(sheets)
+        assert "=== A ===" in sheets and "=== B ===" in sheets and "成都" in sheets
+    print("\n✓ 逐页提取与预算测试通过！")
+
+
+def test_collect_text_boundary():
+    """测试预算恰好用完时不追加截断提示，确有内容被丢弃时才追加"""
+    print("\n" + "=" * 60)
+    print("测试4: 预算边界")
+    print("=" * 60)
+
+    from utils.file.file import collect_text
+    notice = f"\n\n{file_module.TRUNCATED_NOTICE}"
+
+    # 页数恰好用完
+    assert collect_text(['ab', 'cd'], '\n', max_pages=2) == "ab\ncd"
+    assert collect_text(['ab', 'cd', 'ef'], '\n', max_pages=2) == "ab\ncd" + notice
+    # 字数恰好用完（分隔符计入字数）
+    assert collect_text(['ab', 'cd'], '\n', max_chars=5) == "ab\ncd"
+    assert collect_text(['ab', 'cd'], '\n', max_chars=4) == "ab\nc" + notice
+    assert collect_text(['ab', 'cd'], '\n', max_chars=2) == "ab" + notice
+
+    # 达到页数后只多取一页用于判断，随后关闭生成器
+    consumed = []
+
+    def pages():
+        for text in ['ab', 'cd', 'ef', 'gh']:
+            consumed.append(text)
+            yield text
+
+    assert collect_text(pages(), '\n', max_pages=2) == "ab\ncd" + notice
+    print(f"已解析的页: {consumed}")
+    assert consumed == ['ab', 'cd', 'ef']
+    print("\n✓ 预算边界测试通过！")
+
+
+def test_csv_extract():
+    """测试 CSV 按行块提取，支持 GBK 编码，预算照常生效"""
+    print("\n" + "=" * 60)
+    print("测试5: CSV 分块提取")
+    print("=" * 60)
+
+    original = file_module.EXTRACT_SHEET_ROWS
+    file_module.EXTRACT_SHEET_ROWS = 2
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "cities.csv")
+            rows = ["城市,人口"] + [f"城市{i},{i * 100}" for i in range(1, 6)]
+            with open(path, "wb") as f:
+                f.write("\n".join(rows).encode("gbk"))
+
+            blocks = list(FileOps.iter_text(File(url=path)))
+            print(blocks)
+            # 5 行数据每 2 行一块，只有第一块带表头
+            assert len(blocks) == 3
+            assert "人口" in blocks[0] and "人口" not in blocks[1]
+            assert "城市5" in blocks[2]
+
+            limited = FileOps.extract_text(File(url=path), max_pages=1)
+            assert "城市2" in limited and "城市3" not in limited
+            assert limited.endswith(file_module.TRUNCATED_NOTICE)
+    finally:
+        file_module.EXTRACT_SHEET_ROWS = original
+    print("\n✓ CSV 分块提取测试通过！")
+
+
+if __name__ == "__main__":
+    test_remote_spool()
+    test_local_size_limit()
+    test_extract_budget()
+    test_collect_text_boundary()
+    test_csv_extract()
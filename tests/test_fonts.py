@@ -0,0 +1,89 @@
+"""
+测试共享字体注册表
+"""
+import sys
+import os
+from io import BytesIO
+
+# 添加src目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import utils.fonts as fonts
+
+# 测试环境不一定有中文字体，用一个常见的 TrueType 字体代替
+TEST_FONT = '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'
+
+
+def _use_font(path):
+    os.environ["CJK_FONT_PATH"] = path
+    fonts.find_cjk_font.cache_clear()
+    fonts.get_pil_font.cache_clear()
+
+
+def test_pil_font_cached_by_size():
+    """测试 PIL 字体按字号缓存"""
+    print("=" * 60)
+    print("测试1: PIL 字体缓存")
+    print("=" * 60)
+
+    original = os.environ.get("CJK_FONT_PATH")
+    try:
+        _use_font(TEST_FONT)
+        assert fonts.get_pil_font(24) is fonts.get_pil_font(24)
+        assert fonts.get_pil_font(24) is not fonts.get_pil_font(18)
+        info = fonts.get_pil_font.cache_info()
+        print(f"缓存: {info}")
+        assert info.misses == 2
+    finally:
+        if original is None:
+            os.environ.pop("CJK_FONT_PATH", None)
+        else:
+            os.environ["CJK_FONT_PATH"] = original
+        fonts.find_cjk_font.cache_clear()
+        fonts.get_pil_font.cache_clear()
+    print("\n✓ PIL 字体缓存测试通过！")
+
+
+def test_reportlab_font_subset():
+    """测试 ReportLab 字体只注册一次，且 PDF 中只嵌入用到的字形"""
+    print("\n" + "=" * 60)
+    print("测试2: ReportLab 字体子集")
+    print("=" * 60)
+
+    if not os.path.exists(TEST_FONT):
+        print("跳过：测试字体不存在")
+        return
+
+    from reportlab.pdfgen import canvas
+
+    original = os.environ.get("CJK_FONT_PATH")
+    saved = (fonts._reportlab_font, fonts._reportlab_checked)
+    try:
+        _use_font(TEST_FONT)
+        fonts._reportlab_font, fonts._reportlab_checked = None, False
+        name = fonts.register_reportlab_font()
+        assert name == fonts.REPORTLAB_FONT_NAME
+        assert fonts.register_reportlab_font() == name
+
+        buffer = BytesIO()
+        c = canvas.Canvas(buffer)
+        c.setFont(name, 12)
+        c.drawString(72, 720, "OPC guide")
+        c.save()
+        pdf_size = len(buffer.getvalue())
+        font_size = os.path.getsize(TEST_FONT)
+        print(f"PDF 大小: {pdf_size} 字节，字体文件: {font_size} 字节")
+        assert pdf_size < font_size / 10
+    finally:
+        if original is None:
+            os.environ.pop("CJK_FONT_PATH", None)
+        else:
+            os.environ["CJK_FONT_PATH"] = original
+        fonts.find_cjk_font.cache_clear()
+        fonts._reportlab_font, fonts._reportlab_checked = saved
+    print("\n✓ ReportLab 字体子集测试通过！")
+
+
+if __name__ == "__main__":
+    test_pil_font_cached_by_size()
+    test_reportlab_font_subset()
@@ -0,0 +1,97 @@
+"""
+测试共享 HTTP 客户端的连接复用与重试
+"""
+import sys
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 添加src目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import utils.http_client as http_client
+import utils.file.download_cache as download_cache
+from utils.file.file import File, FileOps
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    """HTTP/1.1 服务，记录客户端连接；前 fail_count 次请求返回 503"""
+
+    protocol_version = "HTTP/1.1"
+    connections = set()
+    requests_seen = 0
+    fail_count = 0
+
+    def do_GET(self):
+        KeepAliveHandler.connections.add(self.client_address)
+        KeepAliveHandler.requests_seen += 1
+        if KeepAliveHandler.requests_seen <= KeepAliveHandler.fail_count:
+            self.send_response(503)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        data = "共享连接".encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+def _start_server(fail_count=0):
+    KeepAliveHandler.connections = set()
+    KeepAliveHandler.requests_seen = 0
+    KeepAliveHandler.fail_count = fail_count
+    server = ThreadingHTTPServer(("127.0.0.1", 0), KeepAliveHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def test_keepalive_reuse():
+    """测试多次读取远程文件复用同一条连接"""
+    print("=" * 60)
+    print("测试1: 连接复用")
+    print("=" * 60)
+
+    server, base = _start_server()
+    cache_enabled = download_cache.DOWNLOAD_CACHE_ENABLED
+    download_cache.DOWNLOAD_CACHE_ENABLED = False
+    try:
+        for _ in range(5):
+            assert FileOps.read_bytes(File(url=f"{base}/a.txt")) == "共享连接".encode("utf-8")
+        print(f"请求数: {KeepAliveHandler.requests_seen}, 连接数: {len(KeepAliveHandler.connections)}")
+        assert KeepAliveHandler.requests_seen == 5
+        assert len(KeepAliveHandler.connections) == 1
+    finally:
+        download_cache.DOWNLOAD_CACHE_ENABLED = cache_enabled
+        server.shutdown()
+    print("\n✓ 连接复用测试通过！")
+
+
+def test_retry_on_503():
+    """测试 5xx 响应按退避自动重试"""
+    print("\n" + "=" * 60)
+    print("测试2: 失败重试")
+    print("=" * 60)
+
+    original_backoff = http_client.HTTP_BACKOFF
+    http_client.HTTP_BACKOFF = 0.01
+    http_client.close_http_session()
+    server, base = _start_server(fail_count=2)
+    try:
+        resp = http_client.get_http_session().get(f"{base}/retry.txt", timeout=5)
+        print(f"状态码: {resp.status_code}, 请求数: {KeepAliveHandler.requests_seen}")
+        assert resp.status_code == 200
+        assert KeepAliveHandler.requests_seen == 3
+    finally:
+        server.shutdown()
+        http_client.HTTP_BACKOFF = original_backoff
+        http_client.close_http_session()
+    print("\n✓ 失败重试测试通过！")
+
+
+if __name__ == "__main__":
+    test_keepalive_reuse()
+    test_retry_on_503()
@@ -0,0 +1,221 @@
+"""
+测试有界内存 checkpointer（BoundedMemorySaver）
+"""
+import sys
+import os
+import time
+
+# 添加src目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from langgraph.graph import StateGraph, MessagesState, START, END
+import uuid
+import asyncio
+from langgraph.checkpoint.postgres import PostgresSaver
+from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver
+import storage.memory.memory_saver as memory_saver
+from storage.memory.memory_saver import BoundedMemorySaver, MemoryManager
+
+
+def _build_graph(checkpointer):
+    """构建一个不依赖 LLM 的回声图"""
+    def echo(state: MessagesState):
+        return {"messages": [("ai", f"echo: {state['messages'][-1].content}")]}
+
+    builder = StateGraph(MessagesState)
+    builder.add_node("echo", echo)
+    builder.add_edge(START, "echo")
+    builder.add_edge("echo", END)
+    return builder.compile(checkpointer=checkpointer)
+
+
+def _config(thread_id):
+    return {"configurable": {"thread_id": thread_id}}
+
+
+def test_thread_isolation():
+    """测试不同会话的消息互不影响"""
+    print("=" * 60)
+    print("测试1: 会话隔离")
+    print("=" * 60)
+
+    graph = _build_graph(BoundedMemorySaver())
+    graph.invoke({"messages": [("user", "A1")]}, _config("a"))
+    graph.invoke({"messages": [("user", "A2")]}, _config("a"))
+    result = graph.invoke({"messages": [("user", "B1")]}, _config("b"))
+
+    contents = [m.content for m in result["messages"]]
+    print(f"会话 b 的消息: {contents}")
+    assert contents == ["B1", "echo: B1"]
+
+    state = graph.get_state(_config("a"))
+    assert len(state.values["messages"]) == 4
+    print("\n✓ 会话隔离测试通过！")
+
+
+def test_history_trimmed():
+    """测试每个会话只保留最近的 checkpoint"""
+    print("\n" + "=" * 60)
+    print("测试2: 历史 checkpoint 裁剪")
+    print("=" * 60)
+
+    saver = BoundedMemorySaver(max_history=2)
+    graph = _build_graph(saver)
+    for i in range(5):
+        graph.invoke({"messages": [("user", f"msg{i}")]}, _config("t"))
+
+    checkpoints = [*saver.list(_config("t"))]
+    print(f"保留的 checkpoint 数量: {len(checkpoints)}")
+    assert len(checkpoints) == 2
+
+    # 裁剪后仍能恢复完整的最新状态
+    state = graph.get_state(_config("t"))
+    assert len(state.values["messages"]) == 10
+    print("\n✓ 历史裁剪测试通过！")
+
+
+def test_lru_eviction():
+    """测试超过会话数量上限时淘汰最久未访问的会话"""
+    print("\n" + "=" * 60)
+    print("测试3: LRU 淘汰")
+    print("=" * 60)
+
+    saver = BoundedMemorySaver(max_threads=2)
+    graph = _build_graph(saver)
+    graph.invoke({"messages": [("user", "1")]}, _config("t1"))
+    graph.invoke({"messages": [("user", "2")]}, _config("t2"))
+    # 访问 t1，使 t2 成为最久未访问的会话
+    graph.get_state(_config("t1"))
+    graph.invoke({"messages": [("user", "3")]}, _config("t3"))
+
+    print(f"当前会话数: {saver.thread_count()}")
+    assert saver.thread_count() == 2
+    assert saver.get_tuple(_config("t2")) is None
+    assert saver.get_tuple(_config("t1")) is not None
+    assert "t2" not in saver.storage
+    print("\n✓ LRU 淘汰测试通过！")
+
+
+def test_bytes_and_ttl_eviction():
+    """测试内存上限和过期淘汰"""
+    print("\n" + "=" * 60)
+    print("测试4: 内存上限与 TTL 淘汰")
+    print("=" * 60)
+
+    saver = BoundedMemorySaver(max_bytes=1)
+    graph = _build_graph(saver)
+    graph.invoke({"messages": [("user", "x" * 1000)]}, _config("big1"))
+    graph.invoke({"messages": [("user", "y" * 1000)]}, _config("big2"))
+    # 超出内存上限时只保留最近访问的会话
+    assert saver.thread_count() == 1
+    assert saver.total_bytes == saver._measure_thread("big2")
+
+    saver = BoundedMemorySaver(ttl_seconds=1)
+    graph = _build_graph(saver)
+    graph.invoke({"messages": [("user", "old")]}, _config("old"))
+    saver._access["old"] = time.monotonic() - 10
+    assert saver.get_tuple(_config("old")) is None
+    assert saver.total_bytes == 0
+    print("\n✓ 内存上限与 TTL 淘汰测试通过！")
+
+
+def test_shared_postgres_saver():
+    """测试没有事件循环时使用同步 PostgresSaver，不同进程的管理器看到同一份会话历史"""
+    print("\n" + "=" * 60)
+    print("测试5: 同步 PostgresSaver 跨进程共享")
+    print("=" * 60)
+
+    managers = []
+    try:
+        for _ in range(2):
+            # 每次重建单例，模拟两个 worker 进程各自初始化
+            MemoryManager._instance = None
+            manager = MemoryManager()
+            managers.append(manager)
+            assert isinstance(manager.get_checkpointer(), PostgresSaver)
+
+        thread_id = uuid.uuid4().hex
+        _build_graph(managers[0].get_checkpointer()).invoke({"messages": [("user", "hi")]}, _config(thread_id))
+        state = _build_graph(managers[1].get_checkpointer()).get_state(_config(thread_id))
+        contents = [m.content for m in state.values["messages"]]
+        print(f"另一个管理器读到的消息: {contents}")
+        assert contents == ["hi", "echo: hi"]
+    finally:
+        for manager in managers:
+            for pool in manager._pools.values():
+                pool.close()
+        MemoryManager._instance = None
+    print("\n✓ 同步 PostgresSaver 跨进程共享测试通过！")
+
+
+def test_async_mode_separate_saver():
+    """测试异步调用方拿到 AsyncPostgresSaver，与同步调用方的 checkpointer 分开缓存"""
+    print("\n" + "=" * 60)
+    print("测试5b: 同步 / 异步 checkpointer 分开缓存")
+    print("=" * 60)
+
+    MemoryManager._instance = None
+    manager = MemoryManager()
+    thread_id = uuid.uuid4().hex
+
+    async def run_async():
+        saver = manager.get_checkpointer()
+        assert isinstance(saver, AsyncPostgresSaver)
+        try:
+            result = await _build_graph(saver).ainvoke({"messages": [("user", "async")]}, _config(thread_id))
+            return [m.content for m in result["messages"]]
+        finally:
+            await manager._pools.pop(True).close()
+
+    try:
+        # 事件循环外先构建同步 checkpointer（如 gunicorn 的 post_worker_init），不应影响异步调用方
+        assert isinstance(manager.get_checkpointer(), PostgresSaver)
+        contents = asyncio.run(run_async())
+        print(f"异步调用结果: {contents}")
+        assert contents == ["async", "echo: async"]
+        # 显式指定 async_mode 时不再按事件循环判断
+        assert manager.get_checkpointer(async_mode=False) is manager.get_checkpointer()
+    finally:
+        for pool in manager._pools.values():
+            pool.close()
+        MemoryManager._instance = None
+    print("\n✓ 同步 / 异步 checkpointer 分开缓存测试通过！")
+
+
+def test_reset_after_fork():
+    """测试 fork 后丢弃继承的 checkpointer 和连接池，子进程重新创建"""
+    print("\n" + "=" * 60)
+    print("测试6: fork 后重建 checkpointer")
+    print("=" * 60)
+
+    MemoryManager._instance = None
+    memory_saver._memory_manager = None
+    try:
+        inherited = memory_saver.get_memory_saver()
+        pool = memory_saver._memory_manager._pools.get(False)
+        memory_saver.reset_memory_saver_after_fork()
+        assert memory_saver._memory_manager._checkpointers == {}
+        assert memory_saver._memory_manager._pools == {}
+        if pool is not None:
+            # 继承的连接池只保留引用，不关闭
+            assert memory_saver._inherited_pools[-1] is pool
+        rebuilt = memory_saver.get_memory_saver()
+        print(f"继承: {type(inherited).__name__}, 重建: {type(rebuilt).__name__}")
+        assert rebuilt is not inherited
+    finally:
+        for pool in memory_saver._inherited_pools + list(memory_saver._memory_manager._pools.values()):
+            pool.close()
+        memory_saver._inherited_pools.clear()
+        MemoryManager._instance = None
+        memory_saver._memory_manager = None
+    print("\n✓ fork 后重建 checkpointer 测试通过！")
+
+
+if __name__ == "__main__":
+    test_thread_isolation()
+    test_history_trimmed()
+    test_lru_eviction()
+    test_bytes_and_ttl_eviction()
+    test_shared_postgres_saver()
+    test_async_mode_separate_saver()
+    test_reset_after_fork()
@@ -0,0 +1,90 @@
+"""
+测试按 token 预算裁剪的消息窗口
+"""
+import sys
+import os
+
+# 添加src目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from langchain_core.messages import HumanMessage, AIMessage, ToolMessage
+import agents.agent as agent_module
+from agents.agent import _windowed_messages, count_message_tokens, estimate_tokens
+
+
+def test_short_chat_kept():
+    """测试短对话不受条数限制"""
+    print("=" * 60)
+    print("测试1: 短对话全部保留")
+    print("=" * 60)
+
+    messages = []
+    for i in range(60):
+        messages.append(HumanMessage(content=f"问题{i}", id=f"h{i}"))
+        messages.append(AIMessage(content=f"回答{i}", id=f"a{i}"))
+
+    window = _windowed_messages([], messages)
+    print(f"消息数: {len(window)}，估算 token: {count_message_tokens(window)}")
+    assert len(window) == 120
+    print("\n✓ 短对话测试通过！")
+
+
+def test_trim_by_tokens():
+    """测试超出预算时淘汰最早的消息"""
+    print("\n" + "=" * 60)
+    print("测试2: 按 token 预算裁剪")
+    print("=" * 60)
+
+    long_text = "企业微信群信息" * 2000
+    messages = [
+        HumanMessage(content="第一轮", id="h0"),
+        AIMessage(content=long_text, id="a0"),
+        HumanMessage(content="第二轮", id="h1"),
+        AIMessage(content="好的", id="a1"),
+    ]
+
+    original = agent_module.MAX_HISTORY_TOKENS
+    agent_module.MAX_HISTORY_TOKENS = estimate_tokens(messages[0]) + 100
+    try:
+        window = _windowed_messages([], messages)
+    finally:
+        agent_module.MAX_HISTORY_TOKENS = original
+
+    print(f"保留消息: {[m.id for m in window]}")
+    assert [m.id for m in window] == ["h1", "a1"]
+    print("\n✓ token 裁剪测试通过！")
+
+
+def test_tool_call_kept_with_result():
+    """测试工具调用与其结果不会被拆开"""
+    print("\n" + "=" * 60)
+    print("测试3: 工具调用与结果成组保留")
+    print("=" * 60)
+
+    messages = [
+        HumanMessage(content="加群", id="h0"),
+        AIMessage(content="", id="a0", tool_calls=[
+            {"name": "get_wechat_group_info", "args": {}, "id": "call_1"},
+        ]),
+        ToolMessage(content="群二维码" * 500, tool_call_id="call_1", id="t0"),
+        AIMessage(content="已发送群二维码", id="a1"),
+    ]
+
+    original = agent_module.MAX_HISTORY_TOKENS
+    # 预算只够保留最后一条和工具结果，不够保留发起调用的 AIMessage
+    agent_module.MAX_HISTORY_TOKENS = estimate_tokens(messages[2]) + estimate_tokens(messages[3])
+    try:
+        window = _windowed_messages([], messages)
+    finally:
+        agent_module.MAX_HISTORY_TOKENS = original
+
+    print(f"保留消息: {[m.id for m in window]}")
+    assert [m.id for m in window] == ["a1"]
+    assert not isinstance(window[0], ToolMessage)
+    print("\n✓ 工具调用成组测试通过！")
+
+
+if __name__ == "__main__":
+    test_short_chat_kept()
+    test_trim_by_tokens()
+    test_tool_call_kept_with_result()
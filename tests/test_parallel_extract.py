@@ -0,0 +1,155 @@
+"""
+测试多进程文档文本提取
+"""
+import sys
+import os
+import tempfile
+import multiprocessing
+from io import BytesIO
+from concurrent.futures import ProcessPoolExecutor
+
+# 添加src目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import utils.file.parallel_extract as parallel_extract
+from utils.file.parallel_extract import iter_pages_parallel, TIMEOUT_NOTICE
+from utils.file.file import File, FileOps, iter_ppt
+
+
+def _make_pdf(page_count):
+    from reportlab.pdfgen import canvas
+    buffer = BytesIO()
+    c = canvas.Canvas(buffer)
+    for i in range(1, page_count + 1):
+        c.drawString(72, 720, f"Page {i} content")
+        c.showPage()
+    c.save()
+    return buffer.getvalue()
+
+
+def _make_pptx(slide_count):
+    from pptx import Presentation
+    from pptx.util import Inches
+    prs = Presentation()
+    for i in range(1, slide_count + 1):
+        slide = prs.slides.add_slide(prs.slide_layouts[6])
+        slide.shapes.add_textbox(Inches(1), Inches(1), Inches(4), Inches(1)).text_frame.text = f"幻灯片{i}"
+    buffer = BytesIO()
+    prs.save(buffer)
+    return buffer.getvalue()
+
+
+def test_ordered_parallel_extract():
+    """测试并行提取结果与逐页提取一致且保持页序"""
+    print("=" * 60)
+    print("测试1: 并行提取保持页序")
+    print("=" * 60)
+
+    executor = ProcessPoolExecutor(max_workers=2, mp_context=multiprocessing.get_context("spawn"))
+    try:
+        pdf = BytesIO(_make_pdf(20))
+        pages = list(iter_pages_parallel(pdf, ".pdf", 20, executor=executor, pages_per_task=3))
+        print(f"PDF 页数: {len(pages)}")
+        assert [p.strip() for p in pages] == [f"Page {i} content" for i in range(1, 21)]
+
+        # 提取过程中原文件被删除（如下载缓存淘汰）不影响后续任务
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "cached.pdf")
+            with open(path, "wb") as f:
+                f.write(_make_pdf(20))
+            with open(path, "rb") as stream:
+                pages = iter_pages_parallel(stream, ".pdf", 20, executor=executor, pages_per_task=2)
+                first = next(pages)
+                os.remove(path)
+                rest = list(pages)
+            assert [p.strip() for p in [first] + rest] == [f"Page {i} content" for i in range(1, 21)]
+
+        # 时间预算耗尽时追加提示
+        pages = list(iter_pages_parallel(BytesIO(_make_pdf(20)), ".pdf", 20, executor=executor, time_budget=0))
+        print(f"超时结果: {pages[-1]}")
+        assert pages[-1] == TIMEOUT_NOTICE
+    finally:
+        executor.shutdown()
+    print("\n✓ 并行提取保持页序测试通过！")
+
+
+def test_file_ops_parallel():
+    """测试 FileOps 对大文档自动启用并行提取，预算照常生效"""
+    print("\n" + "=" * 60)
+    print("测试2: FileOps 并行提取")
+    print("=" * 60)
+
+    saved = (parallel_extract.EXTRACT_WORKERS, parallel_extract.EXTRACT_PARALLEL_MIN_PAGES, parallel_extract._executor)
+    parallel_extract.EXTRACT_WORKERS = 2
+    parallel_extract.EXTRACT_PARALLEL_MIN_PAGES = 4
+    parallel_extract._executor = None
+    try:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "report.pdf")
+            with open(path, "wb") as f:
+                f.write(_make_pdf(10))
+            text = FileOps.extract_text(File(url=path))
+            assert all(f"Page {i} content" in text for i in range(1, 11))
+            assert text.index("Page 2 content") < text.index("Page 10 content")
+            assert parallel_extract._executor is not None
+
+            limited = FileOps.extract_text(File(url=path), max_pages=3)
+            print(limited)
+            assert "Page 3 content" in limited and "Page 4 content" not in limited
+
+            # PPT 只解析一次，在当前进程逐页产出，不切分给进程池
+            pptx_path = os.path.join(tmp_dir, "deck.pptx")
+            with open(pptx_path, "wb") as f:
+                f.write(_make_pptx(12))
+            parallel_extract._executor.shutdown()
+            parallel_extract._executor = None
+            slides = list(FileOps.iter_text(File(url=pptx_path)))
+            assert slides == list(iter_ppt(pptx_path))
+            assert parallel_extract._executor is None
+    finally:
+        if parallel_extract._executor is not None:
+            parallel_extract._executor.shutdown()
+        parallel_extract.EXTRACT_WORKERS, parallel_extract.EXTRACT_PARALLEL_MIN_PAGES, parallel_extract._executor = saved
+    print("\n✓ FileOps 并行提取测试通过！")
+
+
+def test_timeout_recycles_pool():
+    """测试超时后回收共享进程池：子进程被结束，下次使用时重建，其他进行中的提取改用新进程池"""
+    print("\n" + "=" * 60)
+    print("测试3: 超时回收进程池")
+    print("=" * 60)
+
+    saved = (parallel_extract.EXTRACT_WORKERS, parallel_extract._executor)
+    parallel_extract.EXTRACT_WORKERS = 2
+    parallel_extract._executor = None
+    try:
+        pdf = _make_pdf(20)
+        # 另一份文档正在用共享进程池提取
+        other = iter_pages_parallel(BytesIO(pdf), ".pdf", 20, pages_per_task=2)
+        first = next(other)
+        old_executor = parallel_extract._executor
+        processes = list(old_executor._processes.values())
+
+        pages = list(iter_pages_parallel(BytesIO(pdf), ".pdf", 20, time_budget=0))
+        assert pages[-1] == TIMEOUT_NOTICE
+        for process in processes:
+            process.join(timeout=5)
+        print(f"回收后子进程存活: {[p.is_alive() for p in processes]}")
+        assert not any(p.is_alive() for p in processes)
+        assert parallel_extract._executor is None
+
+        # 进行中的提取把未完成的区间重新提交到新进程池，结果完整且有序
+        rest = list(other)
+        assert [p.strip() for p in [first] + rest] == [f"Page {i} content" for i in range(1, 21)]
+        assert parallel_extract._executor is not None and parallel_extract._executor is not old_executor
+    finally:
+        if parallel_extract._executor is not None:
+            parallel_extract._executor.shutdown()
+        parallel_extract.EXTRACT_WORKERS, parallel_extract._executor = saved
+    print("\n✓ 超时回收进程池测试通过！")
+
+
+if __name__ == "__main__":
+    test_ordered_parallel_extract()
+    test_file_ops_parallel()
+    test_timeout_recycles_pool()
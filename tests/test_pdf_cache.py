@@ -0,0 +1,166 @@
+"""
+测试 PDF 内容寻址缓存
+"""
+import sys
+import os
+import time
+import tempfile
+
+# 添加src目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from utils.pdf.pdf_cache import PdfCache, make_cache_key
+import utils.pdf.pdf_cache as pdf_cache_module
+from tools.pdf_generator_simple import generate_opc_pdf_simple
+
+
+class MemoryStorage:
+    """内存中的对象存储，只实现缓存用到的方法"""
+
+    def __init__(self):
+        self.objects = {}
+        self.reads = 0
+
+    def file_exists(self, *, file_key, bucket=None):
+        return file_key in self.objects
+
+    def read_file(self, *, file_key, bucket=None):
+        self.reads += 1
+        return self.objects[file_key]
+
+    def upload_file(self, *, file_content, file_name, content_type="application/octet-stream", bucket=None, key=None):
+        self.objects[key] = file_content
+        return key
+
+
+def test_lru_eviction():
+    """测试超过容量上限时淘汰最久未使用的文件"""
+    print("=" * 60)
+    print("测试1: 磁盘 LRU 淘汰")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = PdfCache(cache_dir=cache_dir, max_bytes=250)
+        cache.put("a", b"a" * 100)
+        cache.put("b", b"b" * 100)
+        assert cache.get("a") == b"a" * 100  # a 变为最近使用
+        cache.put("c", b"c" * 100)
+
+        stats = cache.stats()
+        print(f"统计: {stats}")
+        assert cache.get("b") is None
+        assert cache.get("a") is not None
+        assert stats["evictions"] == 1
+        assert stats["bytes"] <= 250
+        assert not os.path.exists(os.path.join(cache_dir, "b.pdf"))
+
+        # 重启后从磁盘恢复索引
+        reopened = PdfCache(cache_dir=cache_dir, max_bytes=250)
+        assert reopened.get("c") == b"c" * 100
+    print("\n✓ LRU 淘汰测试通过！")
+
+
+def test_shared_dir_cap():
+    """测试多个进程共用缓存目录时上限按目录合计生效，按文件 mtime 淘汰"""
+    print("\n" + "=" * 60)
+    print("测试1b: 共享目录容量上限")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        # 两个实例模拟两个 worker 进程
+        worker1 = PdfCache(cache_dir=cache_dir, max_bytes=250)
+        worker2 = PdfCache(cache_dir=cache_dir, max_bytes=250)
+        worker1.put("a", b"a" * 100)
+        worker2.put("b", b"b" * 100)
+        assert worker2.get("a") == b"a" * 100  # 其他进程读取同样刷新最近使用时间
+        worker2.put("c", b"c" * 100)
+
+        files = sorted(os.listdir(cache_dir))
+        total = sum(os.path.getsize(os.path.join(cache_dir, name)) for name in files)
+        print(f"目录内文件: {files}, 合计 {total} bytes")
+        assert total <= 250
+        assert files == ["a.pdf", "c.pdf"]
+        assert worker1.get("b") is None
+        assert worker1.get("a") == b"a" * 100
+    print("\n✓ 共享目录容量上限测试通过！")
+
+
+def test_s3_backing():
+    """测试本地未命中时从对象存储读取"""
+    print("\n" + "=" * 60)
+    print("测试2: 对象存储二级缓存")
+    print("=" * 60)
+
+    storage = MemoryStorage()
+    key = make_cache_key("1", "用户信息", "杭州", "项目")
+    with tempfile.TemporaryDirectory() as dir1, tempfile.TemporaryDirectory() as dir2:
+        PdfCache(cache_dir=dir1, storage=storage).put(key, b"%PDF-test")
+        other_instance = PdfCache(cache_dir=dir2, storage=storage)
+        assert other_instance.get(key) == b"%PDF-test"
+        assert other_instance.get(key) == b"%PDF-test"
+        stats = other_instance.stats()
+        print(f"统计: {stats}")
+        assert stats["s3_hits"] == 1
+        assert stats["hits"] == 1
+
+        # 对象存储中不存在的 key 只做存在性检查，不去读取
+        reads = storage.reads
+        assert other_instance.get(make_cache_key("不存在")) is None
+        assert storage.reads == reads
+    print("\n✓ 对象存储二级缓存测试通过！")
+
+
+def test_stale_tmp_cleanup():
+    """测试扫描目录时清理过期的写入临时文件，保留正在写入的临时文件"""
+    print("\n" + "=" * 60)
+    print("测试2b: 清理遗留临时文件")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        stale = os.path.join(cache_dir, "a.pdf.123.456.tmp")
+        fresh = os.path.join(cache_dir, "b.pdf.123.789.tmp")
+        for path in (stale, fresh):
+            with open(path, "wb") as f:
+                f.write(b"partial")
+        old = time.time() - pdf_cache_module.PDF_CACHE_TMP_MAX_AGE - 60
+        os.utime(stale, (old, old))
+
+        cache = PdfCache(cache_dir=cache_dir)
+        files = sorted(os.listdir(cache_dir))
+        print(f"目录内文件: {files}")
+        assert not os.path.exists(stale)
+        assert os.path.exists(fresh)
+        assert cache.stats()["entries"] == 0
+    print("\n✓ 临时文件清理测试通过！")
+
+
+def test_tool_uses_cache():
+    """测试相同输入第二次生成直接命中缓存"""
+    print("\n" + "=" * 60)
+    print("测试3: 工具命中缓存")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        original = pdf_cache_module._pdf_cache
+        pdf_cache_module._pdf_cache = PdfCache(cache_dir=cache_dir)
+        try:
+            args = {"user_info": "技能：写作", "city": "成都", "projects": "知识付费"}
+            first = generate_opc_pdf_simple.invoke(args)
+            second = generate_opc_pdf_simple.invoke(args)
+            stats = pdf_cache_module._pdf_cache.stats()
+            print(f"统计: {stats}")
+            assert stats["misses"] == 1
+            assert stats["hits"] == 1
+            for message in (first, second):
+                os.remove(message.split("文件路径：")[1].split("\n")[0])
+        finally:
+            pdf_cache_module._pdf_cache = original
+    print("\n✓ 工具缓存测试通过！")
+
+
+if __name__ == "__main__":
+    test_lru_eviction()
+    test_shared_dir_cap()
+    test_s3_backing()
+    test_stale_tmp_cleanup()
+    test_tool_uses_cache()
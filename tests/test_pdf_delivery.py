@@ -0,0 +1,169 @@
+"""
+测试 PDF 上传对象存储并返回下载链接
+"""
+import sys
+import os
+
+# 添加src目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import tempfile
+import utils.pdf.pdf_delivery as pdf_delivery
+import utils.pdf.pdf_cache as pdf_cache_module
+from utils.pdf.pdf_cache import PdfCache
+from tools.pdf_generator_simple import generate_opc_pdf_simple
+
+
+class MemoryStorage:
+    """内存中的对象存储，只实现交付和 PDF 缓存用到的方法"""
+
+    def __init__(self, fail: bool = False):
+        self.objects = {}
+        self.fail = fail
+        self.uploads = 0
+
+    def stream_upload_file(self, *, fileobj, file_name, content_type="application/octet-stream", bucket=None,
+                           multipart_chunksize=5 * 1024 * 1024, multipart_threshold=5 * 1024 * 1024,
+                           key=None, **kwargs):
+        if self.fail:
+            raise RuntimeError("storage unavailable")
+        parts = []
+        while True:
+            chunk = fileobj.read(multipart_chunksize)
+            if not chunk:
+                break
+            parts.append(chunk)
+        key = key or f"{len(self.objects)}_{file_name}"
+        self.objects[key] = (b"".join(parts), content_type)
+        self.uploads += 1
+        return key
+
+    def upload_file(self, *, file_content, file_name, content_type="application/octet-stream", bucket=None, key=None):
+        self.objects[key] = (file_content, content_type)
+        self.uploads += 1
+        return key
+
+    def read_file(self, *, file_key, bucket=None):
+        return self.objects[file_key][0]
+
+    def file_exists(self, *, file_key, bucket=None):
+        if self.fail:
+            raise RuntimeError("storage unavailable")
+        return file_key in self.objects
+
+    def generate_presigned_url(self, *, key, bucket=None, expire_time=1800):
+        return f"https://bucket.example.com/{key}?expires={expire_time}"
+
+
+def _with_storage(storage):
+    original = (pdf_delivery.PDF_STORAGE_ENABLED, pdf_delivery._pdf_storage)
+    pdf_delivery.PDF_STORAGE_ENABLED = True
+    pdf_delivery._pdf_storage = storage
+    pdf_delivery._uploaded_keys.clear()
+    return original
+
+
+def _restore(original):
+    pdf_delivery.PDF_STORAGE_ENABLED, pdf_delivery._pdf_storage = original
+    pdf_delivery._uploaded_keys.clear()
+
+
+def test_upload_returns_presigned_url():
+    """测试生成的 PDF 直接上传对象存储并返回签名链接"""
+    print("=" * 60)
+    print("测试1: 上传并返回下载链接")
+    print("=" * 60)
+
+    storage = MemoryStorage()
+    original = _with_storage(storage)
+    try:
+        message = generate_opc_pdf_simple.invoke({"user_info": "技能：摄影", "city": "厦门", "projects": "旅拍工作室"})
+        print(message)
+        url = message.split("下载链接：")[1].split("\n")[0]
+        assert url.startswith("https://bucket.example.com/")
+        assert "文件路径" not in message
+        (data, content_type), = storage.objects.values()
+        assert data.startswith(b"%PDF-")
+        assert content_type == "application/pdf"
+    finally:
+        _restore(original)
+    print("\n✓ 上传对象存储测试通过！")
+
+
+def test_multipart_chunks():
+    """测试超过分片阈值时按分片读取"""
+    print("\n" + "=" * 60)
+    print("测试2: 分片上传")
+    print("=" * 60)
+
+    storage = MemoryStorage()
+    original_part_size = pdf_delivery.PDF_UPLOAD_PART_SIZE
+    pdf_delivery.PDF_UPLOAD_PART_SIZE = 1024
+    try:
+        payload = b"%PDF-" + os.urandom(5000)
+        url = pdf_delivery.upload_pdf(storage, payload, expire_time=60)
+        print(f"下载链接: {url}")
+        assert url.endswith("expires=60")
+        (data, _), = storage.objects.values()
+        assert data == payload
+    finally:
+        pdf_delivery.PDF_UPLOAD_PART_SIZE = original_part_size
+    print("\n✓ 分片上传测试通过！")
+
+
+def test_fallback_to_local():
+    """测试上传失败时回退为保存到本地"""
+    print("\n" + "=" * 60)
+    print("测试3: 上传失败回退本地")
+    print("=" * 60)
+
+    original = _with_storage(MemoryStorage(fail=True))
+    try:
+        message = generate_opc_pdf_simple.invoke({"user_info": "技能：烘焙", "city": "长沙", "projects": "私房甜品"})
+        path = message.split("文件路径：")[1].split("\n")[0]
+        print(f"本地文件: {path}")
+        with open(path, "rb") as f:
+            assert f.read(5) == b"%PDF-"
+        os.remove(path)
+    finally:
+        _restore(original)
+    print("\n✓ 回退本地测试通过！")
+
+
+def test_content_addressed_delivery():
+    """测试相同内容只上传一次：重复生成只重新签名；开启对象存储二级缓存时与缓存共用同一个对象"""
+    print("\n" + "=" * 60)
+    print("测试4: 按内容哈希交付")
+    print("=" * 60)
+
+    args = {"user_info": "技能：木工", "city": "大理", "projects": "手作工坊"}
+    storage = MemoryStorage()
+    original = _with_storage(storage)
+    original_cache = pdf_cache_module._pdf_cache
+    try:
+        with tempfile.TemporaryDirectory() as cache_dir:
+            # PDF 缓存的对象存储二级缓存与交付使用同一个存储
+            pdf_cache_module._pdf_cache = PdfCache(cache_dir=cache_dir, storage=storage)
+            first = generate_opc_pdf_simple.invoke(args)
+            second = generate_opc_pdf_simple.invoke(args)
+            print(f"对象: {list(storage.objects)}, 上传次数: {storage.uploads}")
+            assert storage.uploads == 1
+            key, = storage.objects
+            assert key.startswith(pdf_delivery.PDF_OBJECT_PREFIX) and key.endswith(".pdf")
+            assert first.split("下载链接：")[1] == second.split("下载链接：")[1]
+
+            # 其他进程（本进程没有上传记录）命中时先检查对象是否存在，同样不再上传
+            pdf_delivery._uploaded_keys.clear()
+            generate_opc_pdf_simple.invoke(args)
+            assert storage.uploads == 1
+    finally:
+        pdf_cache_module._pdf_cache = original_cache
+        _restore(original)
+    print("\n✓ 按内容哈希交付测试通过！")
+
+
+if __name__ == "__main__":
+    test_upload_returns_presigned_url()
+    test_multipart_chunks()
+    test_fallback_to_local()
+    test_content_addressed_delivery()
@@ -0,0 +1,71 @@
+"""
+测试 PDF 渲染进程池
+"""
+import sys
+import os
+import time
+import asyncio
+
+# 添加src目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from utils.pdf.render_pool import PdfRenderPool, PdfRenderBusyError
+import tools.pdf_generator_simple as pdf_module
+from tools.pdf_generator_simple import generate_opc_pdf_simple, render_opc_pdf
+
+
+def test_concurrent_render_unique_files():
+    """测试并发生成的 PDF 各自独立，互不覆盖"""
+    print("=" * 60)
+    print("测试1: 并发渲染")
+    print("=" * 60)
+
+    async def run():
+        return await asyncio.gather(*[
+            generate_opc_pdf_simple.ainvoke({
+                "user_info": f"城市：杭州\n技能：写作{i}",
+                "city": "杭州",
+                "projects": f"项目{i}",
+            })
+            for i in range(4)
+        ])
+
+    messages = asyncio.run(run())
+    paths = [m.split("文件路径：")[1].split("\n")[0] for m in messages]
+    print(f"生成文件: {paths}")
+    assert len(set(paths)) == 4
+    for path in paths:
+        with open(path, "rb") as f:
+            assert f.read(5) == b"%PDF-"
+        os.remove(path)
+    print("\n✓ 并发渲染测试通过！")
+
+
+def test_backpressure():
+    """测试队列满时拒绝新任务"""
+    print("\n" + "=" * 60)
+    print("测试2: 队列背压")
+    print("=" * 60)
+
+    pool = PdfRenderPool(workers=1, queue_size=1, queue_timeout=0.1)
+    try:
+        first = pool.submit(time.sleep, 0.5)
+        try:
+            pool.submit(time.sleep, 0)
+            assert False, "队列已满，应当拒绝"
+        except PdfRenderBusyError as e:
+            print(f"✓ 拒绝任务: {e}")
+        first.result()
+        assert len(pool.render(render_opc_pdf, "技能：写作", "北京", "项目")) > 0
+        stats = pool.stats()
+        print(f"统计: {stats}")
+        assert stats["rejected"] == 1
+        assert stats["in_flight"] == 0
+    finally:
+        pool.shutdown()
+    print("\n✓ 队列背压测试通过！")
+
+
+if __name__ == "__main__":
+    test_concurrent_render_unique_files()
+    test_backpressure()
@@ -0,0 +1,95 @@
+"""
+测试 Prompt 缓存中间件
+"""
+import sys
+import os
+
+# 添加src目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from langchain.agents.middleware.types import ModelRequest, ModelResponse
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+from agents.prompt_cache import PromptCacheMiddleware, PromptCacheStats, compute_prefix_key
+import agents.prompt_cache as prompt_cache_module
+from tools.wechat_group_info import get_wechat_group_info
+
+
+def _request():
+    return ModelRequest(
+        model=None,
+        system_prompt="你是OPC超级个体孵化助手",
+        messages=[HumanMessage(content="你好")],
+        tool_choice=None,
+        tools=[get_wechat_group_info],
+        response_format=None,
+        state={"messages": []},
+        runtime=None,
+    )
+
+
+def _handler(seen):
+    def handler(request):
+        seen.append(request)
+        return ModelResponse(result=[AIMessage(
+            content="你好！",
+            usage_metadata={
+                "input_tokens": 1000,
+                "output_tokens": 10,
+                "total_tokens": 1010,
+                "input_token_details": {"cache_read": 800},
+            },
+        )])
+    return handler
+
+
+def test_prefix_key_stable():
+    """测试静态前缀 key 只取决于系统提示词和工具定义"""
+    print("=" * 60)
+    print("测试1: 前缀 key 稳定")
+    print("=" * 60)
+
+    key1 = compute_prefix_key("sp", [get_wechat_group_info])
+    key2 = compute_prefix_key("sp", [get_wechat_group_info])
+    key3 = compute_prefix_key("sp2", [get_wechat_group_info])
+    print(f"key: {key1}")
+    assert key1 == key2
+    assert key1 != key3
+    print("\n✓ 前缀 key 测试通过！")
+
+
+def test_cache_hints_and_stats():
+    """测试缓存提示附加与命中统计"""
+    print("\n" + "=" * 60)
+    print("测试2: 缓存提示与命中统计")
+    print("=" * 60)
+
+    original_stats = prompt_cache_module.prompt_cache_stats
+    prompt_cache_module.prompt_cache_stats = PromptCacheStats()
+    try:
+        seen = []
+        PromptCacheMiddleware("opc-test", mode="off").wrap_model_call(_request(), _handler(seen))
+        assert "prompt_cache_key" not in seen[-1].model_settings
+
+        PromptCacheMiddleware("opc-test", mode="key").wrap_model_call(_request(), _handler(seen))
+        assert seen[-1].model_settings["prompt_cache_key"] == "opc-test"
+        assert seen[-1].system_prompt == "你是OPC超级个体孵化助手"
+
+        PromptCacheMiddleware("opc-test", mode="cache_control").wrap_model_call(_request(), _handler(seen))
+        first = seen[-1].messages[0]
+        assert seen[-1].system_prompt is None
+        assert isinstance(first, SystemMessage)
+        assert first.content[0]["cache_control"] == {"type": "ephemeral"}
+
+        stats = prompt_cache_module.prompt_cache_stats.snapshot()
+        print(f"统计: {stats}")
+        assert stats["requests"] == 3
+        assert stats["hits"] == 3
+        assert stats["cached_tokens"] == 2400
+    finally:
+        prompt_cache_module.prompt_cache_stats = original_stats
+    print("\n✓ 缓存提示与统计测试通过！")
+
+
+if __name__ == "__main__":
+    test_prefix_key_stable()
+    test_cache_hints_and_stats()
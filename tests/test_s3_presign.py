@@ -0,0 +1,127 @@
+"""
+测试签名 URL 的缓存、批量生成与连接复用
+"""
+import sys
+import os
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 添加src目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import storage.s3.workload_token as workload_token
+from storage.s3.s3_storage import S3SyncStorage
+
+
+class SignHandler(BaseHTTPRequestHandler):
+    """模拟 /sign-url 接口，记录请求数和客户端连接"""
+
+    protocol_version = "HTTP/1.1"
+    requests_seen = []
+    connections = set()
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        SignHandler.requests_seen.append(body["path"])
+        SignHandler.connections.add(self.client_address)
+        data = json.dumps({"data": {"url": f"https://signed/{body['path']}?n={len(SignHandler.requests_seen)}"}}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+class StaticTokenClient:
+    def get_access_token(self):
+        return "token"
+
+    def close(self):
+        pass
+
+
+def _start_server():
+    SignHandler.requests_seen = []
+    SignHandler.connections = set()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), SignHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def _storage(server):
+    return S3SyncStorage(endpoint_url=f"http://127.0.0.1:{server.server_port}", access_key="", secret_key="",
+                         bucket_name="test")
+
+
+def _with_static_token():
+    original = workload_token._token_cache
+    workload_token._token_cache = workload_token.WorkloadTokenCache(client_factory=StaticTokenClient)
+    return original
+
+
+def test_presign_cache_and_keepalive():
+    """测试相同对象复用缓存的 URL，多次签名复用同一条连接"""
+    print("=" * 60)
+    print("测试1: 签名缓存与连接复用")
+    print("=" * 60)
+
+    original = _with_static_token()
+    server = _start_server()
+    saved_endpoint = os.environ.pop("COZE_BUCKET_ENDPOINT_URL", None)
+    try:
+        storage = _storage(server)
+        first = storage.generate_presigned_url(key="a.pdf", expire_time=3600)
+        assert storage.generate_presigned_url(key="a.pdf", expire_time=3600) == first
+        storage.generate_presigned_url(key="b.pdf", expire_time=3600)
+        storage.generate_presigned_url(key="c.pdf", expire_time=3600)
+        print(f"签名请求: {SignHandler.requests_seen}, 连接数: {len(SignHandler.connections)}")
+        assert SignHandler.requests_seen == ["a.pdf", "b.pdf", "c.pdf"]
+        assert len(SignHandler.connections) == 1
+
+        # 有效期很短的链接不会被缓存到临近过期
+        storage.generate_presigned_url(key="d.pdf", expire_time=0)
+        storage.generate_presigned_url(key="d.pdf", expire_time=0)
+        assert SignHandler.requests_seen.count("d.pdf") == 2
+    finally:
+        server.shutdown()
+        workload_token._token_cache = original
+        if saved_endpoint is not None:
+            os.environ["COZE_BUCKET_ENDPOINT_URL"] = saved_endpoint
+    print("\n✓ 签名缓存与连接复用测试通过！")
+
+
+def test_batch_presign():
+    """测试批量签名只请求未缓存的 key"""
+    print("\n" + "=" * 60)
+    print("测试2: 批量签名")
+    print("=" * 60)
+
+    original = _with_static_token()
+    server = _start_server()
+    saved_endpoint = os.environ.pop("COZE_BUCKET_ENDPOINT_URL", None)
+    try:
+        storage = _storage(server)
+        cached = storage.generate_presigned_url(key="doc0.pdf")
+        keys = [f"doc{i}.pdf" for i in range(10)] + ["doc1.pdf"]
+        urls = storage.generate_presigned_urls(keys=keys, max_concurrency=4)
+        print(f"签名请求数: {len(SignHandler.requests_seen)}")
+        assert set(urls) == {f"doc{i}.pdf" for i in range(10)}
+        assert urls["doc0.pdf"] == cached
+        assert all(urls[k].startswith(f"https://signed/{k}?") for k in urls)
+        assert sorted(SignHandler.requests_seen) == sorted(f"doc{i}.pdf" for i in range(10))
+        assert len(SignHandler.connections) <= 4
+    finally:
+        server.shutdown()
+        workload_token._token_cache = original
+        if saved_endpoint is not None:
+            os.environ["COZE_BUCKET_ENDPOINT_URL"] = saved_endpoint
+    print("\n✓ 批量签名测试通过！")
+
+
+if __name__ == "__main__":
+    test_presign_cache_and_keepalive()
+    test_batch_presign()
@@ -0,0 +1,113 @@
+"""
+测试对象存储的范围读取、流式读取与分块下载
+"""
+import sys
+import os
+import io
+import tempfile
+
+# 添加src目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from botocore.response import StreamingBody
+from storage.s3.s3_storage import S3SyncStorage
+
+
+class FakeS3Client:
+    """模拟 get_object，按 Range 头返回对应字节，记录每次读取的块大小"""
+
+    def __init__(self, objects):
+        self.objects = objects
+        self.ranges = []
+        self.read_sizes = []
+        self.closed = 0
+
+    def get_object(self, *, Bucket, Key, Range=None):
+        data = self.objects[Key]
+        self.ranges.append(Range)
+        if Range:
+            spec = Range[len("bytes="):]
+            if spec.startswith("-"):
+                data = data[int(spec):]
+            else:
+                first, _, last = spec.partition("-")
+                data = data[int(first):int(last) + 1 if last else None]
+        client = self
+
+        class Body(StreamingBody):
+            def read(self, amt=None):
+                client.read_sizes.append(amt)
+                return super().read(amt)
+
+            def close(self):
+                client.closed += 1
+                super().close()
+
+        return {"Body": Body(io.BytesIO(data), len(data))}
+
+
+def _storage(objects):
+    client = FakeS3Client(objects)
+    storage = S3SyncStorage(endpoint_url="http://localhost", access_key="", secret_key="", bucket_name="test")
+    storage._client = client
+    return storage, client
+
+
+def test_range_read():
+    """测试按字节范围读取"""
+    print("=" * 60)
+    print("测试1: 范围读取")
+    print("=" * 60)
+
+    data = bytes(range(256)) * 4
+    storage, client = _storage({"doc.pdf": data})
+    assert storage.read_file(file_key="doc.pdf") == data
+    assert storage.read_file(file_key="doc.pdf", start=10, end=19) == data[10:20]
+    assert storage.read_file(file_key="doc.pdf", start=1000) == data[1000:]
+    assert storage.read_file(file_key="doc.pdf", start=-5) == data[-5:]
+    print(f"Range 头: {client.ranges}")
+    assert client.ranges == [None, "bytes=10-19", "bytes=1000-", "bytes=-5"]
+    assert client.closed == 4
+    try:
+        storage.read_file(file_key="doc.pdf", start=20, end=10)
+        assert False, "无效范围应当报错"
+    except ValueError:
+        pass
+    print("\n✓ 范围读取测试通过！")
+
+
+def test_stream_and_download():
+    """测试分块迭代与下载到本地文件"""
+    print("\n" + "=" * 60)
+    print("测试2: 流式读取与分块下载")
+    print("=" * 60)
+
+    data = os.urandom(10_000)
+    storage, client = _storage({"big.bin": data})
+    chunks = list(storage.iter_file(file_key="big.bin", chunk_size=4096))
+    print(f"块大小: {[len(c) for c in chunks]}")
+    assert [len(c) for c in chunks] == [4096, 4096, 1808]
+    assert b"".join(chunks) == data
+    assert client.closed == 1
+
+    # 中途停止迭代也会关闭连接
+    stream = storage.iter_file(file_key="big.bin", chunk_size=1024)
+    next(stream)
+    stream.close()
+    assert client.closed == 2
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "sub", "big.bin")
+        client.read_sizes.clear()
+        written = storage.download_to_path(file_key="big.bin", path=path, chunk_size=2048)
+        assert written == len(data)
+        with open(path, "rb") as f:
+            assert f.read() == data
+        assert set(client.read_sizes) == {2048}
+        assert os.listdir(os.path.dirname(path)) == ["big.bin"]
+    print("\n✓ 流式读取与分块下载测试通过！")
+
+
+if __name__ == "__main__":
+    test_range_read()
+    test_stream_and_download()
@@ -0,0 +1,119 @@
+"""
+测试对象存储分片并发上传
+"""
+import sys
+import os
+import time
+import threading
+
+# 添加src目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import storage.s3.s3_storage as s3_storage
+from storage.s3.s3_storage import S3SyncStorage
+
+
+class FakeS3Client:
+    """模拟 boto3 S3 客户端的分片上传接口，记录并发数与分片内容"""
+
+    def __init__(self, delay=0.05, fail_times=None):
+        self.delay = delay
+        self.fail_times = dict(fail_times or {})  # part_number -> 剩余失败次数
+        self.parts = {}
+        self.completed = None
+        self.aborted = False
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def create_multipart_upload(self, **kwargs):
+        return {"UploadId": "upload-1"}
+
+    def upload_part(self, *, Bucket, Key, UploadId, PartNumber, Body):
+        with self._lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            time.sleep(self.delay)
+            with self._lock:
+                if self.fail_times.get(PartNumber, 0) > 0:
+                    self.fail_times[PartNumber] -= 1
+                    raise ConnectionError(f"part {PartNumber} reset")
+                self.parts[PartNumber] = bytes(Body)
+            return {"ETag": f"etag-{PartNumber}"}
+        finally:
+            with self._lock:
+                self.active -= 1
+
+    def complete_multipart_upload(self, *, Bucket, Key, UploadId, MultipartUpload):
+        self.completed = MultipartUpload["Parts"]
+
+    def abort_multipart_upload(self, **kwargs):
+        self.aborted = True
+
+
+def _storage(client):
+    storage = S3SyncStorage(endpoint_url="http://localhost", access_key="", secret_key="", bucket_name="test")
+    storage._client = client
+    return storage
+
+
+def _chunks(data, size):
+    for i in range(0, len(data), size):
+        yield data[i:i + size]
+
+
+def test_parallel_parts():
+    """测试分片并发上传且按分片号顺序完成"""
+    print("=" * 60)
+    print("测试1: 分片并发上传")
+    print("=" * 60)
+
+    data = os.urandom(10 * 1000 + 123)
+    client = FakeS3Client()
+    start = time.perf_counter()
+    key = _storage(client).trunk_upload_file(
+        chunk_iter=_chunks(data, 777), file_name="big.bin", part_size=1000, max_concurrency=4,
+    )
+    elapsed = time.perf_counter() - start
+    print(f"key={key}, 分片数={len(client.parts)}, 最大并发={client.max_active}, 耗时={elapsed:.2f}s")
+
+    assert [p["PartNumber"] for p in client.completed] == list(range(1, 12))
+    assert b"".join(client.parts[i] for i in range(1, 12)) == data
+    assert 1 < client.max_active <= 4
+    assert elapsed < 11 * client.delay
+    print("\n✓ 分片并发上传测试通过！")
+
+
+def test_part_retry_and_abort():
+    """测试单个分片失败重试，重试耗尽后中止上传"""
+    print("\n" + "=" * 60)
+    print("测试2: 分片重试与中止")
+    print("=" * 60)
+
+    original_backoff = s3_storage.S3_UPLOAD_RETRY_BACKOFF
+    s3_storage.S3_UPLOAD_RETRY_BACKOFF = 0.01
+    try:
+        data = os.urandom(3000)
+        client = FakeS3Client(delay=0, fail_times={2: 2})
+        _storage(client).trunk_upload_file(chunk_iter=[data], file_name="retry.bin", part_size=1000, part_retries=2)
+        assert client.parts[2] == data[1000:2000]
+        assert not client.aborted
+        print("✓ 分片重试后成功")
+
+        client = FakeS3Client(delay=0, fail_times={1: 5})
+        try:
+            _storage(client).trunk_upload_file(chunk_iter=[data], file_name="fail.bin", part_size=1000, part_retries=1)
+            assert False, "重试耗尽应当抛出异常"
+        except ConnectionError as e:
+            print(f"✓ 重试耗尽: {e}")
+        assert client.aborted
+        assert client.completed is None
+    finally:
+        s3_storage.S3_UPLOAD_RETRY_BACKOFF = original_backoff
+    print("\n✓ 分片重试与中止测试通过！")
+
+
+if __name__ == "__main__":
+    test_parallel_parts()
+    test_part_retry_and_abort()
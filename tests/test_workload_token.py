@@ -0,0 +1,90 @@
+"""
+测试工作负载身份令牌缓存
+"""
+import sys
+import os
+import json
+import time
+import base64
+import threading
+
+# 添加src目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from storage.s3.workload_token import WorkloadTokenCache, _jwt_expiry
+
+
+class FakeClient:
+    """模拟 coze_workload_identity.Client，记录取令牌次数"""
+
+    created = 0
+
+    def __init__(self, token="token", delay=0.0):
+        FakeClient.created += 1
+        self.token = token
+        self.delay = delay
+        self.calls = 0
+
+    def get_access_token(self):
+        self.calls += 1
+        time.sleep(self.delay)
+        return f"{self.token}-{self.calls}"
+
+    def close(self):
+        pass
+
+
+def _make_jwt(exp):
+    payload = base64.urlsafe_b64encode(json.dumps({"exp": exp}).encode()).decode().rstrip("=")
+    return f"header.{payload}.signature"
+
+
+def test_single_flight():
+    """测试并发调用只取一次令牌，且复用同一个 Client"""
+    print("=" * 60)
+    print("测试1: 单飞刷新")
+    print("=" * 60)
+
+    FakeClient.created = 0
+    cache = WorkloadTokenCache(client_factory=lambda: FakeClient(delay=0.1), default_ttl=60)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_token())) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    print(f"令牌: {set(results)}, 取令牌次数: {cache.fetches}")
+    assert set(results) == {"token-1"}
+    assert cache.fetches == 1
+    assert cache.get_token() == "token-1"
+    assert FakeClient.created == 1
+    print("\n✓ 单飞刷新测试通过！")
+
+
+def test_expiry_refresh():
+    """测试令牌临近过期和被拒绝后重新获取"""
+    print("\n" + "=" * 60)
+    print("测试2: 过期刷新")
+    print("=" * 60)
+
+    exp = time.time() + 3600
+    assert abs(_jwt_expiry(_make_jwt(exp)) - exp) < 1
+    assert _jwt_expiry("opaque-token") is None
+
+    cache = WorkloadTokenCache(client_factory=FakeClient, default_ttl=0.2, refresh_margin=0.1)
+    assert cache.get_token() == "token-1"
+    assert cache.get_token() == "token-1"
+    time.sleep(0.15)
+    assert cache.get_token() == "token-2"
+
+    cache.invalidate()
+    assert cache.get_token() == "token-3"
+    print(f"取令牌次数: {cache.fetches}")
+    assert cache.fetches == 3
+    print("\n✓ 过期刷新测试通过！")
+
+
+if __name__ == "__main__":
+    test_single_flight()
+    test_expiry_refresh()